@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# 오프라인 벤치마크: 로컬 가짜 Bybit REST 서버를 띄우고 bybit_core 주문/조회 경로를 실행
+# 사용법: python bench.py --users 8 --iterations 20 --latency 0.05 --jitter 0.02 --output bench_results.json
+#         python bench.py --baseline 이전결과.json   (이전 커밋 결과와 p50/p99 비교)
+import argparse
+import json
+import statistics
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bybit_core.account import fetch_positions, refresh_account
+from bybit_core.market import get_current_price
+from bybit_core.orders import close_positions, place_ladder_entry, place_market_order
+from fake_bybit import FakeBybitClient, FakeBybitServer
+from pybit.unified_trading import HTTP
+
+BENCH_SYMBOL = "BTCUSDT"
+BENCH_BALANCE = 10_000.0
+
+
+def make_client(url):
+    client = HTTP(api_key="bench", api_secret="bench", max_retries=1)
+    client.endpoint = url
+    return client
+
+
+# ── 측정 대상 사용자 동작 ──
+def act_market_order(client):
+    ok, _ = place_market_order(client, BENCH_SYMBOL, "Buy", 5, BENCH_BALANCE)
+    return ok
+
+
+def act_ladder_entry(client):
+    price = get_current_price(client, BENCH_SYMBOL)
+    results = place_ladder_entry(client, BENCH_SYMBOL, "Buy", 20, price, BENCH_BALANCE)
+    return all(ok for ok, _ in results)
+
+
+def act_close_long(client):
+    # 대시보드의 롱 청산 흐름 (화면 상태 대신 포지션 조회 1회 포함)
+    positions = fetch_positions(client, BENCH_SYMBOL)
+    results, _ = close_positions(client, positions, "Buy", {BENCH_SYMBOL})
+    return all(ok for _, ok, _ in results)
+
+
+def act_refresh(client):
+    _, errors = refresh_account(client)
+    return not errors
+
+
+ACTIONS = {
+    "market_order": act_market_order,
+    "ladder_entry": act_ladder_entry,
+    "close_long": act_close_long,
+    "refresh": act_refresh,
+}
+
+
+def _summary(latencies, errors, wall, requests_per_action):
+    ordered = sorted(latencies)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else 0.0
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "p50_ms": pick(0.50),
+        "p99_ms": pick(0.99),
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+        "throughput_per_s": len(latencies) / wall if wall > 0 else 0.0,
+        "requests_per_action": requests_per_action,
+    }
+
+
+def run(users, iterations, latency, jitter, error_rate, actions):
+    exchange = FakeBybitClient(balance=BENCH_BALANCE * 1000)
+    server = FakeBybitServer(exchange, latency=latency, jitter=jitter, error_rate=error_rate).start()
+    try:
+        clients = [make_client(server.url) for _ in range(users)]
+        # 캐시 예열 후 동작별 요청 수를 1명 기준으로 측정
+        requests_per_action = {}
+        for name in actions:
+            ACTIONS[name](clients[0])
+        for name in actions:
+            before = server.request_count()
+            ACTIONS[name](clients[0])
+            requests_per_action[name] = server.request_count() - before
+
+        results = {}
+        for name in actions:
+            fn = ACTIONS[name]
+
+            def user_loop(client):
+                latencies, errors = [], 0
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    try:
+                        ok = fn(client)
+                    except Exception:
+                        ok = False
+                    latencies.append(time.perf_counter() - started)
+                    errors += 0 if ok else 1
+                return latencies, errors
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=users) as pool:
+                outcomes = list(pool.map(user_loop, clients))
+            wall = time.perf_counter() - started
+            latencies = [x for lat, _ in outcomes for x in lat]
+            errors = sum(e for _, e in outcomes)
+            results[name] = _summary(latencies, errors, wall, requests_per_action[name])
+        return results
+    finally:
+        server.stop()
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def _compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as fh:
+        baseline = json.load(fh)["results"]
+    print(f"\n기준 대비 ({baseline_path}):")
+    for name, row in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        for key in ("p50_ms", "p99_ms"):
+            change = (row[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            print(f"  {name:14s} {key}: {old[key]:8.1f} → {row[key]:8.1f} ms ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 Bybit 서버 대상 오프라인 벤치마크")
+    parser.add_argument("--users", type=int, default=4, help="동시 사용자 수")
+    parser.add_argument("--iterations", type=int, default=10, help="사용자별 동작 반복 횟수")
+    parser.add_argument("--latency", type=float, default=0.05, help="요청당 기본 지연 (초)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="요청당 추가 무작위 지연 상한 (초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="오류 주입 비율 (0~1)")
+    parser.add_argument("--actions", default=",".join(ACTIONS), help="실행할 동작 (쉼표 구분)")
+    parser.add_argument("--output", default="bench_results.json", help="결과 JSON 경로")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    args = parser.parse_args()
+
+    actions = [a for a in args.actions.split(",") if a]
+    results = run(args.users, args.iterations, args.latency, args.jitter, args.error_rate, actions)
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.time(),
+        "config": {"users": args.users, "iterations": args.iterations, "latency": args.latency,
+                   "jitter": args.jitter, "error_rate": args.error_rate},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+
+    print(f"{'동작':14s} {'p50(ms)':>9s} {'p99(ms)':>9s} {'처리량/s':>9s} {'요청수':>6s} {'오류':>5s}")
+    for name, row in results.items():
+        print(f"{name:14s} {row['p50_ms']:9.1f} {row['p99_ms']:9.1f} {row['throughput_per_s']:9.1f} "
+              f"{row['requests_per_action']:6d} {row['errors']:5d}")
+    print(f"\n결과 저장: {args.output}")
+    if args.baseline:
+        _compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
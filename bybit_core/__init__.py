@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Bybit 매매 코어 — Streamlit/pandas 없이 임포트 가능 (numpy·pybit 은 실제로 쓸 때만 불러온다)
+# 이력 저장소(history), 캔들 캐시(klines), 실시간 스트림(live) 은 하위 모듈에서 직접 임포트
+from .account import (Order, Position, fetch_open_orders, fetch_positions, fetch_usdt_balance,
+                      refresh_account, refresh_accounts)
+from .client import ClientPool, InstrumentedClient, client_pool, public_client_for
+from .config import SETTLE_COIN, TRADE_CATEGORY
+from .execution import EXEC_STRATEGIES, ExecutionScheduler, execution_scheduler
+from .market import get_current_price, get_sizer, instrument_cache, quote_age, ticker_cache
+from .metrics import metrics_registry
+from .orderbook import FillEstimate, OrderBook, depth_cache, estimate_market_fill
+from .orders import (ENTRY_TIERS, apply_leverage, bulk_cancel_orders, cancel_all_orders, close_positions,
+                     place_ladder_entry, place_limit_order, place_market_order)
+from .ratelimit import RateLimiter, RateLimitShed, trade_priority
+from .risk import RiskEngine, pre_trade_check, risk_engine_for
+from .sizing import OrderSizer
+from .telegram import notify_telegram, send_telegram
+from .triggers import TriggerEngine, trigger_engine
+
+__all__ = [
+    "Order", "Position", "fetch_open_orders", "fetch_positions", "fetch_usdt_balance", "refresh_account",
+    "refresh_accounts", "ClientPool", "InstrumentedClient", "client_pool", "public_client_for",
+    "SETTLE_COIN", "TRADE_CATEGORY", "EXEC_STRATEGIES", "ExecutionScheduler", "execution_scheduler",
+    "get_current_price", "get_sizer", "instrument_cache", "quote_age", "ticker_cache", "metrics_registry",
+    "FillEstimate", "OrderBook", "depth_cache", "estimate_market_fill", "ENTRY_TIERS", "apply_leverage",
+    "bulk_cancel_orders", "cancel_all_orders", "close_positions", "place_ladder_entry", "place_limit_order",
+    "place_market_order", "RateLimiter", "RateLimitShed", "trade_priority", "RiskEngine", "pre_trade_check",
+    "risk_engine_for", "OrderSizer", "notify_telegram", "send_telegram",
+    "TriggerEngine", "trigger_engine",
+]
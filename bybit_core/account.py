@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from functools import lru_cache
+
+from .config import SETTLE_COIN, TRADE_CATEGORY
+
+# ── 잔고 조회 ──
+def fetch_usdt_balance(client) -> float:
+    resp = client.get_wallet_balance(accountType="UNIFIED", coin="USDT")
+    result = resp.get("result", {})
+    
+    if isinstance(result.get("list"), list):
+        for account in result["list"]:
+            coins = account.get("coin", [])
+            if isinstance(coins, list):
+                for coin_info in coins:
+                    if coin_info.get("coin") == "USDT":
+                        return float(coin_info.get("walletBalance", 0))
+    else:
+        usdt_info = result.get("USDT", {})
+        if usdt_info:
+            return float(usdt_info.get("walletBalance", 0))
+            
+    return 190.0  # 기본값
+
+# ── 커서 페이지네이션 ──
+POSITION_PAGE_LIMIT = 200     # get_positions 최대 페이지 크기
+ORDER_PAGE_LIMIT = 50         # get_open_orders 최대 페이지 크기
+
+def iter_pages(fetch, **params):
+    # nextPageCursor 를 따라가며 행을 하나씩 내보낸다
+    cursor = None
+    while True:
+        if cursor:
+            params["cursor"] = cursor
+        result = fetch(**params).get("result", {})
+        yield from result.get("list", [])
+        cursor = result.get("nextPageCursor")
+        if not cursor:
+            return
+
+# ── 포지션/주문 모델 ──
+# 숫자는 float 그대로 보관하고 문자열 포맷은 화면에 그릴 때만 한다
+class Position:
+    __slots__ = ("symbol", "side", "size", "avg_price", "mark_price", "unrealised_pnl", "position_idx",
+                 "position_value", "leverage")
+
+    def __init__(self, symbol, side, size, avg_price, mark_price, unrealised_pnl, position_idx=0,
+                 position_value=0.0, leverage=0.0):
+        self.symbol = symbol
+        self.side = side
+        self.size = size
+        self.avg_price = avg_price
+        self.mark_price = mark_price
+        self.unrealised_pnl = unrealised_pnl
+        self.position_idx = position_idx
+        self.position_value = position_value
+        self.leverage = leverage
+
+    @classmethod
+    def from_exchange(cls, p):
+        return cls(
+            symbol=p.get("symbol"),
+            side=p.get("side"),
+            size=float(p.get("size", 0) or 0),
+            avg_price=float(p.get("avgPrice") or p.get("entryPrice") or 0),
+            mark_price=float(p.get("markPrice", 0) or 0),
+            unrealised_pnl=float(p.get("unrealisedPnl", 0) or 0),
+            position_idx=int(p.get("positionIdx", 0) or 0),
+            position_value=float(p.get("positionValue", 0) or 0),
+            leverage=float(p.get("leverage", 0) or 0),
+        )
+
+    @property
+    def is_long(self):
+        return self.side == "Buy"
+
+    @property
+    def pnl_pct(self):
+        cost = self.avg_price * self.size
+        return self.unrealised_pnl / cost * 100 if cost > 0 else 0.0
+
+    def __repr__(self):
+        return f"Position({self.symbol} {self.side} {self.size}@{self.avg_price})"
+
+class Order:
+    __slots__ = ("order_id", "symbol", "side", "order_type", "qty", "price", "status")
+
+    def __init__(self, order_id, symbol, side, order_type, qty, price, status):
+        self.order_id = order_id
+        self.symbol = symbol
+        self.side = side
+        self.order_type = order_type
+        self.qty = qty
+        self.price = price
+        self.status = status
+
+    @classmethod
+    def from_exchange(cls, o):
+        return cls(
+            order_id=o.get("orderId", ""),
+            symbol=o.get("symbol"),
+            side=o.get("side"),
+            order_type=o.get("orderType"),
+            qty=float(o.get("qty", 0) or 0),
+            price=float(o.get("price", 0) or 0),
+            status=o.get("orderStatus"),
+        )
+
+    def __repr__(self):
+        return f"Order({self.symbol} {self.side} {self.qty}@{self.price} {self.status})"
+
+# ── 포지션 조회 ──
+def parse_positions(positions):
+    return [Position.from_exchange(p) for p in positions if float(p.get("size", 0) or 0) > 0]
+
+def iter_raw_positions(client, symbol=None):
+    # 심볼 미지정 시 settleCoin 으로 계정 전체를 한 번에 조회
+    params = {"category": TRADE_CATEGORY, "limit": POSITION_PAGE_LIMIT}
+    if symbol:
+        params["symbol"] = symbol
+    else:
+        params["settleCoin"] = SETTLE_COIN
+    return iter_pages(client.get_positions, **params)
+
+def fetch_raw_positions(client, symbol=None):
+    return list(iter_raw_positions(client, symbol))
+
+def iter_positions(client, symbol=None):
+    for p in iter_raw_positions(client, symbol):
+        if float(p.get("size", 0) or 0) > 0:
+            yield Position.from_exchange(p)
+
+def fetch_positions(client, symbol=None):
+    return list(iter_positions(client, symbol))
+
+# ── 미체결 주문 조회 ──
+def parse_open_orders(orders):
+    return [Order.from_exchange(o) for o in orders]
+
+def iter_raw_open_orders(client, symbol=None):
+    params = {"category": TRADE_CATEGORY, "limit": ORDER_PAGE_LIMIT}
+    if symbol:
+        params["symbol"] = symbol
+    else:
+        params["settleCoin"] = SETTLE_COIN
+    return iter_pages(client.get_open_orders, **params)
+
+def fetch_raw_open_orders(client, symbol=None):
+    return list(iter_raw_open_orders(client, symbol))
+
+def iter_open_orders(client, symbol=None):
+    for o in iter_raw_open_orders(client, symbol):
+        yield Order.from_exchange(o)
+
+def fetch_open_orders(client, symbol=None):
+    return list(iter_open_orders(client, symbol))
+
+# ── 계정 데이터 동시 갱신 ──
+REFRESH_MAX_WORKERS = int(os.environ.get("REFRESH_MAX_WORKERS", "16"))  # 갱신용 공유 스레드 풀 크기 (전 계정 공용)
+REFRESH_TIMEOUTS = {"balance": 8.0, "positions": 8.0, "open_orders": 8.0}  # 호출별 타임아웃 (초)
+REFRESH_JOBS = {
+    "balance": fetch_usdt_balance,
+    "positions": fetch_positions,
+    "open_orders": fetch_open_orders,
+}
+
+@lru_cache(maxsize=None)
+def refresh_pool() -> ThreadPoolExecutor:
+    # 세션/탭 전체가 공유하는 제한 크기 풀
+    return ThreadPoolExecutor(max_workers=REFRESH_MAX_WORKERS, thread_name_prefix="refresh")
+
+def refresh_accounts(clients, jobs=None, timeouts=None, pool=None):
+    # 계정 × 조회 전체를 한 번에 풀에 넣고 끝난 것만 반환 → ({계정: 결과 dict}, {계정: 오류 dict})
+    # 계정별로 풀을 따로 잡지 않으므로 계정이 늘어도 전체 시간은 가장 느린 호출 + 대기열 정도만 는다
+    jobs = jobs or REFRESH_JOBS
+    timeouts = timeouts or REFRESH_TIMEOUTS
+    pool = pool or refresh_pool()
+    started = time.time()
+    futures = {(account, name): pool.submit(fn, client)
+               for account, client in clients.items() for name, fn in jobs.items()}
+    results = {account: {} for account in clients}
+    errors = {account: {} for account in clients}
+    for (account, name), fut in futures.items():
+        remaining = started + timeouts.get(name, 10.0) - time.time()
+        try:
+            results[account][name] = fut.result(timeout=max(0.0, remaining))
+        except FuturesTimeout:
+            fut.cancel()
+            errors[account][name] = f"{timeouts.get(name, 10.0):g}초 타임아웃"
+        except Exception as e:
+            errors[account][name] = str(e)
+    return results, errors
+
+def refresh_account(client, jobs=None, timeouts=None, pool=None):
+    # 단일 계정: (결과 dict, 오류 dict)
+    results, errors = refresh_accounts({None: client}, jobs, timeouts, pool)
+    return results[None], errors[None]
+
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+# 헤드리스 CLI/데몬: Streamlit 없이 잔고·포지션 조회, 진입, 청산, 취소
+# 사용법: python -m bybit_core positions
+#         python -m bybit_core ladder BTCUSDT long 10 --base-price 60000 --leverage 5
+#         python -m bybit_core risk
+#         python -m bybit_core close --side long --symbol BTCUSDT
+#         python -m bybit_core cancel ALL
+#         python -m bybit_core twap BTCUSDT long 500 --slices 5 --duration 300
+#         python -m bybit_core alert BTCUSDT above 70000 --action ladder --side long --pct 10
+#         python -m bybit_core daemon --warm BTCUSDT ETHUSDT   (표준입력 한 줄 = 명령 한 개, 결과는 JSON 한 줄)
+import argparse
+import json
+import logging
+import os
+import shlex
+import sys
+import time
+
+from .account import fetch_open_orders, fetch_positions, fetch_usdt_balance
+from .client import client_pool
+from .execution import EXEC_ICEBERG_TIMEOUT, account_key, execution_scheduler
+from .market import get_current_price, get_sizer
+from .orderbook import estimate_market_fill
+from .orders import (SLIPPAGE_POLICIES, bulk_cancel_orders, cancel_all_orders, close_positions, place_ladder_entry,
+                     place_limit_order, place_market_order)
+from .risk import risk_engine_for
+from .triggers import TRIGGER_ACTIONS, TRIGGER_DIRECTIONS, trigger_engine_for
+
+SIDES = {"long": "Buy", "buy": "Buy", "short": "Sell", "sell": "Sell"}
+DAEMON_EXIT = {"quit", "exit"}
+
+def _side(text):
+    try:
+        return SIDES[text.lower()]
+    except KeyError:
+        raise argparse.ArgumentTypeError(f"long/short/buy/sell 중 하나: {text}")
+
+# ── 명령 처리 ── 각 명령은 (성공 여부, 출력 줄 목록) 을 돌려준다
+def cmd_balance(client, args):
+    return True, [f"💰 USDT 잔고: {fetch_usdt_balance(client):.2f}"]
+
+def cmd_positions(client, args):
+    positions = fetch_positions(client, args.symbol)
+    if not positions:
+        return True, ["📭 보유 포지션 없음"]
+    return True, [f"{p.symbol} {'롱' if p.is_long else '숏'} {p.size:g}@{p.avg_price:.4f} "
+                  f"미실현 {p.unrealised_pnl:+.2f} USDT ({p.pnl_pct:+.2f}%)" for p in positions]
+
+def cmd_orders(client, args):
+    orders = fetch_open_orders(client, args.symbol)
+    if not orders:
+        return True, ["📭 미체결 주문 없음"]
+    return True, [f"{o.symbol} {o.side} {o.order_type} {o.qty:g}@{o.price:.4f} {o.status} ({o.order_id})"
+                  for o in orders]
+
+def cmd_market(client, args):
+    ok, msg = place_market_order(client, args.symbol, args.side, args.pct, fetch_usdt_balance(client),
+                                 args.max_slippage, args.slippage_policy, leverage=args.leverage)
+    return ok, [msg]
+
+def cmd_limit(client, args):
+    ok, msg = place_limit_order(client, args.symbol, args.side, args.pct, args.price, fetch_usdt_balance(client),
+                                leverage=args.leverage)
+    return ok, [msg]
+
+def cmd_ladder(client, args):
+    base_price = args.base_price or get_current_price(client, args.symbol)
+    if base_price <= 0:
+        return False, ["❌ 기준가 조회 실패"]
+    results = place_ladder_entry(client, args.symbol, args.side, args.max_pct, base_price,
+                                 fetch_usdt_balance(client), max_slippage_bps=args.max_slippage,
+                                 slippage_policy=args.slippage_policy, leverage=args.leverage)
+    return all(ok for ok, _ in results), [msg for _, msg in results]
+
+def cmd_depth(client, args):
+    lines = []
+    for side in ("Buy", "Sell"):
+        est, cap = estimate_market_fill(client, args.symbol, side, args.notional, args.max_slippage)
+        line = (f"{'롱' if side == 'Buy' else '숏'} {est.notional:.2f} USDT → {est.qty:g}@{est.vwap:.4f} "
+                f"(중간가 {est.mid:.4f}, {est.slippage_bps:+.1f}bp, {est.levels}호가{'' if est.complete else ', 호가 부족'})")
+        if cap is not None:
+            line += f" · {args.max_slippage:g}bp 이내 최대 {cap:.2f} USDT"
+        lines.append(line)
+    return True, lines
+
+def cmd_execute(client, args):
+    # 포그라운드 실행: 작업이 끝날 때까지 기다렸다가 작업 로그를 그대로 출력
+    job, msg = execution_scheduler().submit(client, args.symbol, args.side, args.notional, args.command,
+                                            args.slices, args.duration, args.slice_timeout, args.reduce_only)
+    if job is None:
+        return False, [msg]
+    try:
+        while job.active:
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        job.cancel()
+        while job.active:
+            time.sleep(0.2)
+    return job.status == "done" and job.filled_qty > 0, [msg] + list(job.messages)
+
+def cmd_alert(client, args):
+    # 규칙만 저장 — 평가·실행은 대시보드 또는 daemon 프로세스가 맡는다
+    params = {}
+    if args.action in ("market", "ladder"):
+        if not args.side:
+            return False, [f"❌ {args.action} 액션은 --side 필요"]
+        params = {"side": args.side, "pct" if args.action == "market" else "max_pct": args.pct,
+                  "leverage": args.leverage}
+    elif args.action == "close" and args.side:
+        params = {"side": args.side}
+    rule, msg = trigger_engine_for(client).add_rule(client, args.symbol, args.direction, args.price, args.action,
+                                                    params, args.repeat, args.note)
+    return rule is not None, [msg]
+
+def cmd_alerts(client, args):
+    engine = trigger_engine_for(client)
+    account = account_key(client)
+    rules = engine.rules(account)
+    lines = [f"#{r.rule_id} {r.describe()}{' 🔁' if r.repeat else ''} · 발동 {r.fired}회"
+             f"{'' if r.armed else f' · {r.rearm_price:g} 복귀 대기'}{f' · {r.note}' if r.note else ''}"
+             for r in rules] or ["📭 등록된 규칙 없음"]
+    lines += [f"🔔 #{f['rule_id']} {f['symbol']} @{f['price']:g} → {f['result'] or '처리 중'}"
+              for f in engine.firings(account, limit=args.history)]
+    return True, lines
+
+def cmd_alert_rm(client, args):
+    ok = trigger_engine_for(client).remove_rule(args.rule_id)
+    return ok, [f"🗑️ 규칙 #{args.rule_id} 삭제" if ok else f"❌ 규칙 #{args.rule_id} 없음"]
+
+def cmd_risk(client, args):
+    # 잔고·포지션·미체결 주문을 새로 읽어 증거금 비율과 포지션별 추정 청산가 출력
+    engine = risk_engine_for(client)
+    engine.load(fetch_positions(client), fetch_usdt_balance(client), fetch_open_orders(client))
+    snap = engine.snapshot()
+    lines = [f"🛡️ 증거금 비율 {snap['margin_ratio']:.2%} · 순자산 {snap['equity']:.2f} · "
+             f"사용 증거금 {snap['im'] + snap['reserved']:.2f} · 가용 {snap['available']:.2f} USDT"]
+    for r in snap["positions"]:
+        liq = f"{r['liq_cross']:.4f} ({r['liq_distance']:.2%})" if r["liq_cross"] else "없음"
+        lines.append(f"{r['symbol']} {'롱' if r['side'] == 'Buy' else '숏'} {r['notional']:.2f} USDT "
+                     f"{r['leverage']:g}x · 청산가(교차) {liq} · 격리 기준 {r['liq_isolated']:.4f}")
+    return True, lines
+
+def cmd_close(client, args):
+    # 데몬/스크립트에는 화면 상태가 없으므로 포지션을 한 번 조회해 바로 청산
+    symbols = set(args.symbol) if args.symbol else None
+    positions = fetch_positions(client, args.symbol[0] if symbols and len(symbols) == 1 else None)
+    results, cancel_report = close_positions(client, positions, args.side, symbols, cancel=not args.keep_orders)
+    lines = [msg for _, _, msg in results] or ["📭 청산 대상 포지션 없음"]
+    for symbol, entry in sorted(cancel_report.items()):
+        if entry["error"]:
+            lines.append(f"⚠️ {symbol} 미체결 주문 취소 실패: {entry['error']}")
+    if not args.keep_orders:
+        lines.append(f"❌ 미체결 주문 {sum(e['cancelled'] for e in cancel_report.values())}건 취소")
+    return all(ok for _, ok, _ in results), lines
+
+def cmd_cancel(client, args):
+    if args.symbol.upper() != "ALL":
+        ok = cancel_all_orders(client, args.symbol)
+        return ok, [f"✅ {args.symbol} 미체결 주문 취소" if ok else f"❌ {args.symbol} 주문 취소 실패"]
+    report, info = bulk_cancel_orders(client)
+    lines = [f"❌ 미체결 주문 {sum(e['cancelled'] for e in report.values())}건 취소 "
+             f"({info['mode']}, 왕복 {info['round_trips']}회, {info['elapsed']:.2f}초)"]
+    for symbol, entry in sorted(report.items()):
+        if entry["remaining"] or entry["error"]:
+            lines.append(f"⚠️ {symbol} 잔여 {entry['remaining']}건 {entry['error'] or ''}".rstrip())
+    return not info["remaining_orders"], lines
+
+def _add_slippage_args(parser, policy):
+    parser.add_argument("--max-slippage", type=float, help="시장가 예상 슬리피지 한도 (bp, 미지정 시 검사 안 함)")
+    parser.add_argument("--slippage-policy", choices=SLIPPAGE_POLICIES, default=policy,
+                        help=f"한도 초과 시 cap(금액 축소) / refuse(거부), 기본값: {policy}")
+
+def _add_leverage_arg(parser):
+    parser.add_argument("--leverage", type=float, help="주문 전에 적용할 레버리지 (미지정 시 현재 설정 유지)")
+
+def _add_commands(sub):
+    p = sub.add_parser("balance", help="USDT 잔고")
+    p.set_defaults(handler=cmd_balance)
+
+    for name, handler, label in (("positions", cmd_positions, "보유 포지션"), ("orders", cmd_orders, "미체결 주문")):
+        p = sub.add_parser(name, help=label)
+        p.add_argument("--symbol", help="심볼 (미지정 시 전체)")
+        p.set_defaults(handler=handler)
+
+    p = sub.add_parser("market", help="시장가 진입 (잔고 대비 %%)")
+    p.add_argument("symbol")
+    p.add_argument("side", type=_side)
+    p.add_argument("pct", type=float)
+    _add_slippage_args(p, "refuse")
+    _add_leverage_arg(p)
+    p.set_defaults(handler=cmd_market)
+
+    p = sub.add_parser("limit", help="리밋 진입 (잔고 대비 %%)")
+    p.add_argument("symbol")
+    p.add_argument("side", type=_side)
+    p.add_argument("pct", type=float)
+    p.add_argument("price", type=float)
+    _add_leverage_arg(p)
+    p.set_defaults(handler=cmd_limit)
+
+    p = sub.add_parser("ladder", help="분할 진입 (시장가 + 리밋 티어)")
+    p.add_argument("symbol")
+    p.add_argument("side", type=_side)
+    p.add_argument("max_pct", type=float, help="최대 포지션 비율 (잔고 대비 %%)")
+    p.add_argument("--base-price", type=float, default=0.0, help="리밋 티어 기준가 (미지정 시 현재가)")
+    _add_slippage_args(p, "cap")
+    _add_leverage_arg(p)
+    p.set_defaults(handler=cmd_ladder)
+
+    for name, label in (("twap", "시간 분할 시장가 집행"), ("iceberg", "최우선 호가 리밋 분할 집행 (미체결분 시장가)")):
+        p = sub.add_parser(name, help=f"{label} (USDT 금액)")
+        p.add_argument("symbol")
+        p.add_argument("side", type=_side)
+        p.add_argument("notional", type=float, help="총 주문 금액 (USDT)")
+        p.add_argument("--slices", type=int, default=5, help="조각 수 (기본값: 5)")
+        p.add_argument("--duration", type=float, default=60.0, help="TWAP 전체 집행 시간 (초, 기본값: 60)")
+        p.add_argument("--slice-timeout", type=float, default=EXEC_ICEBERG_TIMEOUT,
+                       help=f"아이스버그 조각 대기 시간 (초, 기본값: {EXEC_ICEBERG_TIMEOUT:g})")
+        p.add_argument("--reduce-only", action="store_true", help="포지션 축소 전용")
+        p.set_defaults(handler=cmd_execute)
+
+    p = sub.add_parser("alert", help="가격 알림/조건 주문 규칙 추가 (대시보드·daemon 실행 중에 평가)")
+    p.add_argument("symbol")
+    p.add_argument("direction", choices=TRIGGER_DIRECTIONS, help="above: 이상 돌파 / below: 이하 돌파")
+    p.add_argument("price", type=float)
+    p.add_argument("--action", choices=TRIGGER_ACTIONS, default="alert", help="기본값: alert (텔레그램 알림)")
+    p.add_argument("--side", type=_side, help="market/ladder 진입 방향, close 대상 (미지정 시 양방향)")
+    p.add_argument("--pct", type=float, default=10.0, help="market: 잔고 대비 %%, ladder: 최대 포지션 %% (기본값: 10)")
+    p.add_argument("--repeat", action="store_true", help="발동 후 되돌아오면 다시 감시")
+    p.add_argument("--note", default="", help="알림에 붙일 메모")
+    _add_leverage_arg(p)
+    p.set_defaults(handler=cmd_alert)
+
+    p = sub.add_parser("alerts", help="활성 규칙과 최근 발동 내역")
+    p.add_argument("--history", type=int, default=10, help="최근 발동 표시 수 (기본값: 10)")
+    p.set_defaults(handler=cmd_alerts)
+
+    p = sub.add_parser("alert-rm", help="규칙 삭제")
+    p.add_argument("rule_id", type=int)
+    p.set_defaults(handler=cmd_alert_rm)
+
+    p = sub.add_parser("depth", help="호가창 기준 시장가 예상 체결가/슬리피지")
+    p.add_argument("symbol")
+    p.add_argument("notional", type=float, help="주문 금액 (USDT)")
+    p.add_argument("--max-slippage", type=float, help="이 슬리피지(bp) 이내로 체결 가능한 최대 금액도 계산")
+    p.set_defaults(handler=cmd_depth)
+
+    p = sub.add_parser("risk", help="증거금 비율·추정 청산가")
+    p.set_defaults(handler=cmd_risk)
+
+    p = sub.add_parser("close", help="포지션 청산 (reduce-only 시장가)")
+    p.add_argument("--symbol", action="append", help="대상 심볼 (여러 번 지정 가능, 미지정 시 전체)")
+    p.add_argument("--side", type=_side, help="long/short (미지정 시 양방향)")
+    p.add_argument("--keep-orders", action="store_true", help="미체결 주문을 취소하지 않음")
+    p.set_defaults(handler=cmd_close)
+
+    p = sub.add_parser("cancel", help="미체결 주문 취소")
+    p.add_argument("symbol", help="심볼 또는 ALL")
+    p.set_defaults(handler=cmd_cancel)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="bybit_core", description="Bybit 매매 코어 CLI")
+    parser.add_argument("--api-key", default=os.environ.get("BYBIT_API_KEY", ""), help="기본값: $BYBIT_API_KEY")
+    parser.add_argument("--api-secret", default=os.environ.get("BYBIT_API_SECRET", ""),
+                        help="기본값: $BYBIT_API_SECRET")
+    parser.add_argument("--testnet", action="store_true",
+                        default=os.environ.get("BYBIT_TESTNET", "").lower() in ("1", "true", "yes"),
+                        help="테스트넷 사용 (기본값: $BYBIT_TESTNET)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    _add_commands(sub)
+    p = sub.add_parser("daemon", help="표준입력에서 명령을 한 줄씩 읽어 실행 (연결·캐시 유지)")
+    p.add_argument("--warm", nargs="*", default=[], help="시작 시 시세/스펙을 미리 불러올 심볼")
+    return parser
+
+def _daemon_parser():
+    parser = argparse.ArgumentParser(prog="", add_help=False)
+    _add_commands(parser.add_subparsers(dest="command", required=True))
+    return parser
+
+def run_command(client, args):
+    try:
+        return args.handler(client, args)
+    except Exception as e:
+        return False, [f"❌ {args.command} 실패: {e}"]
+
+# ── 데몬 ──
+def daemon(client, warm=(), stdin=sys.stdin, stdout=sys.stdout):
+    # 한 프로세스에서 클라이언트 연결·시세·심볼 스펙 캐시를 유지해 명령마다 준비 비용이 들지 않는다
+    for symbol in warm:
+        get_sizer(client, symbol)
+        get_current_price(client, symbol)
+    # 데몬이 떠 있는 동안 저장된 가격 트리거를 평가·실행 (알림은 $TELEGRAM_BOT_TOKEN/$TELEGRAM_CHAT_ID)
+    trigger_engine_for(client).attach(client, os.environ.get("TELEGRAM_BOT_TOKEN", ""),
+                                      os.environ.get("TELEGRAM_CHAT_ID", ""))
+    parser = _daemon_parser()
+    for line in stdin:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.lower() in DAEMON_EXIT:
+            break
+        started = time.perf_counter()
+        try:
+            args = parser.parse_args(shlex.split(line))
+        except (SystemExit, ValueError):
+            ok, lines = False, [f"❌ 잘못된 명령: {line}"]
+        else:
+            ok, lines = run_command(client, args)
+        stdout.write(json.dumps({"command": line, "ok": ok, "lines": lines,
+                                 "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)},
+                                ensure_ascii=False) + "\n")
+        stdout.flush()
+
+def main(argv=None):
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    args = build_parser().parse_args(argv)
+    if not args.api_key or not args.api_secret:
+        print("❌ API Key/Secret 필요 (--api-key/--api-secret 또는 BYBIT_API_KEY/BYBIT_API_SECRET)", file=sys.stderr)
+        return 2
+    client = client_pool().authenticated(args.api_key, args.api_secret, args.testnet)
+    if args.command == "daemon":
+        daemon(client, args.warm)
+        return 0
+    ok, lines = run_command(client, args)
+    print("\n".join(lines))
+    return 0 if ok else 1
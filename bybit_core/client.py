@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from .metrics import metrics_registry
+from .ratelimit import RateLimiter, RateLimitShed
+
+# ── 계측 클라이언트 ──
+class InstrumentedClient:
+    # pybit HTTP 래퍼: 레이트리밋 대기 후 호출하고, 지연시간/retCode/한도 헤더를 기록해 응답 JSON 만 돌려준다
+    def __init__(self, inner, metrics, limiter=None):
+        self._inner = inner
+        self._metrics = metrics
+        self._limiter = limiter
+
+    def __getattr__(self, name):
+        attr = getattr(self._inner, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            if self._limiter is not None:
+                try:
+                    self._limiter.acquire(name)
+                except RateLimitShed:
+                    self._metrics.observe(name, 0.0, "shed")
+                    raise
+            started = time.perf_counter()
+            try:
+                resp = attr(*args, **kwargs)
+            except Exception as e:
+                code = getattr(e, "status_code", None)
+                self._metrics.observe(name, time.perf_counter() - started, code or "exception")
+                self._metrics.observe_rate_limit(name, getattr(e, "resp_headers", None))
+                if self._limiter is not None:
+                    self._limiter.update(name, getattr(e, "resp_headers", None), code)
+                raise
+            headers = None
+            if isinstance(resp, tuple):     # return_response_headers=True → (json, elapsed, headers)
+                resp, headers = resp[0], (resp[2] if len(resp) > 2 else None)
+            self._metrics.observe(name, time.perf_counter() - started, resp.get("retCode", 0))
+            self._metrics.observe_rate_limit(name, headers)
+            if self._limiter is not None:
+                self._limiter.update(name, headers, resp.get("retCode"))
+            return resp
+        return call
+
+def _instrumented_http(**kwargs):
+    # pybit 은 실제로 클라이언트를 만들 때만 불러온다 (패키지 임포트를 가볍게 유지)
+    from pybit.unified_trading import HTTP
+    return InstrumentedClient(HTTP(return_response_headers=True, **kwargs), metrics_registry(), RateLimiter())
+
+# ── 연결 풀 ──
+# 환경변수로 조정 가능 (render.yaml envVars)
+CLIENT_POOL_MAX = int(os.environ.get("BYBIT_CLIENT_POOL_MAX", "64"))             # 보관할 최대 클라이언트 수
+CLIENT_POOL_IDLE_TTL = float(os.environ.get("BYBIT_CLIENT_POOL_IDLE_TTL", "1800"))  # 미사용 클라이언트 정리 (초)
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "16"))               # 호스트별 keep-alive 연결 수
+
+def _mount_pool(session, maxsize=HTTP_POOL_MAXSIZE):
+    from requests.adapters import HTTPAdapter
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+class ClientPool:
+    # (API Key, 테스트넷) 별 인증 클라이언트와 공개 시세용 클라이언트를 재사용
+    def __init__(self, factory, max_clients=CLIENT_POOL_MAX, idle_ttl=CLIENT_POOL_IDLE_TTL):
+        self.factory = factory
+        self.max_clients = max_clients
+        self.idle_ttl = idle_ttl
+        self._clients = OrderedDict()   # key -> [client, 마지막 사용 시각]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get(self, key, **kwargs):
+        now = time.time()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._clients.get(key)
+            if entry is not None:
+                entry[1] = now
+                self._clients.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            client = self.factory(**kwargs)
+            session = getattr(client, "client", None)
+            if session is not None:
+                _mount_pool(session)
+            self._clients[key] = [client, now]
+            while len(self._clients) > self.max_clients:
+                _, (old, _) = self._clients.popitem(last=False)
+                self._close(old)
+            return client
+
+    def _evict_idle(self, now):
+        for key in [k for k, (_, used) in self._clients.items() if now - used > self.idle_ttl]:
+            client, _ = self._clients.pop(key)
+            self._close(client)
+
+    def _close(self, client):
+        self.evictions += 1
+        session = getattr(client, "client", None)
+        if session is not None and hasattr(session, "close"):
+            session.close()
+
+    def authenticated(self, api_key: str, api_secret: str, testnet: bool):
+        key = ("auth", api_key, hashlib.sha256(api_secret.encode()).hexdigest(), bool(testnet))
+        return self._get(key, api_key=api_key, api_secret=api_secret, testnet=testnet)
+
+    def public(self, testnet: bool):
+        return self._get(("public", bool(testnet)), testnet=testnet)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._clients),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+@lru_cache(maxsize=None)
+def client_pool() -> ClientPool:
+    return ClientPool(_instrumented_http)
+
+def public_client_for(client):
+    # 공개 시세/메타데이터 호출은 서명 없는 공유 클라이언트로 보낸다
+    if isinstance(client, InstrumentedClient):
+        return client_pool().public(client.testnet)
+    return client
+
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+# 거래 공통 상수
+TRADE_CATEGORY = "linear"
+SETTLE_COIN = "USDT"
+# 정밀도/최소수량 관련 주문 거부 retCode → 스펙 캐시 무효화
+PRECISION_REJECT_CODES = {
+    110094,   # 최소 주문금액 미달
+    170134,   # 주문 가격 소수 자릿수 초과
+    170136,   # 주문 수량 상한 초과
+    170137,   # 주문 수량 소수 자릿수 초과
+}   # 일반 파라미터 오류(10001)는 제외 — 스펙과 무관한 거부까지 재조회하지 않음
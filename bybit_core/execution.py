@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from .client import public_client_for
+from .config import TRADE_CATEGORY
+from .market import ORDER_QUOTE_MAX_AGE, _invalidate_on_precision_reject, get_current_price, get_sizer
+from .orderbook import ORDERBOOK_MAX_AGE, depth_cache_for
+
+logger = logging.getLogger(__name__)
+
+# ── 분할 집행 (TWAP / 아이스버그) ──
+EXEC_STRATEGIES = ("twap", "iceberg")
+EXEC_POLL_INTERVAL = 0.5           # 스트림이 없을 때 자식 주문 상태 조회 주기 (초)
+EXEC_STREAM_POLL_INTERVAL = 5.0    # 스트림으로 추적 중일 때 보조 조회 주기 (초)
+EXEC_MARKET_WAIT = 5.0             # 시장가 자식 주문 체결 확인 최대 대기 (초)
+EXEC_ICEBERG_TIMEOUT = 20.0        # 아이스버그 조각이 호가에 머무는 시간 — 넘으면 취소 후 시장가 (초)
+EXEC_MAX_JOBS = 200                # 보관할 최근 집행 작업 수 (끝난 작업부터 정리)
+EXEC_UNMATCHED_MAX = 500           # 주문 응답보다 먼저 도착한 스트림 메시지 보관 수
+FINAL_ORDER_STATUSES = {"Filled", "Cancelled", "Rejected", "Deactivated", "PartiallyFilledCanceled"}
+
+def account_key(client) -> str:
+    # 화면에서 계정별 작업을 구분하는 키 (API Key 해시)
+    return hashlib.sha256(str(getattr(client, "api_key", "") or "").encode()).hexdigest()[:12]
+
+class ChildOrder:
+    __slots__ = ("order_id", "kind", "qty", "price", "status", "filled_qty", "filled_value", "cum_qty", "cum_value",
+                 "exec_qty", "exec_value", "exec_ids", "created_at", "changed")
+
+    def __init__(self, order_id, kind, qty, price=0.0):
+        self.order_id = order_id
+        self.kind = kind              # "Market" / "Limit"
+        self.qty = qty
+        self.price = price
+        self.status = "New"
+        self.filled_qty = 0.0
+        self.filled_value = 0.0
+        self.cum_qty = 0.0            # 주문 상태의 누적 체결 (cumExecQty)
+        self.cum_value = 0.0
+        self.exec_qty = 0.0           # execution 스트림 체결 합계
+        self.exec_value = 0.0
+        self.exec_ids = set()
+        self.created_at = time.time()
+        self.changed = threading.Event()
+
+    @property
+    def done(self):
+        return self.status in FINAL_ORDER_STATUSES
+
+    @property
+    def open_qty(self):
+        # 최종 상태 전의 미체결분 — 취소 요청 후에도 체결될 수 있으므로 집행 중으로 본다
+        return 0.0 if self.done else max(0.0, self.qty - self.filled_qty)
+
+    def _settle(self):
+        # 같은 체결이 두 경로로 들어오므로 더하지 않고 더 앞선 쪽을 택한다 (도착 순서와 무관)
+        if self.exec_qty > self.cum_qty:
+            self.filled_qty, self.filled_value = self.exec_qty, self.exec_value
+        else:
+            self.filled_qty, self.filled_value = self.cum_qty, self.cum_value
+        self.changed.set()
+
+    def apply_order(self, row):
+        # 주문 상태(REST 조회 또는 order 스트림)의 누적 체결량
+        qty = float(row.get("cumExecQty", 0) or 0)
+        if qty >= self.cum_qty:
+            value = float(row.get("cumExecValue", 0) or 0) or qty * float(row.get("avgPrice", 0) or 0)
+            self.cum_qty, self.cum_value = qty, value
+        self.status = row.get("orderStatus", self.status)
+        self._settle()
+
+    def apply_execution(self, row):
+        # execution 스트림: 주문 상태보다 먼저 도착하는 체결을 진행률에 바로 반영
+        exec_id = row.get("execId")
+        if exec_id in self.exec_ids:
+            return
+        self.exec_ids.add(exec_id)
+        qty = float(row.get("execQty", 0) or 0)
+        self.exec_qty += qty
+        self.exec_value += float(row.get("execValue", 0) or 0) or qty * float(row.get("execPrice", 0) or 0)
+        self._settle()
+
+class ExecutionJob:
+    # 부모 주문 1건: 목표 수량을 자식 주문으로 나눠 백그라운드 스레드에서 집행
+    def __init__(self, job_id, account, client, symbol, side, strategy, target_units, slices, duration,
+                 slice_timeout, sizer, reduce_only=False, on_child=None):
+        self.job_id = job_id
+        self.account = account
+        self.client = client
+        self.symbol = symbol
+        self.side = side
+        self.strategy = strategy
+        self.target_units = target_units
+        self.slices = slices
+        self.duration = duration
+        self.slice_timeout = slice_timeout
+        self.sizer = sizer
+        self.reduce_only = reduce_only
+        self.children = []
+        self.status = "running"       # running / done / cancelled / failed
+        self.messages = []
+        self.created_at = time.time()
+        self.finished_at = None
+        self.stream = False           # 스트림으로 체결을 받고 있는지
+        self.on_child = on_child      # 자식 주문 접수 시 호출 (스케줄러가 orderId 를 등록)
+        self._cancel = threading.Event()
+
+    @property
+    def target_qty(self):
+        return self.sizer.units_qty(self.target_units)
+
+    @property
+    def filled_qty(self):
+        return sum(c.filled_qty for c in self.children)
+
+    @property
+    def filled_value(self):
+        return sum(c.filled_value for c in self.children)
+
+    @property
+    def in_flight_qty(self):
+        return sum(c.open_qty for c in self.children)
+
+    @property
+    def avg_price(self):
+        qty = self.filled_qty
+        return self.filled_value / qty if qty > 0 else 0.0
+
+    @property
+    def progress(self):
+        return min(1.0, self.filled_qty / self.target_qty) if self.target_qty > 0 else 0.0
+
+    @property
+    def active(self):
+        return self.status == "running"
+
+    def remaining_units(self):
+        # 체결분 + 최종 상태 미확인 자식의 미체결분을 빼야 다음 조각이 같은 수량을 다시 보내지 않는다
+        committed = self.filled_qty + self.in_flight_qty
+        return max(0, self.target_units - round(committed / self.sizer.units_qty(1)))
+
+    def note(self, text):
+        self.messages.append(f"{time.strftime('%H:%M:%S')} {text}")
+        logger.info(f"[{self.job_id}] {text}")
+
+    def cancel(self):
+        self._cancel.set()
+
+    def snapshot(self):
+        return {"job_id": self.job_id, "symbol": self.symbol, "side": self.side, "strategy": self.strategy,
+                "status": self.status, "target_qty": self.target_qty, "filled_qty": self.filled_qty,
+                "avg_price": self.avg_price, "progress": self.progress, "children": len(self.children),
+                "created_at": self.created_at, "finished_at": self.finished_at, "messages": list(self.messages)}
+
+    # ── 자식 주문 ──
+    def _send(self, kind, units, price_str=None):
+        req = {"category": TRADE_CATEGORY, "symbol": self.symbol, "side": self.side, "orderType": kind,
+               "qty": self.sizer.qty_str(units), "reduceOnly": self.reduce_only}
+        if kind == "Market":
+            req["timeInForce"] = "IOC"
+        else:
+            req.update(price=price_str, timeInForce="PostOnly")
+        try:
+            res = self.client.place_order(**req)
+        except Exception as e:
+            _invalidate_on_precision_reject(self.client, self.symbol, getattr(e, "status_code", None))
+            self.note(f"❌ {kind} {req['qty']} 주문 실패: {e}")
+            return None
+        if res.get("retCode", 0) != 0:
+            _invalidate_on_precision_reject(self.client, self.symbol, res.get("retCode"))
+            self.note(f"❌ {kind} {req['qty']} 주문 실패: {res.get('retMsg', 'Unknown error')}")
+            return None
+        child = ChildOrder(res.get("result", {}).get("orderId", ""), kind, float(req["qty"]),
+                           float(price_str or 0))
+        self.children.append(child)
+        if self.on_child is not None:
+            self.on_child(self, child)
+        return child
+
+    def _poll(self, child):
+        try:
+            rows = self.client.get_order_history(category=TRADE_CATEGORY, symbol=self.symbol,
+                                                 orderId=child.order_id)["result"]["list"]
+        except Exception as e:
+            logger.warning(f"[{self.job_id}] {child.order_id} 상태 조회 실패: {e}")
+            return
+        for row in rows:
+            if row.get("orderId") == child.order_id:
+                child.apply_order(row)
+
+    def _wait(self, child, timeout):
+        # 스트림 갱신(changed) 또는 주기적 조회로 종료 상태를 기다린다 — 취소 요청 시 즉시 반환
+        deadline = time.time() + timeout
+        while not child.done and not self._cancel.is_set():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            interval = EXEC_STREAM_POLL_INTERVAL if self.stream else EXEC_POLL_INTERVAL
+            if not child.changed.wait(min(interval, remaining)):
+                self._poll(child)
+            child.changed.clear()
+        return child.done
+
+    def _refresh_open(self):
+        # 다음 조각 계산 전에 최종 상태 미확인 자식을 다시 조회
+        for child in self.children:
+            if not child.done:
+                self._poll(child)
+
+    def _cancel_child(self, child):
+        try:
+            self.client.cancel_order(category=TRADE_CATEGORY, symbol=self.symbol, orderId=child.order_id)
+        except Exception as e:
+            # 이미 체결/취소된 주문이면 거부된다 — 최종 상태는 조회로 확인
+            logger.info(f"[{self.job_id}] {child.order_id} 취소 응답: {e}")
+        if not self._wait(child, EXEC_MARKET_WAIT):
+            self._poll(child)
+
+    def _market(self, units):
+        child = self._send("Market", units)
+        if child is not None and not self._wait(child, EXEC_MARKET_WAIT):
+            self._poll(child)
+        return child
+
+    def _touch_price(self):
+        # 패시브 호가: 매수는 최우선 매수호가, 매도는 최우선 매도호가에 대기
+        book = depth_cache_for(self.client).get(public_client_for(self.client), self.symbol, ORDERBOOK_MAX_AGE)
+        return book.best_bid if self.side == "Buy" else book.best_ask
+
+    def _units(self, qty):
+        return round(qty / self.sizer.units_qty(1))
+
+    def _iceberg_slice(self, units, label):
+        # 최우선 호가에 PostOnly 리밋 → slice_timeout 안에 못 채우면 취소하고 나머지는 시장가
+        filled = 0
+        try:
+            price = self._touch_price()
+        except Exception as e:
+            logger.warning(f"[{self.job_id}] 호가 조회 실패, 시장가로 전송: {e}")
+            price = 0.0
+        if price > 0:
+            child = self._send("Limit", units, self.sizer.tick_price_str(price))
+            if child is not None:
+                if not self._wait(child, self.slice_timeout):
+                    self._cancel_child(child)
+                filled = self._units(child.filled_qty + child.open_qty)
+                self.note(f"📗 {label} 리밋 {child.filled_qty:g}/{child.qty:g} @{child.price:g} 체결")
+        rest = units - filled
+        if self._cancel.is_set() or rest < self.sizer.min_units_at(self._reference_price()):
+            return      # 최소 수량 미만은 다음 조각으로 이월
+        child = self._market(rest)
+        if child is not None:
+            self.note(f"📕 {label} 시장가 {child.filled_qty:g}/{child.qty:g} 체결 (리밋 미체결분)")
+
+    def _twap_slice(self, units, label):
+        child = self._market(units)
+        if child is not None:
+            self.note(f"📘 {label} 시장가 {child.filled_qty:g}/{child.qty:g} 체결")
+
+    def _reference_price(self):
+        return get_current_price(self.client, self.symbol, max_age=ORDER_QUOTE_MAX_AGE) or 1.0
+
+    def run(self):
+        try:
+            plan = self.sizer.split(self.target_units, self.slices, self._reference_price())
+            interval = self.duration / len(plan) if plan and self.strategy == "twap" else 0.0
+            started = time.time()
+            self.note(f"▶️ {self.strategy.upper()} {len(plan)}조각 시작 (목표 {self.target_qty:g})")
+            for i in range(len(plan)):
+                if self._cancel.wait(max(0.0, started + i * interval - time.time())):
+                    break
+                # 앞 조각의 미체결·이월분까지 이번 조각에 합친다
+                self._refresh_open()
+                units = self.remaining_units() - sum(plan[i + 1:])
+                if units < self.sizer.min_units_at(self._reference_price()):
+                    continue
+                slice_run = self._iceberg_slice if self.strategy == "iceberg" else self._twap_slice
+                slice_run(units, f"{i + 1}/{len(plan)}")
+            self.status = "cancelled" if self._cancel.is_set() else "done"
+            self._refresh_open()
+            left = self.remaining_units()
+            if left and not self._cancel.is_set():
+                self.note(f"⚠️ 미집행 {self.sizer.units_qty(left):g} (최소 주문 수량/금액 미만 또는 주문 실패)")
+            if self.in_flight_qty:
+                self.note(f"⚠️ 최종 상태 미확인 {self.in_flight_qty:g} — 이후 체결될 수 있음")
+        except Exception as e:
+            logger.exception(f"[{self.job_id}] 집행 실패")
+            self.note(f"❌ 집행 실패: {e}")
+            self.status = "failed"
+        finally:
+            self.finished_at = time.time()
+            avg = f" · 평균가 {self.avg_price:.4f}" if self.filled_qty else ""
+            self.note(f"⏹️ {self.status} — 체결 {self.filled_qty:g}/{self.target_qty:g}{avg}")
+
+class ExecutionScheduler:
+    # 프로세스 공용: 작업마다 데몬 스레드 1개 — Streamlit 스크립트 스레드는 제출만 하고 바로 돌아간다
+    def __init__(self, max_jobs=EXEC_MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._jobs = {}             # job_id -> ExecutionJob (제출 순)
+        self._children = {}         # orderId -> (job, ChildOrder) — 스트림 체결 연결용
+        self._unmatched = OrderedDict()  # orderId -> [(topic, row)] — place_order 응답 전에 온 스트림 메시지
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def submit(self, client, symbol: str, side: str, notional: float, strategy: str = "twap", slices: int = 5,
+               duration: float = 60.0, slice_timeout: float = EXEC_ICEBERG_TIMEOUT, reduce_only: bool = False,
+               stream: bool = False):
+        # notional USDT 를 현재가로 수량 환산해 작업 등록 → (작업 또는 None, 메시지)
+        if strategy not in EXEC_STRATEGIES:
+            return None, f"❌ 지원하지 않는 집행 방식: {strategy}"
+        price = get_current_price(client, symbol, max_age=ORDER_QUOTE_MAX_AGE)
+        if price <= 0:
+            return None, "현재가 조회 실패"
+        sizer = get_sizer(client, symbol)
+        units = sizer.qty_units(notional, price)
+        plan = sizer.split(units, slices, price)
+        if not plan:
+            return None, sizer.min_notional_msg(sizer.units_qty(units) * price)
+        job = ExecutionJob(f"{strategy}-{next(self._ids)}", account_key(client), client, symbol, side, strategy,
+                           units, slices, duration, slice_timeout, sizer, reduce_only, self._register_child)
+        job.stream = stream
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+        threading.Thread(target=job.run, name=f"exec-{job.job_id}", daemon=True).start()
+        return job, f"✅ {strategy.upper()} 집행 시작: {side} {job.target_qty:g} {symbol} ({len(plan)}조각)"
+
+    def _register_child(self, job, child):
+        with self._lock:
+            self._children[child.order_id] = (job, child)
+            early = self._unmatched.pop(child.order_id, [])
+        for topic, row in early:
+            self._apply(child, topic, row)
+
+    @staticmethod
+    def _apply(child, topic, row):
+        if topic.startswith("order"):
+            child.apply_order(row)
+        else:
+            child.apply_execution(row)
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if not j.active]
+        for job in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job.job_id]
+            for child in job.children:
+                self._children.pop(child.order_id, None)
+
+    def on_stream(self, topic: str, rows):
+        # LiveAccountState 리스너: order/execution 스트림을 자식 주문에 반영
+        if not (topic.startswith("order") or topic.startswith("execution")):
+            return
+        matched = []
+        with self._lock:
+            for row in rows:
+                order_id = row.get("orderId")
+                if order_id in self._children:
+                    matched.append((self._children[order_id][1], row))
+                elif any(j.active for j in self._jobs.values()):
+                    self._unmatched.setdefault(order_id, []).append((topic, row))
+                    while len(self._unmatched) > EXEC_UNMATCHED_MAX:
+                        self._unmatched.popitem(last=False)
+        for child, row in matched:
+            self._apply(child, topic, row)
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or not job.active:
+            return False
+        job.cancel()
+        return True
+
+    def jobs(self, account=None):
+        with self._lock:
+            return [j for j in reversed(list(self._jobs.values())) if account is None or j.account == account]
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+@lru_cache(maxsize=None)
+def execution_scheduler() -> ExecutionScheduler:
+    return ExecutionScheduler()
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+from .account import iter_pages
+from .config import TRADE_CATEGORY
+
+# ── 체결 이력 저장소 (SQLite) ──
+HISTORY_DIR = os.environ.get("HISTORY_DIR", "history")             # 계정별 DB 파일 위치
+HISTORY_BACKFILL_DAYS = int(os.environ.get("HISTORY_BACKFILL_DAYS", "30"))  # 첫 동기화 때 가져올 기간
+HISTORY_WINDOW_MS = 7 * 24 * 3600 * 1000   # 이력 API 1회 조회 최대 구간 (7일)
+HISTORY_OVERLAP_MS = 60 * 1000             # 늦게 반영되는 기록을 위해 직전 구간과 겹쳐 조회
+HISTORY_PAGE_LIMIT = 100
+HISTORY_SYNC_INTERVAL = 60                 # 이력 탭 자동 동기화 최소 간격 (초)
+DAY_MS = 86400 * 1000
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS executions (
+    exec_id TEXT PRIMARY KEY, order_id TEXT, symbol TEXT NOT NULL, side TEXT,
+    price REAL, qty REAL, fee REAL, exec_type TEXT, closed_size REAL, exec_time INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS ix_executions_time ON executions (exec_time);
+CREATE INDEX IF NOT EXISTS ix_executions_symbol_time ON executions (symbol, exec_time);
+CREATE TABLE IF NOT EXISTS closed_pnl (
+    order_id TEXT NOT NULL, symbol TEXT NOT NULL, side TEXT, qty REAL, entry_price REAL,
+    exit_price REAL, closed_pnl REAL, created_time INTEGER, updated_time INTEGER NOT NULL,
+    PRIMARY KEY (order_id, created_time));
+CREATE INDEX IF NOT EXISTS ix_closed_pnl_time ON closed_pnl (updated_time);
+CREATE INDEX IF NOT EXISTS ix_closed_pnl_symbol_time ON closed_pnl (symbol, updated_time);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY, symbol TEXT NOT NULL, side TEXT, order_type TEXT, qty REAL,
+    price REAL, avg_price REAL, status TEXT, created_time INTEGER, updated_time INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS ix_orders_symbol_time ON orders (symbol, updated_time);
+CREATE TABLE IF NOT EXISTS sync_state (stream TEXT PRIMARY KEY, synced_until INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS daily_stats (
+    day INTEGER NOT NULL, symbol TEXT NOT NULL, trades INTEGER, wins INTEGER, pnl REAL, fees REAL,
+    fills INTEGER, PRIMARY KEY (day, symbol));
+"""
+
+# 동기화로 바뀐 날짜(UTC)만 closed_pnl/executions 에서 다시 집계
+DAILY_STATS_REBUILD = """
+INSERT INTO daily_stats
+SELECT day, symbol, SUM(trades), SUM(wins), SUM(pnl), SUM(fees), SUM(fills) FROM (
+    SELECT updated_time / 86400000 AS day, symbol, COUNT(*) AS trades, SUM(closed_pnl > 0) AS wins,
+           SUM(closed_pnl) AS pnl, 0 AS fees, 0 AS fills
+    FROM closed_pnl WHERE updated_time >= :start AND updated_time < :end GROUP BY day, symbol
+    UNION ALL
+    SELECT exec_time / 86400000, symbol, 0, 0, 0, SUM(fee), COUNT(*)
+    FROM executions WHERE exec_time >= :start AND exec_time < :end GROUP BY 1, 2
+) GROUP BY day, symbol
+"""
+
+def _f(row, key):
+    value = row.get(key)
+    return float(value) if value not in (None, "") else 0.0
+
+# 스트림별 (API 메서드, INSERT 문, 행 변환)
+HISTORY_STREAMS = {
+    "executions": (
+        "get_executions",
+        "INSERT OR IGNORE INTO executions VALUES (?,?,?,?,?,?,?,?,?,?)",
+        lambda r: (r["execId"], r.get("orderId"), r["symbol"], r.get("side"), _f(r, "execPrice"),
+                   _f(r, "execQty"), _f(r, "execFee"), r.get("execType"), _f(r, "closedSize"),
+                   int(r["execTime"])),
+    ),
+    "closed_pnl": (
+        "get_closed_pnl",
+        "INSERT OR REPLACE INTO closed_pnl VALUES (?,?,?,?,?,?,?,?,?)",
+        lambda r: (r["orderId"], r["symbol"], r.get("side"), _f(r, "qty"), _f(r, "avgEntryPrice"),
+                   _f(r, "avgExitPrice"), _f(r, "closedPnl"), int(r.get("createdTime") or r["updatedTime"]),
+                   int(r["updatedTime"])),
+    ),
+    "orders": (
+        "get_order_history",
+        "INSERT OR REPLACE INTO orders VALUES (?,?,?,?,?,?,?,?,?,?)",
+        lambda r: (r["orderId"], r["symbol"], r.get("side"), r.get("orderType"), _f(r, "qty"),
+                   _f(r, "price"), _f(r, "avgPrice"), r.get("orderStatus"),
+                   int(r.get("createdTime") or r["updatedTime"]), int(r["updatedTime"])),
+    ),
+}
+
+class HistoryStore:
+    # 체결/청산손익/주문 이력을 로컬 SQLite 에 쌓고, 스트림별 마지막 동기화 시각부터만 이어 받는다
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(HISTORY_SCHEMA)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.last_sync_at = 0.0
+
+    def synced_until(self, stream: str):
+        with self._lock:
+            row = self._conn.execute("SELECT synced_until FROM sync_state WHERE stream = ?", (stream,)).fetchone()
+        return row[0] if row else None
+
+    def sync(self, client, now_ms=None):
+        # 스트림별로 [마지막 동기화 시각 - 겹침, 현재] 구간을 7일 단위로 나눠 조회 → 저장한 행 수
+        now_ms = now_ms or int(time.time() * 1000)
+        counts = {}
+        with self._sync_lock:
+            touched_from = now_ms
+            for stream, (method, insert_sql, convert) in HISTORY_STREAMS.items():
+                until = self.synced_until(stream)
+                start = until - HISTORY_OVERLAP_MS if until else now_ms - HISTORY_BACKFILL_DAYS * DAY_MS
+                touched_from = min(touched_from, start)
+                fetch = getattr(client, method)
+                counts[stream] = 0
+                while start < now_ms:
+                    end = min(start + HISTORY_WINDOW_MS, now_ms)
+                    rows = [convert(r) for r in iter_pages(fetch, category=TRADE_CATEGORY, startTime=start,
+                                                           endTime=end, limit=HISTORY_PAGE_LIMIT)]
+                    with self._lock, self._conn:
+                        self._conn.executemany(insert_sql, rows)
+                        # 구간 단위로 진행 상황 기록 → 중간에 실패해도 다음 동기화는 여기서 이어감
+                        self._conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", (stream, end))
+                    counts[stream] += len(rows)
+                    start = end
+            self._rebuild_daily(touched_from, now_ms)
+            self.last_sync_at = time.time()
+        return counts
+
+    def _rebuild_daily(self, start_ms, end_ms):
+        start = start_ms // DAY_MS * DAY_MS
+        end = (end_ms // DAY_MS + 1) * DAY_MS
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM daily_stats WHERE day >= ? AND day < ?", (start // DAY_MS, end // DAY_MS))
+            self._conn.execute(DAILY_STATS_REBUILD, {"start": start, "end": end})
+
+    # ── 조회 ──
+    # 손익/수수료/승률은 일별 집계(daily_stats)에서 읽는다 → since_ms 는 UTC 날짜 단위로 내림
+    def _where(self, column, symbol=None, since=None):
+        clauses, params = [], []
+        if symbol:
+            clauses.append("symbol = ?")
+            params.append(symbol)
+        if since:
+            clauses.append(f"{column} >= ?")
+            params.append(int(since))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _day_where(self, symbol=None, since_ms=None):
+        return self._where("day", symbol, since_ms // DAY_MS if since_ms else None)
+
+    def query(self, sql, params=()):
+        import pandas as pd
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=list(params))
+
+    def pnl_summary(self, symbol=None, since_ms=None):
+        where, params = self._day_where(symbol, since_ms)
+        with self._lock:
+            pnl, trades, wins, fees, fills = self._conn.execute(
+                "SELECT COALESCE(SUM(pnl), 0), COALESCE(SUM(trades), 0), COALESCE(SUM(wins), 0), "
+                f"COALESCE(SUM(fees), 0), COALESCE(SUM(fills), 0) FROM daily_stats{where}", params).fetchone()
+        return {"realized_pnl": pnl, "trades": trades, "wins": wins,
+                "win_rate": wins / trades if trades else 0.0, "fees": fees, "fills": fills}
+
+    def daily_pnl(self, symbol=None, since_ms=None):
+        where, params = self._day_where(symbol, since_ms)
+        return self.query(
+            "SELECT date(day * 86400, 'unixepoch') AS day, SUM(pnl) AS pnl, SUM(trades) AS trades "
+            f"FROM daily_stats{where} GROUP BY daily_stats.day ORDER BY daily_stats.day", params)
+
+    def symbol_breakdown(self, since_ms=None):
+        where, params = self._day_where(None, since_ms)
+        return self.query(
+            "SELECT symbol, SUM(trades) AS trades, SUM(pnl) AS pnl, "
+            "CAST(SUM(wins) AS REAL) / MAX(SUM(trades), 1) AS win_rate, SUM(fees) AS fees "
+            f"FROM daily_stats{where} GROUP BY symbol HAVING SUM(trades) > 0 OR SUM(fills) > 0 "
+            "ORDER BY pnl DESC", params)
+
+    def recent_executions(self, symbol=None, since_ms=None, limit=200):
+        where, params = self._where("exec_time", symbol, since_ms)
+        return self.query(
+            f"SELECT exec_time, symbol, side, price, qty, fee, closed_size, order_id FROM executions{where} "
+            f"ORDER BY exec_time DESC LIMIT ?", params + [int(limit)])
+
+def history_path(api_key: str, testnet: bool) -> str:
+    # 키 원문 대신 해시로 계정별 파일 구분
+    account = hashlib.sha256(api_key.encode()).hexdigest()[:12]
+    return os.path.join(HISTORY_DIR, f"{'testnet' if testnet else 'mainnet'}_{account}.db")
+
+@lru_cache(maxsize=None)
+def history_store(path: str) -> HistoryStore:
+    # 같은 DB 파일은 프로세스 전체에서 연결 하나를 공유
+    return HistoryStore(path)
+
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+from .client import public_client_for
+from .config import TRADE_CATEGORY
+
+logger = logging.getLogger(__name__)
+
+# ── 캔들(kline) 캐시 ──
+KLINE_DIR = os.environ.get("KLINE_DIR", "klines")   # 심볼·주기별 캔들 파일 위치
+KLINE_INTERVALS = {"1": 60_000, "5": 300_000, "15": 900_000, "60": 3_600_000,
+                   "240": 14_400_000, "D": 86_400_000}     # Bybit interval → 봉 길이 (ms)
+KLINE_LABELS = {"1": "1분", "5": "5분", "15": "15분", "60": "1시간", "240": "4시간", "D": "1일"}
+KLINE_COLUMNS = ("start", "open", "high", "low", "close", "volume")
+KLINE_ROW_BYTES = len(KLINE_COLUMNS) * 8
+KLINE_PAGE_LIMIT = 1000      # get_kline 1회 최대 봉 수
+KLINE_REFRESH = 5.0          # 같은 시리즈 재조회 최소 간격 (초) — 진행 중인 마지막 봉 갱신용
+KLINE_MAX_OPEN = 32          # 동시에 열어 두는 시리즈 수 (LRU)
+KLINE_MAX_ROWS = 50_000      # 시리즈당 디스크 보관 최대 봉 수 (넘으면 오래된 봉부터 정리)
+KLINE_MAX_TAIL_PAGES = 3     # 호출 스레드(화면)에서 꼬리 공백을 받는 최대 페이지 수 — 넘으면 백그라운드로 메운다
+
+class KlineSeries:
+    # 한 (심볼, 주기) 의 봉을 시간순 float64 행 [start, open, high, low, close, volume] 으로 파일에 저장
+    # 읽기는 memmap 이라 슬라이스는 복사 없이 페이지 캐시를 그대로 본다
+    # 파일은 덮어쓰기/이어쓰기로만 커지고, 줄일 때는 새 파일로 교체 → 이미 내준 뷰가 깨지지 않는다
+    __slots__ = ("path", "lock", "checked_at", "head_done", "filling", "_map")
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.checked_at = 0.0
+        self.head_done = False     # 상장 이전 구간처럼 더 과거 봉이 없음을 확인
+        self.filling = False       # 오래 비어 있던 구간을 백그라운드에서 받는 중
+        self._map = None
+
+    def rows(self):
+        try:
+            n = os.path.getsize(self.path) // KLINE_ROW_BYTES
+        except FileNotFoundError:
+            n = 0
+        if n == 0:
+            return np.empty((0, len(KLINE_COLUMNS)))
+        if self._map is None or len(self._map) != n:
+            self._map = np.memmap(self.path, dtype=np.float64, mode="r", shape=(n, len(KLINE_COLUMNS)))
+        return self._map
+
+    def write(self, bars):
+        # bars 첫 봉 시각부터 덮어쓰고 이어 붙인다 (진행 중이던 마지막 봉도 최신 값으로 교체)
+        if not len(bars):
+            return
+        rows = self.rows()
+        idx = int(np.searchsorted(rows[:, 0], bars[0, 0])) if len(rows) else 0
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "r+b" if os.path.exists(self.path) else "wb") as fh:
+            fh.seek(idx * KLINE_ROW_BYTES)
+            fh.write(np.ascontiguousarray(bars, dtype=np.float64).tobytes())
+
+    def _replace(self, rows):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(np.ascontiguousarray(rows, dtype=np.float64).tobytes())
+        os.replace(tmp, self.path)
+        self._map = None
+
+    def prepend(self, bars):
+        rows = self.rows()
+        self._replace(np.concatenate([bars, rows[rows[:, 0] > bars[-1, 0]]]))
+
+    def compact(self, max_rows):
+        rows = self.rows()
+        if len(rows) > max_rows:
+            self._replace(rows[-max_rows:])
+
+class KlineCache:
+    # 심볼·주기별 시리즈를 디스크에 쌓고, 비어 있는 꼬리(마지막 봉 ~ 현재)만 받아 붙인다
+    # 메모리는 열린 memmap 수(KLINE_MAX_OPEN)로 제한 — 실제 데이터는 OS 페이지 캐시가 관리
+    def __init__(self, root, max_open=KLINE_MAX_OPEN, max_rows=KLINE_MAX_ROWS, refresh=KLINE_REFRESH):
+        self.root = root
+        self.max_open = max_open
+        self.max_rows = max_rows
+        self.refresh = refresh
+        self._series = OrderedDict()    # (symbol, interval) -> KlineSeries
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.bars_fetched = 0
+
+    def _series_for(self, symbol, interval):
+        key = (symbol, interval)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = KlineSeries(os.path.join(self.root, f"{symbol}_{interval}.f64"))
+                self._series[key] = series
+            self._series.move_to_end(key)
+            excess = len(self._series) - self.max_open
+            if excess > 0:
+                # 공백 보충 중인 시리즈는 남긴다 — 같은 파일에 잠금이 다른 새 객체가 생기면 서로 덮어쓴다
+                idle = [k for k, s in self._series.items() if k != key and not s.filling]
+                for old in idle[:excess]:
+                    del self._series[old]
+            return series
+
+    def _fetch(self, client, symbol, interval, start, end):
+        # [start, end] 구간을 1000봉 단위로 나눠 받아 시간순 배열로
+        step = KLINE_INTERVALS[interval]
+        chunks = []
+        while start <= end:
+            stop = min(end, start + (KLINE_PAGE_LIMIT - 1) * step)
+            resp = client.get_kline(category=TRADE_CATEGORY, symbol=symbol, interval=interval,
+                                    start=int(start), end=int(stop), limit=KLINE_PAGE_LIMIT)
+            rows = resp.get("result", {}).get("list", [])
+            self.fetches += 1
+            if rows:
+                # 응답은 최신순 문자열 [start, open, high, low, close, volume, turnover]
+                chunks.append(np.array([r[:len(KLINE_COLUMNS)] for r in rows], dtype=np.float64)[::-1])
+                self.bars_fetched += len(rows)
+            start = stop + step
+        return np.concatenate(chunks) if chunks else np.empty((0, len(KLINE_COLUMNS)))
+
+    def get(self, client, symbol: str, interval: str, bars: int = 200):
+        # 최근 bars 개 봉 (memmap 슬라이스 — 복사 없음)
+        step = KLINE_INTERVALS[interval]
+        series = self._series_for(symbol, interval)
+        with series.lock:
+            if time.time() - series.checked_at >= self.refresh:
+                current = int(time.time() * 1000) // step * step
+                want_from = current - (bars - 1) * step
+                rows = series.rows()
+                if not len(rows):
+                    series.write(self._fetch(client, symbol, interval, want_from, current))
+                elif series.filling:
+                    series.write(self._fetch(client, symbol, interval, max(rows[-1, 0], want_from), current))
+                elif current - rows[-1, 0] > (KLINE_MAX_TAIL_PAGES * KLINE_PAGE_LIMIT - 1) * step:
+                    self._start_gap_fill(client, series, symbol, interval, rows, want_from, current)
+                else:
+                    series.write(self._fetch(client, symbol, interval, rows[-1, 0], current))
+                    first = series.rows()[0, 0]
+                    if first > want_from and not series.head_done:
+                        head = self._fetch(client, symbol, interval, want_from, first - step)
+                        if len(head):
+                            series.prepend(head)
+                        else:
+                            series.head_done = True
+                series.compact(self.max_rows)
+                series.checked_at = time.time()
+            return series.rows()[-bars:]
+
+    def _start_gap_fill(self, client, series, symbol, interval, rows, want_from, current):
+        # 오래 쉬었다 열면 꼬리 공백이 수십 페이지 — 화면에는 최근 구간만 받아 바로 보여주고,
+        # 이전 봉과 그 사이 공백은 백그라운드에서 받아 이어 붙인다 (series.lock 을 잡은 상태로 호출)
+        step = KLINE_INTERVALS[interval]
+        gap_from = max(rows[-1, 0], current - (self.max_rows - 1) * step)
+        gap_to = want_from - step
+        old = np.array(rows[rows[:, 0] < gap_from])     # 파일을 교체하므로 복사해 둔다
+        series._replace(self._fetch(client, symbol, interval, want_from, current))
+        series.filling = True
+
+        def fill():
+            try:
+                gap = self._fetch(client, symbol, interval, gap_from, gap_to)
+            except Exception as e:
+                logger.warning(f"{symbol} {interval} 캔들 공백 보충 실패 (최근 구간만 유지): {e}")
+                gap = None
+            with series.lock:
+                if gap is not None:
+                    recent = series.rows()
+                    series._replace(np.concatenate([old, gap, recent[recent[:, 0] > gap_to]]))
+                    series.compact(self.max_rows)
+                series.filling = False
+
+        threading.Thread(target=fill, name=f"kline-gap-{symbol}-{interval}", daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            open_series = len(self._series)
+        try:
+            files = [e for e in os.scandir(self.root) if e.name.endswith(".f64")]
+        except FileNotFoundError:
+            files = []
+        return {"open": open_series, "files": len(files), "bytes": sum(e.stat().st_size for e in files),
+                "fetches": self.fetches, "bars_fetched": self.bars_fetched}
+
+@lru_cache(maxsize=None)
+def kline_cache(testnet: bool = False) -> KlineCache:
+    # 프로세스 전체 공유 (메인넷/테스트넷 별도 디렉터리)
+    return KlineCache(os.path.join(KLINE_DIR, "testnet" if testnet else "mainnet"))
+
+
+def fetch_klines(client, symbol: str, interval: str, bars: int = 200):
+    # 클라이언트의 메인넷/테스트넷에 맞는 캐시에서 공개 클라이언트로 조회
+    cache = kline_cache(bool(getattr(client, "testnet", False)))
+    return cache.get(public_client_for(client), symbol, interval, bars)
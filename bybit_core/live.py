@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from .account import fetch_raw_open_orders, fetch_raw_positions, parse_open_orders, parse_positions
+from .client import client_pool
+from .config import SETTLE_COIN, TRADE_CATEGORY
+from .orderbook import depth_cache_for
+
+logger = logging.getLogger(__name__)
+
+# ── 실시간 계정 상태 (WebSocket) ──
+LIVE_WATCHDOG_INTERVAL = 1.0   # 연결 상태 점검 주기 (초)
+# 이 상태가 되면 미체결 목록에서 제거
+CLOSED_ORDER_STATUSES = {"Filled", "Cancelled", "Rejected", "Deactivated", "PartiallyFilledCanceled"}
+
+def _pybit_ws_factory(api_key, api_secret, testnet):
+    from pybit.unified_trading import WebSocket
+
+    def factory(channel_type):
+        if channel_type == "private":
+            return WebSocket(testnet=testnet, channel_type="private",
+                             api_key=api_key, api_secret=api_secret)
+        return WebSocket(testnet=testnet, channel_type=channel_type)
+    return factory
+
+class LiveAccountState:
+    # private(position/order/execution/wallet) + public ticker 스트림을 메모리 테이블에 반영
+    # 재연결·시퀀스 역행·스냅샷 없는 delta 를 감지하면 그때만 REST 로 재동기화
+    def __init__(self, client, ws_factory, watchdog_interval=LIVE_WATCHDOG_INTERVAL):
+        self.client = client
+        self.ws_factory = ws_factory
+        self.watchdog_interval = watchdog_interval
+        self.positions = {}     # (symbol, positionIdx) -> 거래소 원본 dict
+        self.orders = {}        # orderId -> 거래소 원본 dict
+        self.wallet = {}        # coin -> 거래소 원본 dict
+        self.tickers = {}       # symbol -> 병합된 ticker dict
+        self.executions = deque(maxlen=500)
+        self.version = 0
+        self.account_version = 0   # 포지션/주문/지갑이 바뀔 때만 증가 (시세 틱은 제외)
+        self.resync_count = 0
+        self.last_message_at = 0.0
+        self.last_resync_at = 0.0
+        self.ready = False
+        self._seq = {}          # (symbol, positionIdx) -> 마지막 seq
+        self._ticker_seq = {}   # symbol -> 마지막 cs
+        self._lock = threading.RLock()
+        self._resyncing = False
+        self._pending = []      # 재동기화 중 도착한 메시지
+        self._needs_resync = True
+        self._ticker_resync = set()
+        self._private_ws = None
+        self._public_ws = None
+        self._ticker_symbols = set()
+        self._book_symbols = set()
+        self._listeners = []    # order/execution/tickers 메시지를 받을 콜백 (topic, rows)
+        self._was_connected = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ── 수명 주기 ──
+    def start(self):
+        self._private_ws = self.ws_factory("private")
+        self._private_ws.position_stream(callback=self._on_private)
+        self._private_ws.order_stream(callback=self._on_private)
+        self._private_ws.execution_stream(callback=self._on_private)
+        self._private_ws.wallet_stream(callback=self._on_private)
+        self._thread = threading.Thread(target=self._watchdog, name="live-account", daemon=True)
+        self._thread.start()
+        self.resync()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for ws in (self._private_ws, self._public_ws):
+            if ws is not None and hasattr(ws, "exit"):
+                ws.exit()
+
+    def subscribe_ticker(self, symbol: str):
+        with self._lock:
+            if symbol in self._ticker_symbols:
+                return
+            self._ticker_symbols.add(symbol)
+            if self._public_ws is None:
+                self._public_ws = self.ws_factory(TRADE_CATEGORY)
+        self._public_ws.ticker_stream(symbol=symbol, callback=self._on_ticker)
+
+    def subscribe_orderbook(self, symbol: str):
+        # 호가는 공유 DepthCache 에 직접 반영 (주문 경로의 슬리피지 추정이 REST 없이 읽는다)
+        with self._lock:
+            if symbol in self._book_symbols:
+                return
+            self._book_symbols.add(symbol)
+            if self._public_ws is None:
+                self._public_ws = self.ws_factory(TRADE_CATEGORY)
+        depth_cache_for(self.client).stream(self._public_ws, symbol)
+
+    def add_listener(self, callback):
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    # ── 메시지 처리 ──
+    def _on_private(self, message):
+        with self._lock:
+            self.last_message_at = time.time()
+            if self._resyncing:
+                self._pending.append(message)
+                return
+            self._apply_private(message)
+
+    def _apply_private(self, message):
+        topic = message.get("topic", "")
+        data = message.get("data", [])
+        if topic.startswith("position"):
+            for p in data:
+                self._apply_position(p)
+        elif topic.startswith("order"):
+            for o in data:
+                if o.get("category", TRADE_CATEGORY) != TRADE_CATEGORY:
+                    continue
+                if o.get("orderStatus") in CLOSED_ORDER_STATUSES:
+                    self.orders.pop(o.get("orderId"), None)
+                else:
+                    self.orders[o.get("orderId")] = o
+            self._notify(topic, data)
+        elif topic.startswith("execution"):
+            self.executions.extend(data)
+            self._notify(topic, data)
+        elif topic.startswith("wallet"):
+            for account in data:
+                for coin in account.get("coin", []):
+                    self.wallet[coin.get("coin")] = coin
+        else:
+            return
+        self.version += 1
+        if not topic.startswith("execution"):
+            self.account_version += 1
+
+    def _notify(self, topic, rows):
+        for callback in self._listeners:
+            try:
+                callback(topic, rows)
+            except Exception as e:
+                logger.warning(f"스트림 리스너 오류: {e}")
+
+    def _apply_position(self, p):
+        if p.get("category", TRADE_CATEGORY) != TRADE_CATEGORY:
+            return
+        key = (p.get("symbol"), int(p.get("positionIdx", 0)))
+        seq = int(p.get("seq", -1))
+        last = self._seq.get(key)
+        if last is not None and 0 <= seq < last:
+            # 시퀀스 역행 → 순서가 꼬였으므로 REST 로 다시 맞춘다
+            logger.info(f"{key} 포지션 seq 역행 ({last} → {seq}), 재동기화 예약")
+            self._needs_resync = True
+            return
+        if seq >= 0:
+            self._seq[key] = seq
+        if float(p.get("size", 0) or 0) > 0:
+            self.positions[key] = p
+        else:
+            self.positions.pop(key, None)
+
+    def _on_ticker(self, message):
+        data = message.get("data", {})
+        symbol = data.get("symbol")
+        if not symbol:
+            return
+        with self._lock:
+            self.last_message_at = time.time()
+            cs = message.get("cs")
+            last_cs = self._ticker_seq.get(symbol)
+            if message.get("type") == "snapshot":
+                self.tickers[symbol] = dict(data)
+            elif symbol not in self.tickers or (cs is not None and last_cs is not None and cs < last_cs):
+                # 스냅샷 없이 delta 만 왔거나 순서가 역행 → 해당 심볼만 REST 재조회
+                self._ticker_resync.add(symbol)
+                return
+            else:
+                self.tickers[symbol].update(data)
+            if cs is not None:
+                self._ticker_seq[symbol] = cs
+            self.version += 1
+            self._notify(message.get("topic", f"tickers.{symbol}"), [self.tickers[symbol]])
+
+    # ── REST 재동기화 ──
+    def resync(self):
+        with self._lock:
+            self._resyncing = True
+            self._needs_resync = False
+        try:
+            positions = fetch_raw_positions(self.client)
+            orders = fetch_raw_open_orders(self.client)
+            wallet = self.client.get_wallet_balance(accountType="UNIFIED", coin=SETTLE_COIN)
+        except Exception as e:
+            logger.warning(f"실시간 상태 재동기화 실패: {e}")
+            with self._lock:
+                self._resyncing = False
+                self._needs_resync = True
+                pending, self._pending = self._pending, []
+                for message in pending:
+                    self._apply_private(message)
+            return False
+        with self._lock:
+            self.positions = {}
+            self._seq = {}
+            for p in positions:
+                self._apply_position(p)
+            self.orders = {o.get("orderId"): o for o in orders}
+            self.wallet = {}
+            for account in wallet.get("result", {}).get("list", []):
+                for coin in account.get("coin", []):
+                    self.wallet[coin.get("coin")] = coin
+            # 스냅샷 이후 도착한 메시지는 그대로 재적용 (객체 전체 상태라 멱등)
+            pending, self._pending = self._pending, []
+            for message in pending:
+                self._apply_private(message)
+            self._resyncing = False
+            self.ready = True
+            self.resync_count += 1
+            self.last_resync_at = time.time()
+            self.version += 1
+            self.account_version += 1
+        return True
+
+    def _resync_tickers(self, symbols):
+        for symbol in symbols:
+            try:
+                rows = self.client.get_tickers(category=TRADE_CATEGORY, symbol=symbol)["result"]["list"]
+            except Exception as e:
+                logger.warning(f"{symbol} 티커 재동기화 실패: {e}")
+                continue
+            with self._lock:
+                if rows:
+                    self.tickers[symbol] = dict(rows[0])
+                    self._ticker_seq.pop(symbol, None)
+                    self.version += 1
+
+    def _check_reconnect(self, name, ws):
+        if ws is None or not hasattr(ws, "is_connected"):
+            return False
+        connected = bool(ws.is_connected())
+        was = self._was_connected.get(name)
+        self._was_connected[name] = connected
+        return connected and was is False
+
+    def _watchdog(self):
+        while not self._stop.wait(self.watchdog_interval):
+            if self._check_reconnect("private", self._private_ws):
+                logger.info("private 스트림 재연결 감지 → 재동기화")
+                self._needs_resync = True
+            if self._check_reconnect("public", self._public_ws):
+                with self._lock:
+                    self._ticker_resync.update(self._ticker_symbols)
+                    book_symbols = set(self._book_symbols)
+                depth_cache_for(self.client).mark_stale(book_symbols)
+            if self._needs_resync:
+                self.resync()
+            with self._lock:
+                symbols, self._ticker_resync = self._ticker_resync, set()
+            if symbols:
+                self._resync_tickers(symbols)
+
+    # ── 조회 ──
+    def snapshot(self):
+        with self._lock:
+            usdt = self.wallet.get(SETTLE_COIN, {})
+            snap = {
+                "positions": parse_positions(list(self.positions.values())),
+                "open_orders": parse_open_orders(list(self.orders.values())),
+                "account_version": self.account_version,
+            }
+            if usdt:
+                snap["balance"] = float(usdt.get("walletBalance", 0) or 0)
+            return snap
+
+    def last_price(self, symbol: str):
+        with self._lock:
+            ticker = self.tickers.get(symbol)
+            return float(ticker["lastPrice"]) if ticker and ticker.get("lastPrice") else None
+
+@lru_cache(maxsize=None)
+def live_account_state(api_key: str, api_secret: str, testnet: bool) -> LiveAccountState:
+    # 자격 증명별 1개, 프로세스 전체에서 공유
+    client = client_pool().authenticated(api_key, api_secret, testnet)
+    return LiveAccountState(client, _pybit_ws_factory(api_key, api_secret, testnet)).start()
+
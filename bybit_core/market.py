@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from .account import iter_pages
+from .client import public_client_for
+from .config import PRECISION_REJECT_CODES, TRADE_CATEGORY
+from .sizing import DEFAULT_INSTRUMENT, OrderSizer
+
+logger = logging.getLogger(__name__)
+
+INSTRUMENT_CACHE_TTL = 3600        # 심볼 스펙 캐시 유효시간 (초)
+INSTRUMENT_CACHE_MAXSIZE = 2048    # 캐시에 보관할 최대 심볼 수
+INSTRUMENT_BULK_INTERVAL = 60      # 전체 재로딩 최소 간격 (초)
+
+# ── 시세 스냅샷 캐시 ──
+TICKER_MAX_AGE = 3.0          # 화면 표시용 허용 지연 (초)
+ORDER_QUOTE_MAX_AGE = 0.5     # 주문 수량 계산 시 허용 지연 (초)
+
+class TickerCache:
+    # linear 전체 티커를 한 번에 받아 메모리에서 O(1) 조회
+    # 여러 세션이 같은 주기에 요청해도 업스트림 호출은 한 번만 나간다
+    def __init__(self):
+        self._tickers = {}      # symbol -> (수신 시각, ticker dict)
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self.bulk_fetched_at = 0.0
+        self.bulk_fetches = 0
+        self.single_fetches = 0
+        self.hits = 0
+
+    def _store(self, rows, fetched_at):
+        with self._lock:
+            for row in rows:
+                self._tickers[row["symbol"]] = (fetched_at, row)
+
+    def refresh_all(self, client):
+        rows = client.get_tickers(category=TRADE_CATEGORY)["result"]["list"]
+        self._store(rows, time.time())
+        self.bulk_fetched_at = time.time()
+        self.bulk_fetches += 1
+
+    def refresh_symbol(self, client, symbol: str):
+        rows = client.get_tickers(category=TRADE_CATEGORY, symbol=symbol)["result"]["list"]
+        self._store(rows, time.time())
+        self.single_fetches += 1
+
+    def age(self, symbol: str) -> float:
+        with self._lock:
+            entry = self._tickers.get(symbol)
+        return time.time() - entry[0] if entry else float("inf")
+
+    def get(self, client, symbol: str, max_age: float = TICKER_MAX_AGE, bulk: bool = True):
+        # bulk=False 는 주문 경로용: 해당 심볼만 즉시 새로 받는다
+        if self.age(symbol) <= max_age:
+            self.hits += 1
+        else:
+            with self._fetch_lock:
+                if self.age(symbol) > max_age:
+                    if bulk and time.time() - self.bulk_fetched_at > max_age:
+                        self.refresh_all(client)
+                    if self.age(symbol) > max_age:
+                        self.refresh_symbol(client, symbol)
+        with self._lock:
+            entry = self._tickers.get(symbol)
+        if entry is None:
+            raise KeyError(f"{symbol} 티커 없음")
+        return entry[1]
+
+@lru_cache(maxsize=None)
+def ticker_cache(testnet: bool = False) -> TickerCache:
+    return TickerCache()
+
+def _ticker_cache_for(client) -> TickerCache:
+    return ticker_cache(bool(getattr(client, "testnet", False)))
+
+# ── 현재가 조회 ──
+def get_current_price(client, symbol: str, max_age: float = TICKER_MAX_AGE):
+    try:
+        bulk = max_age > ORDER_QUOTE_MAX_AGE
+        ticker = _ticker_cache_for(client).get(public_client_for(client), symbol, max_age, bulk=bulk)
+        return float(ticker["lastPrice"])
+    except Exception as e:
+        logger.error(f"💹 현재가 조회 실패: {e}")
+        return 0
+
+def quote_age(client, symbol: str) -> float:
+    return _ticker_cache_for(client).age(symbol)
+
+# ── 심볼 스펙 캐시 ──
+class InstrumentSpecCache:
+    # linear 전체 심볼 스펙을 한 번에 받아 심볼별로 보관 (TTL 만료 + LRU 제거)
+    def __init__(self, ttl=INSTRUMENT_CACHE_TTL, maxsize=INSTRUMENT_CACHE_MAXSIZE,
+                 bulk_interval=INSTRUMENT_BULK_INTERVAL):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.bulk_interval = bulk_interval
+        self._entries = OrderedDict()  # symbol -> (만료시각, instrument info)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._bulk_loaded_at = 0.0
+        self._sizers = {}              # symbol -> (instrument info, OrderSizer)
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, symbol):
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[symbol]
+                self._sizers.pop(symbol, None)
+                return None
+            self._entries.move_to_end(symbol)
+            return entry[1]
+
+    def _store(self, infos):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            for info in infos:
+                self._entries[info["symbol"]] = (expires_at, info)
+                self._entries.move_to_end(info["symbol"])
+            while len(self._entries) > self.maxsize:
+                # 스펙과 함께 계산해 둔 OrderSizer 도 버린다 (스펙보다 오래 남지 않도록)
+                evicted, _ = self._entries.popitem(last=False)
+                self._sizers.pop(evicted, None)
+
+    def load_all(self, client):
+        infos = list(iter_pages(client.get_instruments_info, category=TRADE_CATEGORY, limit=1000))
+        self._store(infos)
+        self._bulk_loaded_at = time.time()
+        return len(infos)
+
+    def get(self, client, symbol: str):
+        info = self._lookup(symbol)
+        if info is not None:
+            self.hits += 1
+            return info
+        self.misses += 1
+        with self._load_lock:
+            # 다른 스레드가 먼저 로딩했을 수 있음
+            info = self._lookup(symbol)
+            if info is not None:
+                return info
+            if time.time() - self._bulk_loaded_at > self.bulk_interval:
+                self.load_all(client)
+                info = self._lookup(symbol)
+                if info is not None:
+                    return info
+            # 신규 상장 등 전체 목록에 없는 심볼은 단건 조회
+            resp = client.get_instruments_info(category=TRADE_CATEGORY, symbol=symbol)
+            infos = resp["result"]["list"]
+            self._store(infos)
+            return infos[0]
+
+    def sizer(self, client, symbol: str):
+        # 스펙이 갱신되지 않았으면 미리 계산해 둔 OrderSizer 재사용
+        info = self.get(client, symbol)
+        with self._lock:
+            cached = self._sizers.get(symbol)
+            if cached is None or cached[0] is not info:
+                cached = (info, OrderSizer.from_info(info))
+                if symbol in self._entries:     # 그 사이 제거된 스펙이면 보관하지 않는다
+                    self._sizers[symbol] = cached
+        return cached[1]
+
+    def invalidate(self, symbol=None):
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+                self._sizers.clear()
+                self._bulk_loaded_at = 0.0
+            else:
+                self._entries.pop(symbol, None)
+                self._sizers.pop(symbol, None)
+
+@lru_cache(maxsize=None)
+def instrument_cache(testnet: bool = False) -> InstrumentSpecCache:
+    # 프로세스 전체 공유 (메인넷/테스트넷 별도)
+    return InstrumentSpecCache()
+
+def _instrument_cache_for(client) -> InstrumentSpecCache:
+    return instrument_cache(bool(getattr(client, "testnet", False)))
+
+def _invalidate_on_precision_reject(client, symbol: str, code):
+    if code in PRECISION_REJECT_CODES:
+        logger.info(f"{symbol} 정밀도 거부(retCode={code}) → 스펙 캐시 무효화")
+        _instrument_cache_for(client).invalidate(symbol)
+
+# ── 심볼 정보 조회 ──
+def get_sizer(client, symbol: str) -> OrderSizer:
+    try:
+        return _instrument_cache_for(client).sizer(public_client_for(client), symbol)
+    except Exception as e:
+        logger.error(f"🔍 심볼 정보 조회 실패: {e}")
+        return OrderSizer.from_info(dict(DEFAULT_INSTRUMENT, symbol=symbol))
+
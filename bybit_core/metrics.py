@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+# ── 호출 계측 ──
+METRICS_RING_SIZE = 512        # 호출별 최근 지연시간 보관 개수
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # 히스토그램 구간 (초)
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+class CallStats:
+    __slots__ = ("count", "errors", "total", "buckets", "recent", "ret_codes",
+                 "limit", "remaining", "reset_at", "headroom")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)   # 마지막 칸은 +Inf
+        self.recent = deque(maxlen=METRICS_RING_SIZE)
+        self.ret_codes = {}
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        self.headroom = deque(maxlen=METRICS_RING_SIZE)   # 남은 한도 비율 기록
+
+class MetricsRegistry:
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = CallStats()
+        return stats
+
+    def observe(self, name: str, seconds: float, ret_code=0):
+        with self._lock:
+            stats = self._get(name)
+            stats.count += 1
+            stats.total += seconds
+            stats.recent.append(seconds)
+            idx = next((i for i, b in enumerate(LATENCY_BUCKETS) if seconds <= b), len(LATENCY_BUCKETS))
+            stats.buckets[idx] += 1
+            if ret_code:
+                stats.errors += 1
+                stats.ret_codes[str(ret_code)] = stats.ret_codes.get(str(ret_code), 0) + 1
+
+    def observe_rate_limit(self, name: str, headers):
+        if not headers:
+            return
+        remaining = headers.get("X-Bapi-Limit-Status")
+        limit = headers.get("X-Bapi-Limit")
+        if remaining is None:
+            return
+        with self._lock:
+            stats = self._get(name)
+            stats.remaining = int(remaining)
+            stats.limit = int(limit) if limit else stats.limit
+            reset = headers.get("X-Bapi-Limit-Reset-Timestamp")
+            stats.reset_at = int(reset) / 1000 if reset else None
+            if stats.limit:
+                stats.headroom.append(stats.remaining / stats.limit)
+
+    def snapshot(self):
+        with self._lock:
+            rows = {}
+            for name, stats in sorted(self._stats.items()):
+                recent = sorted(stats.recent)
+                rows[name] = {
+                    "count": stats.count,
+                    "errors": stats.errors,
+                    "p50_ms": _percentile(recent, 0.50) * 1000,
+                    "p95_ms": _percentile(recent, 0.95) * 1000,
+                    "p99_ms": _percentile(recent, 0.99) * 1000,
+                    "max_ms": (recent[-1] if recent else 0.0) * 1000,
+                    "ret_codes": dict(stats.ret_codes),
+                    "limit": stats.limit,
+                    "remaining": stats.remaining,
+                    "min_headroom": min(stats.headroom) if stats.headroom else None,
+                    "buckets": list(stats.buckets),
+                    "sum": stats.total,
+                }
+            return rows
+
+    def to_json(self):
+        return json.dumps({"generated_at": time.time(), "calls": self.snapshot()}, ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        snap = self.snapshot()
+        lines = ["# TYPE dashboard_call_latency_seconds histogram"]
+        for name, row in snap.items():
+            cumulative = 0
+            for bound, n in zip(list(LATENCY_BUCKETS) + ["+Inf"], row["buckets"]):
+                cumulative += n
+                lines.append(f'dashboard_call_latency_seconds_bucket{{call="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'dashboard_call_latency_seconds_sum{{call="{name}"}} {row["sum"]:.6f}')
+            lines.append(f'dashboard_call_latency_seconds_count{{call="{name}"}} {row["count"]}')
+        lines.append("# TYPE dashboard_call_errors_total counter")
+        for name, row in snap.items():
+            for code, n in row["ret_codes"].items():
+                lines.append(f'dashboard_call_errors_total{{call="{name}",ret_code="{code}"}} {n}')
+        for field in ("remaining", "limit"):
+            lines.append(f"# TYPE dashboard_rate_limit_{field} gauge")
+            for name, row in snap.items():
+                if row[field] is not None:
+                    lines.append(f'dashboard_rate_limit_{field}{{call="{name}"}} {row[field]}')
+        return "\n".join(lines) + "\n"
+
+@lru_cache(maxsize=None)
+def metrics_registry() -> MetricsRegistry:
+    return MetricsRegistry()
+
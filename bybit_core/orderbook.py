@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import accumulate
+
+from .client import public_client_for
+from .config import TRADE_CATEGORY
+
+logger = logging.getLogger(__name__)
+
+# ── 호가창 (L2) ──
+ORDERBOOK_DEPTH = 200            # REST 스냅샷·WebSocket 구독 호가 단계 수
+ORDERBOOK_MAX_AGE = 1.0          # 주문 경로에서 허용하는 REST 스냅샷 지연 (초)
+ORDERBOOK_DISPLAY_MAX_AGE = 3.0  # 화면 표시용 허용 지연 (초)
+ORDERBOOK_STREAM_STALE = 5.0     # 스트림 메시지가 이 시간 동안 없으면 REST 스냅샷으로 보강 (초)
+ORDERBOOK_PENDING_MAX = 1000     # delta 누락 후 REST 스냅샷을 기다리는 동안 보관할 delta 수
+
+class FillEstimate:
+    # 시장가 주문이 호가를 먹어 들어갈 때의 예상 체결 결과
+    __slots__ = ("side", "notional", "qty", "vwap", "mid", "worst_price", "slippage_bps", "levels", "complete")
+
+    def __init__(self, side, notional, qty, vwap, mid, worst_price, levels, complete):
+        self.side = side
+        self.notional = notional
+        self.qty = qty
+        self.vwap = vwap
+        self.mid = mid
+        self.worst_price = worst_price
+        # 중간가 대비 불리한 방향이 양수 (bp)
+        direction = 1 if side == "Buy" else -1
+        self.slippage_bps = direction * (vwap / mid - 1) * 10_000 if mid > 0 and vwap > 0 else 0.0
+        self.levels = levels
+        self.complete = complete
+
+    def __repr__(self):
+        return (f"FillEstimate({self.side} {self.notional:.2f} USDT → {self.qty:g}@{self.vwap:.4f}, "
+                f"{self.slippage_bps:+.1f}bp, {self.levels} levels{'' if self.complete else ', 호가 부족'})")
+
+class OrderBook:
+    # 스냅샷 + delta 로 심볼 하나의 호가를 유지하고, 방향별 누적 수량/금액 배열은 조회할 때만 다시 만든다
+    # 배열이 있으면 체결 예상은 이분 탐색 한 번 (수 µs)
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.bids = {}          # 가격 -> 수량
+        self.asks = {}
+        self.update_id = 0
+        self.seq = 0
+        self.updated_at = 0.0   # 마지막 반영 시각 (로컬)
+        self.streaming = False  # WebSocket delta 로 유지 중인지
+        self.stale = True       # 스냅샷이 필요함 (처음, 또는 delta 누락 감지)
+        self._bridge = False    # REST 스냅샷 직후 — 다음 delta 는 updateId 연속 대신 seq 로만 판단
+        self._pending = []      # stale 동안 도착한 스트림 delta (스냅샷 이후 분량만 재적용)
+        self._arrays = {}       # side -> (가격, 누적 수량, 누적 금액, 누적 VWAP)
+
+    def _apply_levels(self, book, levels):
+        for price, size in levels:
+            price, size = float(price), float(size)
+            if size > 0:
+                book[price] = size
+            else:
+                book.pop(price, None)
+
+    def apply_snapshot(self, data, bridge: bool = False):
+        # bridge: 스트림으로 유지 중인 호가를 REST 스냅샷으로 복구 — REST 의 u 는 스트림 delta 의 u 와
+        # 이어지지 않으므로 공통인 seq(cross sequence) 로 스냅샷 이후 delta 만 골라 이어 붙인다
+        self.bids, self.asks = {}, {}
+        self._apply_levels(self.bids, data.get("b", []))
+        self._apply_levels(self.asks, data.get("a", []))
+        self.update_id = int(data.get("u", 0) or 0)
+        self.seq = int(data.get("seq", 0) or 0)
+        self.updated_at = time.time()
+        self.stale = False
+        self._arrays = {}
+        self._bridge = bridge
+        pending, self._pending = self._pending, []
+        if bridge:
+            for delta in pending:
+                self.apply_delta(delta)
+
+    def apply_delta(self, data) -> bool:
+        # updateId 가 이어지지 않으면 반영하지 않고 stale 로 표시 → 다음 조회 때 스냅샷으로 복구
+        # stale 동안 받은 스트림 delta 는 버리지 않고 모아 두었다가 스냅샷 뒤에 재적용
+        u = int(data.get("u", 0) or 0)
+        if self.stale:
+            if self.streaming:
+                self._pending.append(data)
+                del self._pending[:-ORDERBOOK_PENDING_MAX]
+            return False
+        if self._bridge:
+            seq = int(data.get("seq", 0) or 0)
+            if seq and seq <= self.seq:     # 스냅샷에 이미 들어 있는 delta
+                return True
+            self._bridge = False            # 스냅샷 이후 첫 delta — 여기서부터 updateId 연속성 검사
+        elif u <= self.update_id:     # 이미 반영한 delta
+            return True
+        elif u != self.update_id + 1:
+            logger.warning(f"{self.symbol} 호가 delta 누락 ({self.update_id} → {u}), 스냅샷 재요청")
+            self.stale = True
+            if self.streaming:
+                self._pending = [data]
+            return False
+        self._apply_levels(self.bids, data.get("b", []))
+        self._apply_levels(self.asks, data.get("a", []))
+        self.update_id = u
+        self.seq = int(data.get("seq", self.seq) or self.seq)
+        self.updated_at = time.time()
+        self._arrays = {}
+        return True
+
+    def apply(self, message) -> bool:
+        # WebSocket orderbook.{depth}.{symbol} 메시지 (u == 1 은 서비스 재시작 후 스냅샷)
+        data = message.get("data", {})
+        if message.get("type") == "snapshot" or int(data.get("u", 0) or 0) == 1:
+            self.apply_snapshot(data)
+            return True
+        return self.apply_delta(data)
+
+    def age(self) -> float:
+        return time.time() - self.updated_at if self.updated_at else float("inf")
+
+    def fresh(self, max_age: float) -> bool:
+        if self.stale:
+            return False
+        if self.streaming:
+            return self.age() <= ORDERBOOK_STREAM_STALE
+        return self.age() <= max_age
+
+    @property
+    def best_bid(self) -> float:
+        return self._side_arrays("Sell")[0][0] if self.bids else 0.0
+
+    @property
+    def best_ask(self) -> float:
+        return self._side_arrays("Buy")[0][0] if self.asks else 0.0
+
+    @property
+    def mid(self) -> float:
+        bid, ask = self.best_bid, self.best_ask
+        return (bid + ask) / 2 if bid and ask else bid or ask
+
+    def _side_arrays(self, side):
+        # 매수는 매도호가(asks)를 낮은 가격부터, 매도는 매수호가(bids)를 높은 가격부터 소진
+        arrays = self._arrays.get(side)
+        if arrays is None:
+            if side == "Buy":
+                prices = sorted(self.asks)
+                book = self.asks
+            else:
+                prices = sorted(self.bids, reverse=True)
+                book = self.bids
+            cum_qty = list(accumulate(book[p] for p in prices))
+            cum_notional = list(accumulate(p * book[p] for p in prices))
+            vwaps = [n / q for n, q in zip(cum_notional, cum_qty)]
+            arrays = self._arrays[side] = (prices, cum_qty, cum_notional, vwaps)
+        return arrays
+
+    def estimate(self, side: str, notional: float) -> FillEstimate:
+        prices, cum_qty, cum_notional, _ = self._side_arrays(side)
+        mid = self.mid
+        if not prices or notional <= 0:
+            return FillEstimate(side, 0.0, 0.0, 0.0, mid, 0.0, 0, bool(prices))
+        i = bisect_left(cum_notional, notional)
+        if i >= len(prices):
+            # 호가 전체를 먹어도 부족 — 보이는 호가만큼의 결과
+            return FillEstimate(side, cum_notional[-1], cum_qty[-1], cum_notional[-1] / cum_qty[-1], mid,
+                                prices[-1], len(prices), False)
+        prev_qty = cum_qty[i - 1] if i else 0.0
+        prev_notional = cum_notional[i - 1] if i else 0.0
+        qty = prev_qty + (notional - prev_notional) / prices[i]
+        return FillEstimate(side, notional, qty, notional / qty, mid, prices[i], i + 1, True)
+
+    def max_notional(self, side: str, max_bps: float) -> float:
+        # 예상 VWAP 슬리피지가 max_bps 이하인 최대 주문 금액 (누적 VWAP 는 단조라 이분 탐색)
+        prices, cum_qty, cum_notional, vwaps = self._side_arrays(side)
+        mid = self.mid
+        if not prices or mid <= 0:
+            return 0.0
+        if side == "Buy":
+            limit = mid * (1 + max_bps / 10_000)
+            k = bisect_left(vwaps, limit + 1e-12)           # vwaps[:k] <= limit
+        else:
+            limit = mid * (1 - max_bps / 10_000)
+            k = bisect_left(vwaps, -(limit - 1e-12), key=lambda v: -v)   # vwaps[:k] >= limit
+        if k >= len(prices):
+            return cum_notional[-1]
+        # k 번째 호가를 일부만 먹어 VWAP 가 정확히 limit 이 되는 수량: (N + p·q) / (Q + q) = limit
+        prev_qty = cum_qty[k - 1] if k else 0.0
+        prev_notional = cum_notional[k - 1] if k else 0.0
+        price = prices[k]
+        if price == limit:
+            return cum_notional[k]
+        q = max(0.0, (limit * prev_qty - prev_notional) / (price - limit))
+        return prev_notional + price * q
+
+class DepthCache:
+    # 심볼별 호가창: WebSocket 으로 유지 중이면 메모리에서 바로, 아니면 REST 스냅샷을 max_age 동안 재사용
+    def __init__(self, depth=ORDERBOOK_DEPTH):
+        self.depth = depth
+        self._books = {}
+        self._lock = threading.RLock()
+        self.snapshots = 0
+        self.deltas = 0
+        self.hits = 0
+
+    def _book(self, symbol) -> OrderBook:
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = OrderBook(symbol)
+        return book
+
+    def refresh(self, client, symbol: str):
+        data = client.get_orderbook(category=TRADE_CATEGORY, symbol=symbol, limit=self.depth)["result"]
+        with self._lock:
+            book = self._book(symbol)
+            # 스트림이 이미 더 최신 상태면 REST 스냅샷으로 되돌리지 않고 조용한 스트림이 유효함만 기록
+            # (REST 의 u 는 스트림 delta 의 u 와 다른 번호라 공통인 seq 로 비교)
+            seq = int(data.get("seq", 0) or 0)
+            if book.streaming and not book.stale and seq and seq < book.seq:
+                book.updated_at = time.time()
+            else:
+                book.apply_snapshot(data, bridge=book.streaming)
+            self.snapshots += 1
+
+    def get(self, client, symbol: str, max_age: float = ORDERBOOK_MAX_AGE) -> OrderBook:
+        with self._lock:
+            book = self._books.get(symbol)
+            if book is not None and book.fresh(max_age):
+                self.hits += 1
+                return book
+        self.refresh(client, symbol)
+        return self._books[symbol]
+
+    def on_message(self, message):
+        symbol = message.get("data", {}).get("s") or message.get("topic", "").rsplit(".", 1)[-1]
+        with self._lock:
+            book = self._book(symbol)
+            book.streaming = True
+            book.apply(message)
+            self.deltas += 1
+
+    def stream(self, ws, symbol: str):
+        ws.orderbook_stream(depth=self.depth, symbol=symbol, callback=self.on_message)
+
+    def mark_stale(self, symbols):
+        with self._lock:
+            for symbol in symbols:
+                if symbol in self._books:
+                    self._books[symbol].stale = True
+
+    def estimate(self, client, symbol: str, side: str, notional: float, max_age: float = ORDERBOOK_MAX_AGE,
+                 max_bps=None):
+        # 반환: (FillEstimate, 슬리피지 max_bps 이내 최대 주문 금액 또는 None)
+        # 계산은 잠금 안에서 — 스트림 delta 가 호가를 바꾸는 중에 읽지 않도록
+        book = self.get(client, symbol, max_age)
+        with self._lock:
+            cap = book.max_notional(side, max_bps) if max_bps is not None else None
+            return book.estimate(side, notional), cap
+
+    def stats(self):
+        with self._lock:
+            return {"books": len(self._books), "snapshots": self.snapshots, "deltas": self.deltas,
+                    "hits": self.hits, "streaming": sum(b.streaming for b in self._books.values())}
+
+@lru_cache(maxsize=None)
+def depth_cache(testnet: bool = False) -> DepthCache:
+    return DepthCache()
+
+def depth_cache_for(client) -> DepthCache:
+    return depth_cache(bool(getattr(client, "testnet", False)))
+
+def estimate_market_fill(client, symbol: str, side: str, notional: float, max_bps=None,
+                         max_age: float = ORDERBOOK_MAX_AGE):
+    # 시장가 notional USDT 의 (예상 체결, 슬리피지 한도 내 최대 금액) — 조회 실패 시 예외
+    return depth_cache_for(client).estimate(public_client_for(client), symbol, side, notional, max_age, max_bps)
@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .account import fetch_open_orders
+from .config import SETTLE_COIN, TRADE_CATEGORY
+from .execution import account_key
+from .market import ORDER_QUOTE_MAX_AGE, _invalidate_on_precision_reject, get_current_price, get_sizer
+from .orderbook import estimate_market_fill
+from .ratelimit import trade_priority
+from .risk import pre_trade_check, risk_engine_for
+from .sizing import OrderSizer
+
+logger = logging.getLogger(__name__)
+
+# ── 전체 주문 취소 ──
+@trade_priority()
+def cancel_all_orders(client, symbol: str):
+    try:
+        result = client.cancel_all_orders(category=TRADE_CATEGORY, symbol=symbol)
+        return result.get("retCode", 0) == 0
+    except Exception as e:
+        logger.error(f"❌ 주문 취소 실패: {e}")
+        return False
+
+# ── 일괄 주문 취소 ──
+BULK_CANCEL_MAX_WORKERS = 10   # settleCoin 취소가 안 될 때 심볼별 동시 취소 수 (레이트 리미터가 최종 조절)
+
+def _cancel_entry(report, symbol):
+    return report.setdefault(symbol, {"cancelled": 0, "remaining": 0, "error": None})
+
+def _cancel_symbols(client, symbols, report):
+    # 심볼별 cancel_all_orders 동시 실행 → report 에 심볼별 결과 누적
+    def cancel(symbol):
+        try:
+            res = client.cancel_all_orders(category=TRADE_CATEGORY, symbol=symbol)
+            if res.get("retCode", 0) != 0:
+                return symbol, 0, res.get("retMsg", "Unknown error")
+            return symbol, len(res.get("result", {}).get("list", [])), None
+        except Exception as e:
+            return symbol, 0, str(e)
+
+    symbols = sorted(symbols)
+    if not symbols:
+        return
+    with ThreadPoolExecutor(max_workers=min(len(symbols), BULK_CANCEL_MAX_WORKERS)) as pool:
+        for symbol, cancelled, err in pool.map(cancel, symbols):
+            entry = _cancel_entry(report, symbol)
+            entry["cancelled"] += cancelled
+            entry["error"] = err
+
+@trade_priority()
+def bulk_cancel_orders(client, known_orders=()):
+    # settleCoin 단위 전체 취소 1회 → 새로 조회해 남은 주문 확인 → 남은 심볼만 동시 재취소
+    # 반환: ({심볼: {"cancelled", "remaining", "error"}}, {"mode", "round_trips", "elapsed", "remaining_orders"})
+    started = time.time()
+    symbol_of = {o.order_id: o.symbol for o in known_orders}
+    report, round_trips, mode = {}, 1, "settleCoin"
+    try:
+        res = client.cancel_all_orders(category=TRADE_CATEGORY, settleCoin=SETTLE_COIN)
+        if res.get("retCode", 0) != 0:
+            raise RuntimeError(res.get("retMsg", "cancel-all rejected"))
+        for item in res.get("result", {}).get("list", []):
+            # 응답에는 orderId 만 있으므로 알고 있던 목록으로 심볼을 찾는다
+            _cancel_entry(report, symbol_of.get(item.get("orderId"), "(목록 외)"))["cancelled"] += 1
+    except Exception as e:
+        logger.warning(f"settleCoin 전체 취소 실패, 심볼별 동시 취소로 전환: {e}")
+        mode = "symbol"
+        # 화면 목록에 없던 심볼까지 잡기 위해 새로 조회
+        symbols = {o.symbol for o in known_orders} | {o.symbol for o in fetch_open_orders(client)}
+        _cancel_symbols(client, symbols, report)
+        round_trips += 2
+
+    remaining = fetch_open_orders(client)
+    round_trips += 1
+    if remaining:
+        _cancel_symbols(client, {o.symbol for o in remaining}, report)
+        remaining = fetch_open_orders(client)
+        round_trips += 2
+    for order in remaining:
+        _cancel_entry(report, order.symbol)["remaining"] += 1
+    return report, {"mode": mode, "round_trips": round_trips, "elapsed": time.time() - started,
+                    "remaining_orders": remaining}
+
+# ── 레버리지 ──
+LEVERAGE_NOT_MODIFIED = 110043   # 이미 같은 레버리지 — 성공으로 간주
+_applied_leverage = {}           # (계정, 테스트넷, 심볼) -> 마지막으로 적용한 레버리지
+
+def apply_leverage(client, symbol: str, leverage: float):
+    # 심볼 레버리지를 주문 전에 맞춘다 (같은 값이면 다시 보내지 않음) → 실패 메시지 또는 None
+    key = (account_key(client), bool(getattr(client, "testnet", False)), symbol)
+    if _applied_leverage.get(key) == leverage:
+        return None
+    try:
+        res = client.set_leverage(category=TRADE_CATEGORY, symbol=symbol, buyLeverage=f"{leverage:g}",
+                                  sellLeverage=f"{leverage:g}")
+        code, msg = res.get("retCode", 0), res.get("retMsg")
+    except Exception as e:
+        code, msg = getattr(e, "status_code", None), str(e)
+    if code not in (0, LEVERAGE_NOT_MODIFIED):
+        return f"❌ 레버리지 {leverage:g}x 설정 실패: {msg or 'Unknown error'}"
+    if code == 0:
+        risk_engine_for(client).apply_leverage(symbol, leverage)
+    _applied_leverage[key] = leverage
+    return None
+
+def _risk_gate(client, symbol: str, side: str, notional: float, price: float, balance: float, leverage=None):
+    # 레버리지 적용 + 주문 전 리스크 검사 → 거부 메시지 또는 None
+    if leverage:
+        err = apply_leverage(client, symbol, leverage)
+        if err:
+            return err
+    return pre_trade_check(client, symbol, side, notional, price, balance, leverage)
+
+# ── 시장가 슬리피지 한도 ──
+MAX_SLIPPAGE_BPS = 30.0            # 기본 허용 슬리피지 (bp, 호가 VWAP 와 중간가 차이)
+SLIPPAGE_POLICIES = ("cap", "refuse")   # 한도 초과 시 한도 안으로 금액 축소 / 주문 거부
+
+def _slippage_check(client, symbol: str, side: str, notional: float, max_bps: float, policy: str,
+                    min_notional: float):
+    # 반환: (보낼 주문 금액, 축소 안내, 거부 메시지) — 호가 조회에 실패하면 검사 없이 그대로 진행
+    try:
+        est, cap = estimate_market_fill(client, symbol, side, notional, max_bps)
+    except Exception as e:
+        logger.warning(f"{symbol} 호가 조회 실패, 슬리피지 검사 생략: {e}")
+        return notional, None, None
+    if est.complete and est.slippage_bps <= max_bps:
+        return notional, None, None
+    if policy == "cap" and cap >= min_notional:
+        return cap, f" (슬리피지 {max_bps:g}bp 한도로 {notional:.2f} → {cap:.2f} USDT 축소)", None
+    depth = "" if est.complete else ", 호가 부족"
+    return 0.0, None, (f"⚠️ 예상 슬리피지 {est.slippage_bps:.1f}bp > 한도 {max_bps:g}bp "
+                       f"(예상 체결가 ${est.vwap:.4f}{depth})")
+
+# ── 시장가 주문 ──
+@trade_priority()
+def place_market_order(client, symbol: str, side: str, pct: float, balance: float,
+                       max_slippage_bps=None, slippage_policy: str = "refuse", leverage=None):
+    # max_slippage_bps 를 주면 호가창으로 예상 체결가를 계산해 한도 초과 시 거부하거나(refuse) 줄인다(cap)
+    # leverage 를 주면 심볼 레버리지를 맞추고 그 값으로 증거금·청산가를 검사
+    try:
+        current_price = get_current_price(client, symbol, max_age=ORDER_QUOTE_MAX_AGE)
+        if current_price <= 0:
+            return False, "현재가 조회 실패"
+            
+        sizer = get_sizer(client, symbol)
+        notional, note = balance * pct / 100, None
+        if max_slippage_bps is not None:
+            notional, note, err = _slippage_check(client, symbol, side, notional, max_slippage_bps,
+                                                  slippage_policy, sizer.min_notional)
+            if err:
+                return False, err
+        
+        qty, _, _, final_order_value = sizer.size_one(notional, current_price, round_price=False)
+        
+        if final_order_value < sizer.min_notional:
+            return False, sizer.min_notional_msg(final_order_value)
+        
+        if final_order_value > balance:
+            return False, f"⚠️ 잔고 부족! 필요: {final_order_value:.2f} USDT, 잔고: {balance:.2f} USDT"
+        
+        err = _risk_gate(client, symbol, side, final_order_value, current_price, balance, leverage)
+        if err:
+            return False, err
+        
+        res = client.place_order(
+            category=TRADE_CATEGORY,
+            symbol=symbol,
+            side=side,
+            orderType="Market",
+            qty=qty,
+            timeInForce="IOC",
+            reduceOnly=False
+        )
+        
+        if res.get("retCode", 0) == 0:
+            # 다음 주문의 검사가 재조회 없이 이 체결을 보도록 현재가 기준으로 바로 반영
+            risk_engine_for(client).apply_fill(symbol, side, float(qty), current_price, leverage)
+            return True, f"✅ 시장가 주문 성공: {side} {qty}@${current_price:.4f} = {final_order_value:.2f} USDT{note or ''}"
+        else:
+            _invalidate_on_precision_reject(client, symbol, res.get("retCode"))
+            return False, f"❌ 주문 실패: {res.get('retMsg', 'Unknown error')}"
+            
+    except Exception as e:
+        _invalidate_on_precision_reject(client, symbol, getattr(e, "status_code", None))
+        return False, f"❌ 주문 실패: {str(e)}"
+
+# ── 리밋 주문 ──
+@trade_priority()
+def place_limit_order(client, symbol: str, side: str, pct: float, price: float, balance: float, leverage=None):
+    try:
+        sizer = get_sizer(client, symbol)
+        
+        qty, price_str, price_adj, final_order_value = sizer.size_one(balance * pct / 100, price)
+        
+        if final_order_value < sizer.min_notional:
+            return False, sizer.min_notional_msg(final_order_value)
+        
+        err = _risk_gate(client, symbol, side, final_order_value, price_adj, balance, leverage)
+        if err:
+            return False, err
+        
+        res = client.place_order(
+            category=TRADE_CATEGORY,
+            symbol=symbol,
+            side=side,
+            orderType="Limit",
+            qty=qty,
+            price=price_str,
+            timeInForce="GTC",
+            reduceOnly=False
+        )
+        
+        if res.get("retCode", 0) == 0:
+            risk_engine_for(client).apply_open_order(symbol, float(qty), price_adj, leverage)
+            return True, f"✅ 리밋 주문 성공: {side} {qty}@${price_adj:.4f} = {final_order_value:.2f} USDT"
+        else:
+            _invalidate_on_precision_reject(client, symbol, res.get("retCode"))
+            return False, f"❌ 주문 실패: {res.get('retMsg', 'Unknown error')}"
+            
+    except Exception as e:
+        _invalidate_on_precision_reject(client, symbol, getattr(e, "status_code", None))
+        return False, f"❌ 주문 실패: {str(e)}"
+
+# ── 분할 진입 (래더) ──
+# (기준가 대비 오프셋, 최대 포지션 비율 대비 비중) — 오프셋 None 은 시장가
+ENTRY_TIERS = [(None, 0.45), (0.02, 0.20), (0.03, 0.20), (0.04, 0.15)]
+BATCH_ORDER_LIMIT = 10  # place_batch_order 1회 최대 주문 수 (linear)
+BATCH_UNSUPPORTED_CODES = {10005}   # 배치 주문 권한 없음 — 접수되지 않은 것이 확실하므로 단건 전환
+ORDER_LINK_DUPLICATE = 110072       # 같은 orderLinkId 가 이미 접수됨 — 재전송 전에 들어간 주문이므로 성공으로 간주
+
+def _plan_ladder(symbol: str, side: str, max_pct: float, base_price: float, balance: float,
+                 current_price: float, sizer: OrderSizer, tiers=ENTRY_TIERS, market_scale: float = 1.0):
+    # 티어별 주문을 한 번에 계산: (요청 dict 또는 None, 가격, 주문금액, 실패 메시지)
+    import numpy as np
+    direction = -1 if side == "Buy" else 1
+    offsets = np.array([np.nan if off is None else off for off, _ in tiers], dtype=np.float64)
+    is_market = np.isnan(offsets)
+    prices = np.where(is_market, current_price, base_price * (1 + direction * np.nan_to_num(offsets)))
+    notionals = balance * max_pct * np.array([w for _, w in tiers], dtype=np.float64) / 100
+    notionals = np.where(is_market, notionals * market_scale, notionals)
+    qty_strs, price_strs, prices, values = sizer.size(notionals, prices, round_price=~is_market)
+
+    plans = []
+    for i, market in enumerate(is_market.tolist()):
+        price, value = float(prices[i]), float(values[i])
+        if price <= 0:
+            plans.append((None, price, 0.0, "현재가 조회 실패"))
+            continue
+        if value < sizer.min_notional:
+            plans.append((None, price, value, sizer.min_notional_msg(value)))
+            continue
+        if market and value > balance:
+            plans.append((None, price, value, f"⚠️ 잔고 부족! 필요: {value:.2f} USDT, 잔고: {balance:.2f} USDT"))
+            continue
+        req = {"symbol": symbol, "side": side, "qty": qty_strs[i], "reduceOnly": False}
+        if market:
+            req.update(orderType="Market", timeInForce="IOC")
+        else:
+            req.update(orderType="Limit", price=price_strs[i], timeInForce="GTC")
+        plans.append((req, price, value, None))
+    return plans
+
+def _order_result_msg(req, price, value, ok, err=None):
+    kind = "시장가" if req["orderType"] == "Market" else "리밋"
+    if ok:
+        return True, f"✅ {kind} 주문 성공: {req['side']} {req['qty']}@${price:.4f} = {value:.2f} USDT"
+    return False, f"❌ 주문 실패: {err or 'Unknown error'}"
+
+def _send_single(client, req):
+    try:
+        res = client.place_order(category=TRADE_CATEGORY, **req)
+        code, msg = res.get("retCode", 0), res.get("retMsg")
+    except Exception as e:
+        code, msg = getattr(e, "status_code", None), str(e)
+    if code == ORDER_LINK_DUPLICATE:
+        return True, 0, "이미 접수된 주문"
+    return code == 0, code, msg
+
+class _BatchRejected(RuntimeError):
+    # 배치 요청 자체가 거부됨 (retCode != 0) — 어떤 주문도 접수되지 않음
+    pass
+
+def _send_batch(client, chunk):
+    # 배치 1건 (BATCH_ORDER_LIMIT 이하) 전송 → 요청 순서대로 (성공, retCode, 메시지)
+    res = client.place_batch_order(category=TRADE_CATEGORY, request=chunk)
+    if res.get("retCode", 0) != 0:
+        raise _BatchRejected(res.get("retMsg", "batch order rejected"))
+    ext = res.get("retExtInfo", {}).get("list", [])
+    outcomes = []
+    for j in range(len(chunk)):
+        info = ext[j] if j < len(ext) else {"code": 0}
+        code = info.get("code", 0)
+        outcomes.append((code == 0, code, info.get("msg")))
+    return outcomes
+
+def _send_concurrent(client, reqs):
+    if not reqs:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(reqs), BATCH_ORDER_LIMIT)) as pool:
+        return list(pool.map(lambda r: _send_single(client, r), reqs))
+
+def _assign_link_ids(reqs):
+    # 요청마다 고정 orderLinkId — 응답을 못 받아 다시 보내도 거래소가 중복 주문을 거부한다
+    batch_id = uuid.uuid4().hex[:24]
+    for i, req in enumerate(reqs):
+        req.setdefault("orderLinkId", f"{batch_id}-{i}")
+
+def _send_orders(client, reqs, use_batch: bool = True):
+    # 10건씩 배치로 묶어 청크들을 동시에 전송 — 배치가 거부된 청크만 단건 동시 전송으로 전환
+    _assign_link_ids(reqs)
+    if not use_batch or len(reqs) < 2:
+        return _send_concurrent(client, reqs)
+
+    def send(chunk):
+        try:
+            return _send_batch(client, chunk)
+        except _BatchRejected as e:
+            logger.warning(f"배치 주문 거부, 단건 동시 전송으로 전환: {e}")
+        except Exception as e:
+            if getattr(e, "status_code", None) in BATCH_UNSUPPORTED_CODES:
+                logger.warning(f"배치 주문 미지원, 단건 동시 전송으로 전환: {e}")
+            else:
+                # 타임아웃·연결 끊김 — 이미 접수됐을 수 있으므로 같은 orderLinkId 로만 재전송
+                logger.warning(f"배치 주문 응답 없음, 같은 orderLinkId 로 재전송: {e}")
+        return _send_concurrent(client, chunk)
+
+    chunks = [reqs[i:i + BATCH_ORDER_LIMIT] for i in range(0, len(reqs), BATCH_ORDER_LIMIT)]
+    if len(chunks) == 1:
+        return send(chunks[0])
+    with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+        return [outcome for part in pool.map(send, chunks) for outcome in part]
+
+@trade_priority()
+def place_ladder_entry(client, symbol: str, side: str, max_pct: float, base_price: float,
+                       balance: float, tiers=ENTRY_TIERS, use_batch: bool = True,
+                       max_slippage_bps=None, slippage_policy: str = "cap", leverage=None):
+    # 시세·스펙 1회 조회로 전 티어 계산 → 시장가 1건 + 리밋 티어 배치 1건을 동시에 전송
+    # max_slippage_bps: 시장가 티어의 호가 기준 예상 슬리피지 한도 (None 이면 검사 안 함)
+    # 리스크 검사는 전 티어가 체결됐을 때의 합계 기준 — 거부되면 티어 전체를 보내지 않는다
+    current_price = get_current_price(client, symbol, max_age=ORDER_QUOTE_MAX_AGE)
+    sizer = get_sizer(client, symbol)
+    market_notional = balance * max_pct * sum(w for off, w in tiers if off is None) / 100
+    market_scale, note, guard_err = 1.0, None, None
+    if max_slippage_bps is not None and market_notional > 0:
+        allowed, note, guard_err = _slippage_check(client, symbol, side, market_notional, max_slippage_bps,
+                                                   slippage_policy, sizer.min_notional)
+        market_scale = allowed / market_notional if not guard_err else 1.0
+    plans = _plan_ladder(symbol, side, max_pct, base_price, balance, current_price, sizer, tiers, market_scale)
+    if guard_err:
+        plans = [(None, plan[1], plan[2], guard_err) if tiers[i][0] is None else plan
+                 for i, plan in enumerate(plans)]
+    total = sum(value for req, _, value, _ in plans if req)
+    risk_err = _risk_gate(client, symbol, side, total, current_price, balance, leverage) if total else None
+    if risk_err:
+        plans = [(None, price, value, risk_err) if req else (req, price, value, err)
+                 for req, price, value, err in plans]
+
+    market_idx = [i for i, p in enumerate(plans) if p[0] and p[0]["orderType"] == "Market"]
+    limit_idx = [i for i, p in enumerate(plans) if p[0] and p[0]["orderType"] == "Limit"]
+    limit_reqs = [plans[i][0] for i in limit_idx]
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        market_fut = pool.submit(_send_concurrent, client, [plans[i][0] for i in market_idx])
+        limit_fut = pool.submit(_send_orders, client, limit_reqs, use_batch)
+        outcomes = dict(zip(market_idx, market_fut.result()))
+        outcomes.update(zip(limit_idx, limit_fut.result()))
+
+    risk = risk_engine_for(client)
+    results = []
+    for i, (req, price, value, err) in enumerate(plans):
+        if req is None:
+            results.append((False, err))
+            continue
+        ok, code, msg = outcomes[i]
+        if not ok:
+            _invalidate_on_precision_reject(client, symbol, code)
+        elif req["orderType"] == "Market":
+            risk.apply_fill(symbol, side, float(req["qty"]), price, leverage)
+        else:
+            risk.apply_open_order(symbol, float(req["qty"]), price, leverage)
+        ok, text = _order_result_msg(req, price, value, ok, msg)
+        if ok and note and req["orderType"] == "Market":
+            text += note
+        results.append((ok, text))
+    return results
+
+# ── 포지션 청산 엔진 ──
+def _close_request(pos, sizer: OrderSizer):
+    # 포지션 크기 그대로 reduce-only 시장가 — 포지션보다 크게 나가 반대 포지션이 생기지 않는다
+    return {"symbol": pos.symbol, "side": "Sell" if pos.is_long else "Buy", "orderType": "Market",
+            "qty": sizer.exact_qty_str(pos.size), "timeInForce": "IOC", "reduceOnly": True,
+            "positionIdx": pos.position_idx}
+
+def _cancel_for_close(client, symbols, all_symbols: bool):
+    # 전체 청산은 settleCoin 취소 1회, 그 외(또는 실패 시)는 심볼별 동시 취소
+    report = {}
+    if all_symbols:
+        try:
+            res = client.cancel_all_orders(category=TRADE_CATEGORY, settleCoin=SETTLE_COIN)
+            if res.get("retCode", 0) != 0:
+                raise RuntimeError(res.get("retMsg", "cancel-all rejected"))
+            _cancel_entry(report, "ALL")["cancelled"] = len(res.get("result", {}).get("list", []))
+            return report
+        except Exception as e:
+            logger.warning(f"settleCoin 전체 취소 실패, 심볼별 동시 취소로 전환: {e}")
+    _cancel_symbols(client, symbols, report)
+    return report
+
+@trade_priority()
+def close_positions(client, positions, side=None, symbols=None, cancel: bool = True, use_batch: bool = True):
+    # 보유 중인 포지션 상태(실시간 스트림 또는 마지막 갱신)만으로 청산 — 시세/포지션 재조회 없음
+    # side: "Buy"(롱)/"Sell"(숏)/None(전체), symbols: 대상 심볼 집합 또는 None(전체 심볼)
+    # 반환: ([(포지션, 성공, 메시지)], 취소 결과 {심볼: {...}})
+    targets = [p for p in positions if p.size > 0 and (side is None or p.side == side)
+               and (symbols is None or p.symbol in symbols)]
+    # 전체 청산만 계정 전체 취소 — 방향/심볼을 지정하면 청산하는 포지션의 심볼만 취소
+    full_close = symbols is None and side is None
+    cancel_symbols = {p.symbol for p in targets}
+    if side is None:
+        cancel_symbols |= set(symbols or ())
+    reqs = [_close_request(p, get_sizer(client, p.symbol)) for p in targets]
+
+    # 미체결 취소와 청산 주문을 동시에 전송
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        cancel_fut = pool.submit(_cancel_for_close, client, cancel_symbols, full_close) if cancel else None
+        outcomes = pool.submit(_send_orders, client, reqs, use_batch).result()
+        cancel_report = cancel_fut.result() if cancel_fut else {}
+
+    risk = risk_engine_for(client)
+    if cancel:
+        risk.clear_open_orders(None if full_close else cancel_symbols)
+    results = []
+    for pos, req, (ok, code, msg) in zip(targets, reqs, outcomes):
+        label = "롱" if pos.is_long else "숏"
+        if ok:
+            risk.apply_fill(pos.symbol, req["side"], pos.size, pos.mark_price or pos.avg_price,
+                            position_idx=pos.position_idx)
+            results.append((pos, True, f"✅ {pos.symbol} {label} {req['qty']} 청산 주문 전송"))
+        else:
+            _invalidate_on_precision_reject(client, pos.symbol, code)
+            results.append((pos, False, f"❌ {pos.symbol} {label} 청산 실패: {msg or 'Unknown error'}"))
+    return results, cancel_report
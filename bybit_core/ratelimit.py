@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ── 레이트 리미터 ──
+# 엔드포인트 그룹별 기본 초당 한도 — 응답 헤더(X-Bapi-Limit*)를 받으면 그 값으로 갱신
+RATE_LIMIT_DEFAULTS = {"order": 10, "cancel": 10, "position": 10, "open_orders": 10,
+                       "account": 10, "history": 10, "market": 100}
+METHOD_GROUPS = {
+    "place_order": "order", "place_batch_order": "order", "amend_order": "order",
+    "cancel_order": "cancel", "cancel_all_orders": "cancel", "cancel_batch_order": "cancel",
+    "get_positions": "position", "set_leverage": "position",
+    "get_open_orders": "open_orders", "get_order_history": "open_orders",
+    "get_wallet_balance": "account",
+    "get_executions": "history", "get_closed_pnl": "history",
+    "get_tickers": "market", "get_instruments_info": "market", "get_kline": "market", "get_orderbook": "market",
+    "get_risk_limit": "market",
+}
+HIGH_PRIORITY_METHODS = {"place_order", "place_batch_order", "amend_order",
+                         "cancel_order", "cancel_all_orders", "cancel_batch_order"}
+LOW_PRIORITY_RESERVE = 0.3     # 조회 요청은 버킷의 30% 를 주문용으로 남겨둔다
+LOW_PRIORITY_MAX_WAIT = 0.5    # 조회 요청 최대 대기 (초) — 넘으면 이번 갱신은 건너뜀
+HIGH_PRIORITY_MAX_WAIT = 3.0   # 주문/취소 최대 대기 (초) — 넘어도 실패시키지 않고 전송
+
+_priority_local = threading.local()
+
+class RateLimitShed(Exception):
+    pass
+
+class trade_priority:
+    # with trade_priority(): 안의 조회도 주문과 같은 우선순위로 처리 (예: 청산 직전 포지션 조회)
+    def __enter__(self):
+        self._prev = getattr(_priority_local, "high", False)
+        _priority_local.high = True
+        return self
+
+    def __exit__(self, *exc):
+        _priority_local.high = self._prev
+        return False
+
+    def __call__(self, fn):
+        # 데코레이터로도 사용: 주문 함수 안의 시세/스펙 조회가 조회 폭주에 밀리지 않도록
+        def wrapper(*args, **kwargs):
+            with trade_priority():
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        return wrapper
+
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated", "blocked_until")
+
+    def __init__(self, per_second):
+        self.capacity = float(per_second)
+        self.rate = float(per_second)
+        self.tokens = float(per_second)
+        self.updated = time.time()
+        self.blocked_until = 0.0
+
+    def take(self, now, reserve=0.0):
+        # 토큰을 가져가면 0, 아니면 다시 시도할 때까지 기다릴 초
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens - reserve >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 + reserve - self.tokens) / self.rate
+
+    def update(self, remaining, limit=None, reset_at=None):
+        if limit:
+            self.capacity = self.rate = float(limit)
+        self.tokens = min(self.tokens, float(remaining))
+        if remaining <= 0 and reset_at:
+            self.blocked_until = max(self.blocked_until, reset_at)
+
+class RateLimiter:
+    def __init__(self, defaults=None):
+        self._buckets = {group: TokenBucket(n) for group, n in (defaults or RATE_LIMIT_DEFAULTS).items()}
+        self._cond = threading.Condition()
+        self._high_waiting = 0
+        self.shed = 0
+        self.waited = 0.0
+
+    def acquire(self, method: str):
+        bucket = self._buckets.get(METHOD_GROUPS.get(method))
+        if bucket is None:
+            return
+        high = method in HIGH_PRIORITY_METHODS or getattr(_priority_local, "high", False)
+        deadline = time.time() + (HIGH_PRIORITY_MAX_WAIT if high else LOW_PRIORITY_MAX_WAIT)
+        started = time.time()
+        with self._cond:
+            if high:
+                self._high_waiting += 1
+            try:
+                while True:
+                    now = time.time()
+                    if not high and self._high_waiting:
+                        wait = 0.05   # 주문이 기다리는 중이면 조회는 양보
+                    else:
+                        wait = bucket.take(now, 0.0 if high else bucket.capacity * LOW_PRIORITY_RESERVE)
+                    if wait <= 0:
+                        return
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        if high:
+                            logger.warning(f"{method}: 레이트리밋 대기 초과, 그대로 전송")
+                            return
+                        self.shed += 1
+                        raise RateLimitShed(f"{method}: 레이트리밋 여유 부족으로 건너뜀")
+                    self._cond.wait(min(wait, remaining))
+            finally:
+                self.waited += time.time() - started
+                if high:
+                    self._high_waiting -= 1
+                    self._cond.notify_all()
+
+    def update(self, method: str, headers=None, ret_code=None):
+        bucket = self._buckets.get(METHOD_GROUPS.get(method))
+        if bucket is None:
+            return
+        with self._cond:
+            if headers and headers.get("X-Bapi-Limit-Status") is not None:
+                reset = headers.get("X-Bapi-Limit-Reset-Timestamp")
+                limit = headers.get("X-Bapi-Limit")
+                bucket.update(int(headers["X-Bapi-Limit-Status"]), int(limit) if limit else None,
+                              int(reset) / 1000 if reset else None)
+            if ret_code == 10006:
+                # 한도 초과 응답 → 1초 동안 해당 그룹 차단
+                bucket.update(0, reset_at=time.time() + 1.0)
+            self._cond.notify_all()
+
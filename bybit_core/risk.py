@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from functools import lru_cache
+
+from .account import fetch_open_orders, fetch_positions, iter_pages
+from .client import public_client_for
+from .config import TRADE_CATEGORY
+from .execution import account_key
+
+logger = logging.getLogger(__name__)
+
+# ── 포트폴리오 리스크 / 청산가 ──
+RISK_DEFAULT_MMR = 0.005            # 위험한도 조회 실패 시 유지증거금률 (Bybit 1단계 기준)
+RISK_MAX_MARGIN_RATIO = 0.5         # 주문 후 계정 유지증거금률(MM / 순자산) 상한
+RISK_MIN_LIQ_DISTANCE = 0.05        # 주문 후 해당 심볼의 예상 청산가까지 최소 거리 (현재가 대비)
+RISK_STATE_MAX_AGE = 60.0           # 화면/스트림 동기화 없이 주문 결과만 반영해 온 상태의 허용 시간 — 넘으면 REST 로 다시 읽는다 (초)
+
+class MaintenanceRates:
+    # 심볼별 1단계 위험한도 유지증거금률 — 처음 한 번 전체 목록을 받고, 목록에 없는 심볼만 단건 조회
+    def __init__(self):
+        self._rates = {}
+        self._lock = threading.Lock()
+        self._bulk_loaded = False
+
+    def _store(self, tiers):
+        rates = {}
+        for tier in tiers:
+            symbol = tier["symbol"]
+            if symbol not in rates or int(tier.get("isLowestRisk", 0) or 0) == 1:
+                rates[symbol] = float(tier["maintenanceMargin"])
+        with self._lock:
+            self._rates.update(rates)
+
+    def get(self, client, symbol: str) -> float:
+        rate = self._rates.get(symbol)
+        if rate is not None:
+            return rate
+        try:
+            if not self._bulk_loaded:
+                self._bulk_loaded = True
+                self._store(iter_pages(client.get_risk_limit, category=TRADE_CATEGORY))
+            if symbol not in self._rates:
+                self._store(client.get_risk_limit(category=TRADE_CATEGORY, symbol=symbol)["result"]["list"])
+            return self._rates[symbol]
+        except Exception as e:
+            logger.warning(f"{symbol} 위험한도 조회 실패, 기본 유지증거금률 {RISK_DEFAULT_MMR:g} 사용: {e}")
+            return RISK_DEFAULT_MMR
+
+@lru_cache(maxsize=None)
+def maintenance_rates(testnet: bool = False) -> MaintenanceRates:
+    return MaintenanceRates()
+
+class RiskEngine:
+    # 계정 하나의 포지션을 열 단위 배열로 보관 (포지션이 바뀔 때만 전체 재계산)
+    # 마크가격 틱은 해당 심볼 행만 고치고 합계는 차이만 더한다 — 틱당 O(그 심볼 포지션 수)
+    def __init__(self, client):
+        self.client = client
+        self.balance = 0.0          # 지갑 잔고 (USDT)
+        self.reserved_by = {}       # symbol -> 미체결 주문이 잡고 있는 개시증거금
+        self.keys = []              # 행 -> (symbol, positionIdx)
+        self.rows = {}              # symbol -> [행]
+        self.exposure = {}          # symbol -> 부호 있는 명목가 (롱 +, 숏 -)
+        self.totals = {"notional": 0.0, "im": 0.0, "mm": 0.0, "upnl": 0.0}
+        self.loaded_at = 0.0
+        self.synced_at = 0.0        # 마지막으로 계정 상태와 맞춰 본 시각 (적재 또는 같은 버전 확인)
+        self.version = None         # 적재한 계정 상태의 버전 (스트림 account_version / REST 갱신 시각)
+        self.ticks = 0
+        self._lock = threading.Lock()
+        self._arrays = None         # qty(부호), entry, mark, lev, mmr, notional, im, mm, upnl
+
+    # ── 상태 반영 ──
+    def load(self, positions, balance=None, open_orders=None, version=None):
+        import numpy as np
+        positions = [p for p in positions if p.size > 0]
+        n = len(positions)
+        col = lambda values: np.fromiter(values, dtype=np.float64, count=n)
+        rates = maintenance_rates(bool(getattr(self.client, "testnet", False)))
+        public = public_client_for(self.client)
+        qty = col(p.size if p.is_long else -p.size for p in positions)
+        entry = col(p.avg_price for p in positions)
+        mark = col(p.mark_price or p.avg_price for p in positions)
+        lev = col(p.leverage or 1.0 for p in positions)
+        mmr = col(rates.get(public, p.symbol) for p in positions)
+        reserved = None
+        if open_orders is not None:
+            # 미체결 주문 증거금은 심볼의 현재 레버리지 기준 (포지션이 없으면 1배로 보수적으로)
+            lev_of = {p.symbol: p.leverage or 1.0 for p in positions}
+            reserved = {}
+            for o in open_orders:
+                if o.price > 0:
+                    reserved[o.symbol] = reserved.get(o.symbol, 0.0) + o.qty * o.price / lev_of.get(o.symbol, 1.0)
+        with self._lock:
+            self.keys = [(p.symbol, p.position_idx) for p in positions]
+            self.rows = {}
+            for i, p in enumerate(positions):
+                self.rows.setdefault(p.symbol, []).append(i)
+            self._arrays = {"qty": qty, "entry": entry, "mark": mark, "lev": lev, "mmr": mmr}
+            self._recompute()
+            if balance is not None:
+                self.balance = balance
+            if reserved is not None:
+                self.reserved_by = reserved
+            self.version = version
+            self.loaded_at = self.synced_at = time.time()
+        return True
+
+    def sync(self, version, positions, balance=None, open_orders=None):
+        # 화면/데몬용: 계정 상태 버전이 바뀐 경우에만 다시 적재 (같으면 최신임만 기록) → 적재 여부
+        if version is not None and version == self.version:
+            self.synced_at = time.time()
+            return False
+        return self.load(positions, balance, open_orders, version)
+
+    def _recompute(self):
+        import numpy as np
+        a = self._arrays
+        a["notional"] = np.abs(a["qty"]) * a["mark"]
+        a["im"] = np.abs(a["qty"]) * a["entry"] / a["lev"]
+        a["mm"] = a["notional"] * a["mmr"]
+        a["upnl"] = a["qty"] * (a["mark"] - a["entry"])
+        self.totals = {"notional": float(a["notional"].sum()), "im": float(a["im"].sum()),
+                       "mm": float(a["mm"].sum()), "upnl": float(a["upnl"].sum())}
+        signed = np.sign(a["qty"]) * a["notional"]
+        self.exposure = {symbol: float(signed[rows].sum()) for symbol, rows in self.rows.items()}
+
+    def on_mark(self, symbol: str, price: float):
+        # 마크가격 변경: 이 심볼 행의 명목가/유지증거금/미실현손익만 갱신하고 합계에는 차이만 반영
+        with self._lock:
+            rows = self.rows.get(symbol)
+            if not rows or price <= 0:
+                return
+            a, t = self._arrays, self.totals
+            exposure = 0.0
+            for i in rows:
+                qty = float(a["qty"][i])
+                notional = abs(qty) * price
+                mm = notional * float(a["mmr"][i])
+                upnl = qty * (price - float(a["entry"][i]))
+                t["notional"] += notional - float(a["notional"][i])
+                t["mm"] += mm - float(a["mm"][i])
+                t["upnl"] += upnl - float(a["upnl"][i])
+                a["mark"][i], a["notional"][i], a["mm"][i], a["upnl"][i] = price, notional, mm, upnl
+                exposure += notional if qty > 0 else -notional
+            self.exposure[symbol] = exposure
+            self.ticks += 1
+
+    def on_stream(self, topic: str, rows):
+        # LiveAccountState 리스너: tickers 스트림의 markPrice
+        if not topic.startswith("tickers"):
+            return
+        for row in rows:
+            if row.get("symbol") and row.get("markPrice"):
+                self.on_mark(row["symbol"], float(row["markPrice"]))
+
+    def age(self) -> float:
+        return time.time() - self.synced_at if self.synced_at else float("inf")
+
+    # ── 주문 결과 반영 ── 다음 적재(스트림/REST 갱신)가 올 때까지 재조회 없이 상태를 맞춘다
+    def _append_row(self, symbol, mmr, lev, position_idx=0):
+        import numpy as np
+        a = self._arrays
+        if a is None:
+            a = self._arrays = {k: np.zeros(0) for k in ("qty", "entry", "mark", "lev", "mmr")}
+        for name, value in (("qty", 0.0), ("entry", 0.0), ("mark", 0.0), ("lev", lev), ("mmr", mmr)):
+            a[name] = np.append(a[name], value)
+        self.keys.append((symbol, position_idx))
+        self.rows.setdefault(symbol, []).append(len(self.keys) - 1)
+        return len(self.keys) - 1
+
+    def apply_fill(self, symbol: str, side: str, qty: float, price: float, leverage=None, position_idx=None):
+        # 체결(추정) 1건: 진입이면 평균가를 가중, 축소면 평균가 유지, 방향이 바뀌면 체결가가 새 평균가
+        if qty <= 0 or price <= 0:
+            return
+        rate = maintenance_rates(bool(getattr(self.client, "testnet", False))).get(
+            public_client_for(self.client), symbol)
+        with self._lock:
+            rows = [i for i in self.rows.get(symbol, ()) if position_idx is None or self.keys[i][1] == position_idx]
+            i = rows[0] if rows else self._append_row(symbol, rate, leverage or 1.0, position_idx or 0)
+            a = self._arrays
+            old, signed = float(a["qty"][i]), qty if side == "Buy" else -qty
+            new = old + signed
+            if old == 0 or (old > 0) != (new > 0):
+                a["entry"][i] = price
+            elif abs(new) > abs(old):
+                a["entry"][i] = (old * a["entry"][i] + signed * price) / new
+            a["qty"][i], a["mark"][i] = new, price
+            if leverage:
+                a["lev"][i] = leverage
+            self._recompute()
+
+    def apply_open_order(self, symbol: str, qty: float, price: float, leverage=None):
+        with self._lock:
+            rows = self.rows.get(symbol)
+            if not leverage:
+                leverage = float(self._arrays["lev"][rows[0]]) if rows else 1.0
+            self.reserved_by[symbol] = self.reserved_by.get(symbol, 0.0) + qty * price / leverage
+
+    def clear_open_orders(self, symbols=None):
+        # 미체결 취소 반영 (None = 전체 심볼)
+        with self._lock:
+            for symbol in list(self.reserved_by) if symbols is None else symbols:
+                self.reserved_by.pop(symbol, None)
+
+    def apply_leverage(self, symbol: str, leverage: float):
+        # 레버리지 변경은 기존 포지션의 개시증거금도 바꾼다
+        with self._lock:
+            rows = self.rows.get(symbol)
+            if rows:
+                self._arrays["lev"][rows] = leverage
+                self._recompute()
+
+    # ── 계정 지표 ──
+    @property
+    def equity(self) -> float:
+        return self.balance + self.totals["upnl"]
+
+    @property
+    def margin_ratio(self) -> float:
+        equity = self.equity
+        return self.totals["mm"] / equity if equity > 0 else (float("inf") if self.totals["mm"] else 0.0)
+
+    @property
+    def reserved(self) -> float:
+        return sum(self.reserved_by.values())
+
+    @property
+    def available(self) -> float:
+        return self.equity - self.totals["im"] - self.reserved
+
+    def _liquidation(self, qty, entry, mmr, other_mm, other_upnl):
+        # 교차 증거금 청산가: 다른 포지션이 그대로일 때 순자산 == 유지증거금 이 되는 가격
+        # B + U_o + q(p - e) = M_o + |q|·p·mmr  →  p = (M_o - B - U_o + q·e) / (q - |q|·mmr)
+        import numpy as np
+        denom = qty - np.abs(qty) * mmr
+        price = np.divide(other_mm - self.balance - other_upnl + qty * entry, denom,
+                          out=np.zeros_like(qty), where=denom != 0)
+        return np.where(price > 0, price, 0.0)
+
+    def snapshot(self):
+        # 화면/CLI 용: 계정 합계 + 포지션별 청산가·거리 (배열 연산 한 번)
+        import numpy as np
+        with self._lock:
+            t = dict(self.totals)
+            summary = {**t, "balance": self.balance, "reserved": self.reserved, "equity": self.equity,
+                       "available": self.available, "margin_ratio": self.margin_ratio,
+                       "exposure": dict(self.exposure), "ticks": self.ticks, "loaded_at": self.loaded_at}
+            a = {k: v.copy() for k, v in self._arrays.items()} if self._arrays else None
+            keys = list(self.keys)
+        live = {i for i in range(len(keys)) if a["qty"][i]} if keys else set()
+        if not live:
+            summary["positions"] = []
+            return summary
+        qty, entry, mark, lev, mmr = a["qty"], a["entry"], a["mark"], a["lev"], a["mmr"]
+        is_long = qty > 0
+        # 격리 증거금 기준 (레버리지만으로 정해지는 가격)
+        isolated = np.where(is_long, entry * (1 - 1 / lev + mmr), entry * (1 + 1 / lev - mmr))
+        cross = self._liquidation(qty, entry, mmr, t["mm"] - a["mm"], t["upnl"] - a["upnl"])
+        distance = np.where(cross > 0, np.where(is_long, mark - cross, cross - mark) / mark, np.inf)
+        summary["positions"] = [{
+            "symbol": symbol, "position_idx": idx, "side": "Buy" if is_long[i] else "Sell",
+            "notional": float(a["notional"][i]), "im": float(a["im"][i]), "mm": float(a["mm"][i]),
+            "upnl": float(a["upnl"][i]), "leverage": float(lev[i]), "mark": float(mark[i]),
+            "liq_cross": float(cross[i]), "liq_isolated": float(max(isolated[i], 0.0)),
+            "liq_distance": float(distance[i]),
+        } for i, (symbol, idx) in enumerate(keys) if i in live]
+        return summary
+
+    # ── 주문 전 검사 ──
+    def check(self, symbol: str, side: str, notional: float, price: float, leverage=None):
+        # → 거부 메시지 또는 None. 기존 노출을 줄이는 주문은 항상 통과
+        import numpy as np
+        rate = maintenance_rates(bool(getattr(self.client, "testnet", False))).get(
+            public_client_for(self.client), symbol)
+        with self._lock:
+            rows = self.rows.get(symbol, [])
+            a = self._arrays
+            if leverage is None:
+                leverage = float(a["lev"][rows[0]]) if rows else 1.0
+            signed = notional if side == "Buy" else -notional
+            old = self.exposure.get(symbol, 0.0)
+            added = abs(old + signed) - abs(old)
+            if added <= 0:
+                return None
+            mm = self.totals["mm"] + added * rate
+            equity = self.equity
+            available = self.available
+            # 이 심볼의 주문 후 포지션 (평균 진입가는 명목가 가중)
+            qty = sum(float(a["qty"][i]) for i in rows) + signed / price
+            cost = sum(float(a["qty"][i] * a["entry"][i]) for i in rows) + signed
+            other_mm = self.totals["mm"] - sum(float(a["mm"][i]) for i in rows)
+            other_upnl = self.totals["upnl"] - sum(float(a["upnl"][i]) for i in rows)
+        im = added / leverage
+        if im > available:
+            return f"⚠️ 증거금 부족! 필요: {im:.2f} USDT ({leverage:g}x), 가용: {available:.2f} USDT"
+        ratio = mm / equity if equity > 0 else float("inf")
+        if ratio > RISK_MAX_MARGIN_RATIO:
+            return f"⚠️ 주문 후 유지증거금률 {ratio:.1%} > 한도 {RISK_MAX_MARGIN_RATIO:.0%}"
+        if qty:
+            liq = float(self._liquidation(np.array([qty]), np.array([cost / qty]), rate, other_mm, other_upnl)[0])
+            distance = (price - liq if qty > 0 else liq - price) / price if liq > 0 else float("inf")
+            if distance < RISK_MIN_LIQ_DISTANCE:
+                return (f"⚠️ 주문 후 예상 청산가 ${liq:.4f} 까지 {distance:.1%} "
+                        f"(최소 {RISK_MIN_LIQ_DISTANCE:.0%})")
+        return None
+
+_risk_engines = {}     # (계정, 테스트넷) -> RiskEngine
+_risk_lock = threading.Lock()
+
+def risk_engine_for(client) -> RiskEngine:
+    # 계정(API Key 해시)별 1개, 프로세스 전체에서 공유
+    key = (account_key(client), bool(getattr(client, "testnet", False)))
+    with _risk_lock:
+        engine = _risk_engines.get(key)
+        if engine is None:
+            engine = _risk_engines[key] = RiskEngine(client)
+        engine.client = client
+    return engine
+
+def pre_trade_check(client, symbol: str, side: str, notional: float, price: float, balance: float,
+                    leverage=None):
+    # 주문 함수용: 상태가 오래됐으면 포지션·미체결을 다시 읽고 검사 → 거부 메시지 또는 None
+    # 조회에 실패하면 슬리피지 검사처럼 막지 않고 그대로 진행
+    engine = risk_engine_for(client)
+    try:
+        if engine.age() > RISK_STATE_MAX_AGE:
+            engine.load(fetch_positions(client), balance, fetch_open_orders(client))
+        else:
+            engine.balance = balance
+        return engine.check(symbol, side, notional, price, leverage)
+    except Exception as e:
+        logger.warning(f"{symbol} 주문 전 리스크 검사 생략: {e}")
+        return None
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from decimal import Decimal
+
+# ── 수량/가격 정밀도 ──
+MIN_ORDER_NOTIONAL = 5.0   # minNotionalValue 가 없는 심볼의 최소 주문 금액 (USDT)
+DEFAULT_INSTRUMENT = {"priceFilter": {"tickSize": "0.01"},
+                      "lotSizeFilter": {"minOrderQty": "0.001", "maxOrderQty": "10000", "qtyStep": "0.001"}}
+
+def _unit_of(text: str):
+    # "0.001" → (1, 3), "1e-05" → (1, 5), "0.5" → (5, 1), "10" → (10, 0): 값 = 정수 × 10^-소수자리
+    _, digits, exp = Decimal(text).as_tuple()
+    mult = int("".join(map(str, digits)))
+    if exp >= 0:
+        return mult * 10 ** exp, 0
+    return mult, -exp
+
+def _units_to_str(n: int, places: int) -> str:
+    if places == 0:
+        return str(n)
+    text = str(n).rjust(places + 1, "0")
+    return f"{text[:-places]}.{text[-places:]}"
+
+class OrderSizer:
+    # 심볼별 qtyStep/tickSize 를 정수 단위로 미리 분해해 두고 여러 주문을 한 번에 계산
+    # 수량·가격은 "단위 개수(int)" 로 다루고 문자열 변환도 정수 연산이라 부동소수 오차가 없다
+    __slots__ = ("symbol", "qty_step", "tick_size", "min_qty", "max_qty", "min_notional",
+                 "_qty_mult", "_qty_places", "_tick_mult", "_tick_places",
+                 "_step_f", "_tick_f", "_min_units", "_max_units")
+
+    def __init__(self, symbol, qty_step, tick_size, min_qty, max_qty, min_notional=MIN_ORDER_NOTIONAL):
+        self.symbol = symbol
+        self.qty_step = Decimal(qty_step)
+        self.tick_size = Decimal(tick_size)
+        self.min_qty = Decimal(min_qty)
+        self.max_qty = Decimal(max_qty)
+        self.min_notional = float(min_notional)
+        self._qty_mult, self._qty_places = _unit_of(qty_step)
+        self._tick_mult, self._tick_places = _unit_of(tick_size)
+        self._step_f = float(self.qty_step)
+        self._tick_f = float(self.tick_size)
+        self._min_units = int(-(-self.min_qty // self.qty_step))   # 최소 수량 이상인 첫 단위
+        self._max_units = int(self.max_qty // self.qty_step)
+
+    @classmethod
+    def from_info(cls, info):
+        pf = info["priceFilter"]
+        lf = info["lotSizeFilter"]
+        return cls(info.get("symbol", ""), lf.get("qtyStep", lf["minOrderQty"]), pf["tickSize"],
+                   lf["minOrderQty"], lf["maxOrderQty"], lf.get("minNotionalValue", MIN_ORDER_NOTIONAL))
+
+    def qty_str(self, units: int) -> str:
+        return _units_to_str(int(units) * self._qty_mult, self._qty_places)
+
+    def exact_qty_str(self, qty: float) -> str:
+        # 이미 qtyStep 배수인 수량(포지션 크기 등)을 그대로 주문 문자열로
+        return self.qty_str(round(qty / self._step_f))
+
+    def price_str(self, units: int) -> str:
+        return _units_to_str(int(units) * self._tick_mult, self._tick_places)
+
+    def tick_price_str(self, price: float) -> str:
+        # tick 에 맞춘 가격 문자열 (호가창 가격처럼 이미 tick 배수인 값)
+        return self.price_str(round(price / self._tick_f))
+
+    def qty_units(self, notional: float, price: float) -> int:
+        # 주문 금액 → qtyStep 단위 개수 (내림, 최소/최대 수량 미적용)
+        return int(notional / price / self._step_f + 1e-9) if price > 0 else 0
+
+    def units_qty(self, units: int) -> float:
+        return float(self.qty_str(units))
+
+    def min_units_at(self, price: float) -> int:
+        # 이 가격에서 최소 수량·최소 주문 금액을 모두 만족하는 최소 단위 개수
+        notional_units = -(-self.min_notional // (self._step_f * price)) if price > 0 else self._min_units
+        return max(self._min_units, int(notional_units))
+
+    def split(self, units: int, slices: int, price: float):
+        # 총 units 를 slices 개로 고르게 나눔 — 조각마다 최소 수량/금액 이상, 최대 수량 이하가 되도록 조각 수 조정
+        floor_units = self.min_units_at(price)
+        slices = max(min(slices, units // floor_units), -(-units // self._max_units) if self._max_units else 1)
+        if units < floor_units or slices <= 0:
+            return []
+        base, extra = divmod(units, slices)
+        return [base + (1 if i < extra else 0) for i in range(slices)]
+
+    def size(self, notionals, prices, round_price=True):
+        # 주문금액/가격 배열 → (수량 문자열, 가격 문자열, 적용 가격, 주문 금액)
+        # round_price: 가격을 tick 에 맞출지 (bool 또는 주문별 마스크) — 시장가는 현재가 그대로 금액 계산
+        import numpy as np
+        notionals = np.asarray(notionals, dtype=np.float64)
+        prices = np.asarray(prices, dtype=np.float64)
+        tick_units = np.rint(prices / self._tick_f).astype(np.int64)
+        prices = np.where(round_price, tick_units * self._tick_f, prices)
+        valid = prices > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            raw_units = np.floor(np.where(valid, notionals / prices, 0.0) / self._step_f + 1e-9)
+        qty_units = np.clip(raw_units, self._min_units, self._max_units).astype(np.int64)
+        qty_units[~valid] = 0
+        values = qty_units * self._step_f * prices
+        qty_strs = [_units_to_str(n, self._qty_places) for n in (qty_units * self._qty_mult).tolist()]
+        price_strs = [_units_to_str(n, self._tick_places) for n in (tick_units * self._tick_mult).tolist()]
+        return qty_strs, price_strs, prices, values
+
+    def size_one(self, notional: float, price: float, round_price=True):
+        qty_strs, price_strs, prices, values = self.size([notional], [price], round_price)
+        return qty_strs[0], price_strs[0], float(prices[0]), float(values[0])
+
+    def min_notional_msg(self, value: float) -> str:
+        return f"⚠️ 주문 금액이 최소값 미달! 필요: {self.min_notional:g} USDT, 계산: {value:.2f} USDT"
+
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from .client import _mount_pool
+from .metrics import metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# ── 텔레그램 알림 ──
+TELEGRAM_MAX_TEXT = 4096           # 텔레그램 메시지 최대 길이
+_BOT_PATH = re.compile(r"/bot[^/\s'\"]+")
+
+def _redact(error, tg_token: str = "") -> str:
+    # 요청 URL(/bot<토큰>/...) 이 예외 메시지에 섞여 나오므로 로그에 남기기 전에 지운다
+    text = _BOT_PATH.sub("/bot***", str(error))
+    return text.replace(tg_token, "***") if tg_token else text
+
+@lru_cache(maxsize=None)
+def telegram_session():
+    import requests
+    return _mount_pool(requests.Session(), maxsize=4)
+
+def _post_telegram(text: str, tg_token: str, tg_chat_id: str):
+    started = time.perf_counter()
+    try:
+        resp = telegram_session().post(
+            f"https://api.telegram.org/bot{tg_token}/sendMessage",
+            data={"chat_id": tg_chat_id, "text": text[:TELEGRAM_MAX_TEXT]},
+            timeout=5
+        )
+    except Exception:
+        metrics_registry().observe("send_telegram", time.perf_counter() - started, "exception")
+        raise
+    metrics_registry().observe("send_telegram", time.perf_counter() - started,
+                               0 if resp.status_code == 200 else resp.status_code)
+    return resp
+
+def send_telegram(text: str, tg_token: str, tg_chat_id: str):
+    if not (tg_token and tg_chat_id): 
+        return False
+    try:
+        _post_telegram(text, tg_token, tg_chat_id).raise_for_status()
+        return True
+    except Exception as e:
+        logger.error(f"📱 Telegram 전송 실패: {_redact(e, tg_token)}")
+        return False
+
+# ── 텔레그램 비동기 발송 ──
+TELEGRAM_QUEUE_MAX = 256           # 대기열 최대 길이 (초과분은 디스크로)
+TELEGRAM_COALESCE_WINDOW = 1.0     # 이 시간 안에 모인 같은 채팅방 메시지는 하나로 합침 (초)
+TELEGRAM_MAX_RETRIES = 5
+TELEGRAM_MAX_BACKOFF = 30.0        # 재시도 대기 상한 (초)
+TELEGRAM_SPILL_PATH = os.environ.get("TELEGRAM_SPILL_PATH", "telegram_spill.jsonl")
+
+def _telegram_sender(text, tg_token, tg_chat_id):
+    # → (성공 여부, 재시도 대기 초 또는 None=재시도 불가)
+    try:
+        resp = _post_telegram(text, tg_token, tg_chat_id)
+    except Exception as e:
+        logger.warning(f"텔레그램 연결 실패: {_redact(e, tg_token)}")
+        return False, 0.0
+    if resp.status_code == 200:
+        return True, None
+    if resp.status_code == 429:
+        try:
+            return False, float(resp.json().get("parameters", {}).get("retry_after", 1))
+        except Exception:
+            return False, 1.0
+    if resp.status_code >= 500:
+        return False, 0.0
+    logger.warning(f"텔레그램 전송 거부 ({resp.status_code}): {resp.text[:200]}")
+    return False, None
+
+class TelegramDispatcher:
+    # 주문 흐름은 대기열에 넣기만 하고, 백그라운드 워커가 합쳐서 보낸다
+    def __init__(self, sender=_telegram_sender, maxsize=TELEGRAM_QUEUE_MAX,
+                 coalesce_window=TELEGRAM_COALESCE_WINDOW, max_retries=TELEGRAM_MAX_RETRIES,
+                 spill_path=TELEGRAM_SPILL_PATH):
+        self.sender = sender
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+        self.spill_path = spill_path
+        self.queue = queue.Queue(maxsize=maxsize)
+        self._spill_lock = threading.Lock()
+        self._tokens = {}           # chat_id -> 봇 토큰 (메모리에만 — 디스크에는 채팅방과 본문만 쓴다)
+        self.sent = 0
+        self.failed = 0
+        self.spilled = 0
+        self.coalesced = 0
+        self._thread = threading.Thread(target=self._worker, name="telegram", daemon=True)
+        self._thread.start()
+        self._restore_spill()
+
+    def submit(self, text: str, tg_token: str, tg_chat_id: str) -> bool:
+        if not (tg_token and tg_chat_id):
+            return False
+        self._tokens[tg_chat_id] = tg_token
+        item = (tg_token, tg_chat_id, text)
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self._spill(item)
+        return True
+
+    def _spill(self, item):
+        if not self.spill_path:
+            self.failed += 1
+            logger.warning("텔레그램 대기열 초과, 메시지 폐기")
+            return
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps({"chat_id": item[1], "text": item[2]}, ensure_ascii=False) + "\n")
+            self.spilled += 1
+
+    def _restore_spill(self):
+        # 토큰은 메모리 설정에서 찾는다 — 아직 모르는 채팅방(재시작 직후) 메시지는 파일에 남겨 두었다가
+        # 그 채팅방으로 다시 발송 요청이 들어온 뒤 워커가 비었을 때 복원
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        with self._spill_lock:
+            with open(self.spill_path, encoding="utf-8") as fh:
+                entries = [json.loads(line) for line in fh if line.strip()]
+            ready, pending = [], []
+            for entry in entries:
+                if isinstance(entry, list):   # 예전 형식 [토큰, 채팅방, 본문] — 토큰은 버린다
+                    entry = {"chat_id": entry[1], "text": entry[2]}
+                token = self._tokens.get(entry["chat_id"])
+                (ready if token else pending).append((token, entry))
+            if pending:
+                with open(self.spill_path, "w", encoding="utf-8") as fh:
+                    fh.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for _, entry in pending)
+            else:
+                os.remove(self.spill_path)
+        for token, entry in ready:
+            self.submit(entry["text"], token, entry["chat_id"])
+
+    def _drain(self):
+        # 첫 메시지 이후 coalesce_window 동안 추가로 들어온 메시지를 함께 가져온다
+        batch = [self.queue.get()]
+        deadline = time.time() + self.coalesce_window
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _merge(batch):
+        # 채팅방별로 줄바꿈 결합, 길이 제한을 넘으면 나눈다
+        groups = OrderedDict()
+        for tg_token, tg_chat_id, text in batch:
+            parts = groups.setdefault((tg_token, tg_chat_id), [""])
+            if parts[-1] and len(parts[-1]) + len(text) + 1 > TELEGRAM_MAX_TEXT:
+                parts.append("")
+            parts[-1] = f"{parts[-1]}\n{text}" if parts[-1] else text
+        return [(key, text) for key, parts in groups.items() for text in parts]
+
+    def _deliver(self, tg_token, tg_chat_id, text):
+        for attempt in range(self.max_retries):
+            ok, retry_after = self.sender(text, tg_token, tg_chat_id)
+            if ok:
+                self.sent += 1
+                return True
+            if retry_after is None:
+                break
+            time.sleep(min(max(retry_after, 2 ** attempt * 0.5), TELEGRAM_MAX_BACKOFF))
+        self.failed += 1
+        return False
+
+    def _worker(self):
+        while True:
+            batch = self._drain()
+            merged = self._merge(batch)
+            self.coalesced += len(batch) - len(merged)
+            for (tg_token, tg_chat_id), text in merged:
+                self._deliver(tg_token, tg_chat_id, text)
+            for _ in batch:
+                self.queue.task_done()
+            if self.queue.empty():
+                self._restore_spill()
+
+    def stats(self):
+        return {"queued": self.queue.qsize(), "sent": self.sent, "failed": self.failed,
+                "spilled": self.spilled, "coalesced": self.coalesced}
+
+@lru_cache(maxsize=None)
+def telegram_dispatcher() -> TelegramDispatcher:
+    return TelegramDispatcher()
+
+def notify_telegram(text: str, tg_token: str, tg_chat_id: str) -> bool:
+    # 주문 흐름용: 대기열에 넣고 즉시 반환
+    return telegram_dispatcher().submit(text, tg_token, tg_chat_id)
+
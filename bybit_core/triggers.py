@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, insort
+from functools import lru_cache
+
+from .account import fetch_positions, fetch_usdt_balance
+from .client import public_client_for
+from .execution import account_key
+from .market import ticker_cache
+from .orders import close_positions, place_ladder_entry, place_market_order
+from .telegram import send_telegram
+
+logger = logging.getLogger(__name__)
+
+# ── 가격 알림 / 조건 주문 ──
+TRIGGER_DIR = os.environ.get("TRIGGER_DIR", "triggers")   # 규칙 DB 위치 (메인넷/테스트넷 별도 파일)
+TRIGGER_DIRECTIONS = ("above", "below")
+TRIGGER_ACTIONS = ("alert", "market", "ladder", "close")
+TRIGGER_POLL_INTERVAL = 1.0     # 스트림 시세가 없는 심볼을 REST 전체 티커로 평가하는 주기 (초)
+TRIGGER_REARM_BPS = 20.0        # 반복 규칙은 기준가에서 이만큼 되돌아온 뒤에 다시 발동 가능 (bp)
+TRIGGER_BATCH_MAX = 500         # 워커가 한 트랜잭션으로 저장하는 최대 이벤트 수
+
+TRIGGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rules (
+    rule_id INTEGER PRIMARY KEY AUTOINCREMENT, account TEXT NOT NULL, symbol TEXT NOT NULL,
+    direction TEXT NOT NULL, price REAL NOT NULL, action TEXT NOT NULL, params TEXT NOT NULL,
+    repeat INTEGER NOT NULL, enabled INTEGER NOT NULL, armed INTEGER NOT NULL, rearm_price REAL,
+    fired INTEGER NOT NULL DEFAULT 0, note TEXT, created_at REAL, last_fired_at REAL);
+CREATE INDEX IF NOT EXISTS ix_rules_enabled ON rules (enabled);
+CREATE TABLE IF NOT EXISTS firings (
+    rule_id INTEGER NOT NULL, seq INTEGER NOT NULL, account TEXT, symbol TEXT, price REAL,
+    fired_at REAL, ok INTEGER, result TEXT, PRIMARY KEY (rule_id, seq));
+CREATE INDEX IF NOT EXISTS ix_firings_time ON firings (fired_at);
+"""
+
+ACTION_LABELS = {"alert": "알림", "market": "시장가 진입", "ladder": "분할 진입", "close": "청산"}
+
+class TriggerRule:
+    __slots__ = ("rule_id", "account", "symbol", "direction", "price", "action", "params", "repeat", "enabled",
+                 "armed", "rearm_price", "fired", "note", "created_at", "last_fired_at")
+
+    def __init__(self, rule_id, account, symbol, direction, price, action, params, repeat=False, enabled=True,
+                 armed=True, rearm_price=None, fired=0, note="", created_at=0.0, last_fired_at=None):
+        self.rule_id = rule_id
+        self.account = account
+        self.symbol = symbol
+        self.direction = direction
+        self.price = price
+        self.action = action
+        self.params = params
+        self.repeat = repeat
+        self.enabled = enabled
+        self.armed = armed
+        self.rearm_price = rearm_price
+        self.fired = fired
+        self.note = note
+        self.created_at = created_at
+        self.last_fired_at = last_fired_at
+
+    def watch(self):
+        # 지금 감시 중인 (상향 여부, 가격): 무장 상태면 기준가 돌파, 아니면 반대쪽 재무장 가격
+        if self.armed:
+            return self.direction == "above", self.price
+        return self.direction != "above", self.rearm_price
+
+    def disarm(self):
+        # 기준가를 이미 넘어선 상태 — 히스테리시스만큼 되돌아와야 다시 무장
+        offset = TRIGGER_REARM_BPS / 10_000
+        self.armed = False
+        self.rearm_price = self.price * (1 - offset if self.direction == "above" else 1 + offset)
+
+    def key(self):
+        return (self.account, self.symbol, self.direction, self.price, self.action,
+                json.dumps(self.params, sort_keys=True))
+
+    def describe(self):
+        arrow = "↗ 이상" if self.direction == "above" else "↘ 이하"
+        text = f"{self.symbol} {self.price:g} {arrow} → {ACTION_LABELS.get(self.action, self.action)}"
+        side = self.params.get("side")
+        if side:
+            text += f" ({'롱' if side == 'Buy' else '숏'})"
+        return text
+
+    @classmethod
+    def from_row(cls, row):
+        (rule_id, account, symbol, direction, price, action, params, repeat, enabled, armed, rearm_price,
+         fired, note, created_at, last_fired_at) = row
+        return cls(rule_id, account, symbol, direction, price, action, json.loads(params), bool(repeat),
+                   bool(enabled), bool(armed), rearm_price, fired, note or "", created_at, last_fired_at)
+
+class ThresholdIndex:
+    # 심볼 하나의 감시 가격: 두 정렬 리스트 모두 '걸린 항목이 끝쪽에 모이도록' 저장
+    # up 은 (-가격, id) → 현재가 이상인 기준가들이 꼬리, down 은 (가격, id) → 현재가 이하인 기준가들이 꼬리
+    # 틱마다 이분 탐색 2번 + 걸린 꼬리만 잘라내면 된다 (O(log n + 발동 수))
+    __slots__ = ("up", "down")
+
+    def __init__(self):
+        self.up = []
+        self.down = []
+
+    def __len__(self):
+        return len(self.up) + len(self.down)
+
+    def add(self, upward, price, rule_id):
+        if upward:
+            insort(self.up, (-price, rule_id))
+        else:
+            insort(self.down, (price, rule_id))
+
+    def remove(self, upward, price, rule_id):
+        items, key = (self.up, (-price, rule_id)) if upward else (self.down, (price, rule_id))
+        i = bisect_left(items, key)
+        if i < len(items) and items[i] == key:
+            del items[i]
+
+    def match(self, price):
+        i = bisect_left(self.up, (-price, -1))
+        j = bisect_left(self.down, (price, -1))
+        hits = [rule_id for _, rule_id in self.up[i:]] + [rule_id for _, rule_id in self.down[j:]]
+        del self.up[i:], self.down[j:]
+        return hits
+
+class TriggerEngine:
+    # 규칙은 SQLite 에 저장하고 메모리에는 심볼별 ThresholdIndex 로 보관
+    # 틱 평가는 호출한 스레드(스트림 콜백/폴러)에서 잠금 안에 끝내고, 저장·주문·알림은 워커 스레드가 처리
+    def __init__(self, path: str, poll_interval: float = TRIGGER_POLL_INTERVAL):
+        self.path = path
+        self.poll_interval = poll_interval
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(TRIGGER_SCHEMA)
+        self._db_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._rules = {}            # rule_id -> TriggerRule (활성 규칙만)
+        self._index = {}            # symbol -> ThresholdIndex
+        self._stream_at = {}        # symbol -> 마지막 스트림 시세 시각
+        self._clients = {}          # account -> 주문용 클라이언트 (메모리에만)
+        self._telegram = {}         # account -> (tg_token, tg_chat_id)
+        self._lives = []
+        self._price_client = None
+        self._data_version = None
+        self.queue = queue.Queue()   # (종류, 규칙, 발동 번호, 가격) — 틱 경로에서 막히지 않도록 무제한
+        self.ticks = 0
+        self.fired = 0
+        self.duplicates = 0
+        self.eval_ns = 0
+        self._load()
+        threading.Thread(target=self._worker, name="trigger-worker", daemon=True).start()
+        threading.Thread(target=self._poller, name="trigger-poller", daemon=True).start()
+
+    # ── 규칙 저장소 ──
+    def _load(self):
+        with self._db_lock:
+            rows = self._conn.execute("SELECT * FROM rules WHERE enabled = 1").fetchall()
+            self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        with self._lock:
+            self._rules, self._index = {}, {}
+            for row in rows:
+                self._index_rule(TriggerRule.from_row(row))
+
+    def _index_rule(self, rule):
+        # 평가(=발동 선점)는 이 프로세스에 연결된 계정의 규칙만 — 실행할 수 없는 프로세스가 선점하지 않도록
+        self._rules[rule.rule_id] = rule
+        if rule.account in self._clients:
+            upward, price = rule.watch()
+            self._index.setdefault(rule.symbol, ThresholdIndex()).add(upward, price, rule.rule_id)
+
+    def _write(self, sql, params=()):
+        with self._db_lock, self._conn:
+            return self._conn.execute(sql, params)
+
+    # ── 계정·시세 연결 ──
+    def attach(self, client, tg_token: str = "", tg_chat_id: str = ""):
+        # 주문/알림 액션을 실행할 계정 등록 (자격 증명은 저장하지 않으므로 프로세스마다 다시 연결)
+        account = account_key(client)
+        if tg_token and tg_chat_id:
+            self._telegram[account] = (tg_token, tg_chat_id)
+        if self._price_client is None:
+            self._price_client = public_client_for(client)
+        with self._lock:
+            added = account not in self._clients
+            self._clients[account] = client
+            if added:
+                # 처음 연결된 계정: 이미 읽어 둔 그 계정 규칙을 감시 대상에 올린다
+                for rule in self._rules.values():
+                    if rule.account == account:
+                        self._index_rule(rule)
+            symbols = {rule.symbol for rule in self._rules.values() if rule.account == account} if added else ()
+            lives = list(self._lives)
+        for live in lives:
+            for symbol in symbols:
+                live.subscribe_ticker(symbol)
+        return account
+
+    def attach_stream(self, live):
+        # 실시간 ticker 로 평가 — 규칙이 있는 심볼은 모두 구독
+        live.add_listener(self.on_stream)
+        with self._lock:
+            if live not in self._lives:
+                self._lives.append(live)
+            symbols = list(self._index)
+        for symbol in symbols:
+            live.subscribe_ticker(symbol)
+
+    def add_rule(self, client, symbol: str, direction: str, price: float, action: str = "alert", params=None,
+                 repeat: bool = False, note: str = ""):
+        # → (규칙 또는 None, 메시지). 같은 계정의 동일 활성 규칙은 새로 만들지 않는다
+        symbol = symbol.upper()
+        params = params or {}
+        if direction not in TRIGGER_DIRECTIONS:
+            return None, f"❌ 지원하지 않는 방향: {direction}"
+        if action not in TRIGGER_ACTIONS:
+            return None, f"❌ 지원하지 않는 액션: {action}"
+        if price <= 0:
+            return None, "❌ 기준가는 0보다 커야 합니다"
+        account = account_key(client)
+        encoded = json.dumps(params, sort_keys=True)
+        key = (account, symbol, direction, price, action, encoded)
+        with self._lock:
+            for rule in self._rules.values():
+                if rule.key() == key:
+                    return rule, f"ℹ️ 이미 등록된 규칙 #{rule.rule_id}: {rule.describe()}"
+        rule = TriggerRule(None, account, symbol, direction, price, action, params, repeat, note=note,
+                           created_at=time.time())
+        last = self._last_price(client, symbol)
+        if last and (last >= price if direction == "above" else last <= price):
+            rule.disarm()
+        cur = self._write("INSERT INTO rules (account, symbol, direction, price, action, params, repeat, enabled, "
+                          "armed, rearm_price, fired, note, created_at) VALUES (?,?,?,?,?,?,?,1,?,?,0,?,?)",
+                          (account, symbol, direction, price, action, encoded, int(repeat), int(rule.armed),
+                           rule.rearm_price, note, rule.created_at))
+        rule.rule_id = cur.lastrowid
+        with self._lock:
+            self._index_rule(rule)
+            lives = list(self._lives)
+        if account in self._clients:
+            for live in lives:
+                live.subscribe_ticker(symbol)
+        msg = f"✅ 규칙 #{rule.rule_id} 등록: {rule.describe()}"
+        if not rule.armed:
+            msg += f" — 현재가 {last:g} 가 이미 기준을 넘어 {rule.rearm_price:g} 로 되돌아온 뒤부터 감시"
+        return rule, msg
+
+    def _last_price(self, client, symbol):
+        with self._lock:
+            lives = list(self._lives)
+        for live in lives:
+            price = live.last_price(symbol)
+            if price:
+                return price
+        try:
+            return float(ticker_cache(bool(getattr(client, "testnet", False)))
+                         .get(public_client_for(client), symbol)["lastPrice"])
+        except Exception as e:
+            logger.warning(f"{symbol} 현재가 조회 실패, 무장 상태로 등록: {e}")
+            return 0.0
+
+    def remove_rule(self, rule_id: int) -> bool:
+        with self._lock:
+            rule = self._rules.pop(rule_id, None)
+            if rule is not None and rule.symbol in self._index:
+                self._index[rule.symbol].remove(*rule.watch(), rule_id)
+        cur = self._write("UPDATE rules SET enabled = 0 WHERE rule_id = ? AND enabled = 1", (rule_id,))
+        return rule is not None or cur.rowcount > 0
+
+    # ── 틱 평가 ──
+    def on_price(self, symbol: str, price: float):
+        started = time.perf_counter_ns()
+        events = []
+        with self._lock:
+            index = self._index.get(symbol)
+            self.ticks += 1
+            for rule_id in index.match(price) if index else ():
+                rule = self._rules[rule_id]
+                if rule.armed:
+                    rule.fired += 1
+                    rule.last_fired_at = time.time()
+                    if rule.repeat:
+                        rule.disarm()
+                    else:
+                        rule.enabled = False
+                        del self._rules[rule_id]
+                    events.append(("fire", rule, rule.fired, price))
+                else:
+                    rule.armed, rule.rearm_price = True, None
+                    events.append(("arm", rule, rule.fired, price))
+                if rule.enabled:
+                    index.add(*rule.watch(), rule_id)
+            self.eval_ns += time.perf_counter_ns() - started
+        for event in events:
+            self.queue.put(event)
+        return sum(kind == "fire" for kind, *_ in events)
+
+    def on_stream(self, topic: str, rows):
+        # LiveAccountState 리스너: tickers 스트림의 lastPrice 로 평가
+        if not topic.startswith("tickers"):
+            return
+        for row in rows:
+            symbol, last = row.get("symbol"), row.get("lastPrice")
+            if symbol and last:
+                self._stream_at[symbol] = time.time()
+                self.on_price(symbol, float(last))
+
+    def _poller(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self._poll_once()
+            except Exception as e:
+                logger.warning(f"트리거 시세 폴링 실패: {e}")
+
+    def _poll_once(self):
+        # 다른 프로세스(CLI/데몬)가 규칙을 바꿨으면 다시 읽는다
+        with self._db_lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._load()
+        client = self._price_client
+        if client is None:
+            return
+        now = time.time()
+        with self._lock:
+            symbols = [s for s, index in self._index.items()
+                       if len(index) and now - self._stream_at.get(s, 0.0) > 2 * self.poll_interval]
+        cache = ticker_cache(bool(getattr(client, "testnet", False)))
+        for symbol in symbols:
+            # 첫 심볼에서 전체 티커를 한 번 받고 나머지는 캐시 조회
+            self.on_price(symbol, float(cache.get(client, symbol, self.poll_interval)["lastPrice"]))
+
+    # ── 발동 처리 (워커) ──
+    def _worker(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < TRIGGER_BATCH_MAX:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.exception(f"트리거 이벤트 처리 실패: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _process(self, batch):
+        # 발동 기록 + 규칙 상태를 한 트랜잭션으로 저장한 뒤, 새로 기록된 발동만 실행
+        # (규칙, 발동 번호) 가 이미 있으면 다른 세션/프로세스가 처리한 중복 발동
+        fresh = []
+        with self._lock:
+            states = {rule.rule_id: (int(rule.enabled), int(rule.armed), rule.rearm_price, rule.fired,
+                                     rule.last_fired_at, rule.rule_id) for _, rule, _, _ in batch}
+        with self._db_lock, self._conn:
+            for kind, rule, seq, price in batch:
+                if kind != "fire":
+                    continue
+                cur = self._conn.execute("INSERT OR IGNORE INTO firings (rule_id, seq, account, symbol, price, "
+                                         "fired_at) VALUES (?,?,?,?,?,?)",
+                                         (rule.rule_id, seq, rule.account, rule.symbol, price, time.time()))
+                if cur.rowcount:
+                    fresh.append((rule, seq, price))
+                else:
+                    self.duplicates += 1
+            self._conn.executemany("UPDATE rules SET enabled = ?, armed = ?, rearm_price = ?, fired = ?, "
+                                   "last_fired_at = ? WHERE rule_id = ?", list(states.values()))
+        for rule, seq, price in fresh:
+            self.fired += 1
+            ok, result = self._dispatch(rule, price)
+            self._write("UPDATE firings SET ok = ?, result = ? WHERE rule_id = ? AND seq = ?",
+                        (int(ok), result, rule.rule_id, seq))
+
+    def _dispatch(self, rule, price):
+        tg = self._telegram.get(rule.account, ("", ""))
+        head = f"🔔 [{rule.symbol}] {rule.describe()} 발동 (현재가 {price:g})"
+        if rule.note:
+            head += f"\n📝 {rule.note}"
+        if rule.action == "alert":
+            ok = send_telegram(head, *tg)
+            return ok, "알림 전송" if ok else "텔레그램 미설정 또는 전송 실패"
+        client = self._clients.get(rule.account)
+        if client is None:
+            return False, "계정 미연결 — 대시보드 또는 데몬에서 이 계정으로 로그인해야 주문 실행"
+        p = rule.params
+        try:
+            if rule.action == "market":
+                ok, msg = place_market_order(client, rule.symbol, p["side"], p["pct"], fetch_usdt_balance(client),
+                                             p.get("max_slippage_bps"), p.get("slippage_policy", "refuse"),
+                                             leverage=p.get("leverage"))
+            elif rule.action == "ladder":
+                results = place_ladder_entry(client, rule.symbol, p["side"], p["max_pct"], price,
+                                             fetch_usdt_balance(client), max_slippage_bps=p.get("max_slippage_bps"),
+                                             slippage_policy=p.get("slippage_policy", "cap"),
+                                             leverage=p.get("leverage"))
+                ok, msg = all(ok for ok, _ in results), " / ".join(msg for _, msg in results)
+            else:
+                results, _ = close_positions(client, fetch_positions(client, rule.symbol), p.get("side"),
+                                             {rule.symbol})
+                ok = all(ok for _, ok, _ in results)
+                msg = " / ".join(msg for _, _, msg in results) or "📭 청산 대상 포지션 없음"
+        except Exception as e:
+            ok, msg = False, f"❌ 실행 실패: {e}"
+        send_telegram(f"{head}\n{msg}", *tg)
+        return ok, msg
+
+    # ── 조회 ──
+    def rules(self, account=None):
+        with self._lock:
+            rules = [r for r in self._rules.values() if account is None or r.account == account]
+        return sorted(rules, key=lambda r: r.rule_id, reverse=True)
+
+    def firings(self, account=None, limit: int = 50):
+        sql = "SELECT rule_id, seq, symbol, price, fired_at, ok, result FROM firings"
+        params = []
+        if account is not None:
+            sql += " WHERE account = ?"
+            params.append(account)
+        with self._db_lock:
+            rows = self._conn.execute(sql + " ORDER BY fired_at DESC LIMIT ?", params + [int(limit)]).fetchall()
+        return [dict(zip(("rule_id", "seq", "symbol", "price", "fired_at", "ok", "result"), row)) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            thresholds = sum(len(index) for index in self._index.values())
+            symbols = sum(1 for index in self._index.values() if len(index))
+        return {"rules": len(self._rules), "thresholds": thresholds, "symbols": symbols, "ticks": self.ticks,
+                "fired": self.fired, "duplicates": self.duplicates, "queued": self.queue.qsize(),
+                "avg_eval_us": self.eval_ns / self.ticks / 1000 if self.ticks else 0.0}
+
+def trigger_path(testnet: bool) -> str:
+    return os.path.join(TRIGGER_DIR, f"{'testnet' if testnet else 'mainnet'}.db")
+
+@lru_cache(maxsize=None)
+def trigger_engine(testnet: bool = False) -> TriggerEngine:
+    # 프로세스 전체 공유 (메인넷/테스트넷 별도)
+    return TriggerEngine(trigger_path(testnet))
+
+def trigger_engine_for(client) -> TriggerEngine:
+    return trigger_engine(bool(getattr(client, "testnet", False)))
@@ -1,16 +1,28 @@
 # -*- coding: utf-8 -*-
 import streamlit as st
 import pandas as pd
-import json
-import time
-import hmac
-import hashlib
-import urllib.parse
-import urllib.request
+import numpy as np
+import importlib.util
 import logging
-from math import floor
+import random
+import time
 from datetime import datetime
 
+from bybit_core.account import fetch_open_orders, fetch_positions, fetch_usdt_balance, refresh_accounts
+from bybit_core.client import client_pool
+from bybit_core.execution import EXEC_ICEBERG_TIMEOUT, EXEC_STRATEGIES, account_key, execution_scheduler
+from bybit_core.history import HISTORY_SYNC_INTERVAL, HistoryStore, history_path, history_store
+from bybit_core.klines import KLINE_COLUMNS, KLINE_INTERVALS, KLINE_LABELS, fetch_klines, kline_cache
+from bybit_core.live import live_account_state
+from bybit_core.market import get_current_price, quote_age
+from bybit_core.metrics import metrics_registry
+from bybit_core.orderbook import ORDERBOOK_DISPLAY_MAX_AGE, depth_cache, estimate_market_fill
+from bybit_core.risk import RISK_MAX_MARGIN_RATIO, RISK_MIN_LIQ_DISTANCE, risk_engine_for
+from bybit_core.orders import (ENTRY_TIERS, MAX_SLIPPAGE_BPS, bulk_cancel_orders, cancel_all_orders, close_positions,
+                               place_ladder_entry)
+from bybit_core.telegram import notify_telegram, send_telegram, telegram_dispatcher
+from bybit_core.triggers import ACTION_LABELS, TRIGGER_ACTIONS, trigger_engine_for
+
 # 페이지 설정
 st.set_page_config(
     page_title="🚀 Bybit 자동매매 대시보드",
@@ -23,14 +35,12 @@ st.set_page_config(
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# pybit 동적 임포트 (설치 안 되어있으면 안내)
-try:
-    from pybit.unified_trading import HTTP
-    PYBIT_AVAILABLE = True
-except ImportError:
-    PYBIT_AVAILABLE = False
+# pybit 설치 확인 (설치 안 되어있으면 안내) — 실제 임포트는 bybit_core 가 클라이언트를 만들 때
+PYBIT_AVAILABLE = importlib.util.find_spec("pybit") is not None
+if not PYBIT_AVAILABLE:
     st.error("⚠️ pybit 패키지가 설치되지 않았습니다. requirements.txt를 확인해주세요.")
 
+
 # 세션 상태 초기화
 if 'client' not in st.session_state:
     st.session_state.client = None
@@ -38,9 +48,10 @@ if 'last_update' not in st.session_state:
     st.session_state.last_update = None
 if 'connected' not in st.session_state:
     st.session_state.connected = False
-
-# 상수
-TRADE_CATEGORY = "linear"
+if 'sub_accounts' not in st.session_state:
+    st.session_state.sub_accounts = {}    # 이름 -> (api_key, api_secret, testnet)
+if 'account_data' not in st.session_state:
+    st.session_state.account_data = {}    # 이름 -> 마지막 조회 결과
 
 # 스타일링
 st.markdown("""
@@ -78,213 +89,452 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# ── 텔레그램 알림 ──
-def send_telegram(text: str, tg_token: str, tg_chat_id: str):
-    if not (tg_token and tg_chat_id): 
-        return False
-    data = urllib.parse.urlencode({"chat_id": tg_chat_id, "text": text}).encode()
-    try:
-        urllib.request.urlopen(
-            urllib.request.Request(
-                f"https://api.telegram.org/bot{tg_token}/sendMessage",
-                data=data, method="POST"
-            ),
-            timeout=5
-        )
-        return True
-    except Exception as e:
-        st.error(f"📱 Telegram 전송 실패: {e}")
-        return False
-
-# ── 잔고 조회 ──
+# ── 조회 (화면용) ── 실패하면 화면에 오류를 띄우고 기본값
 def get_usdt_balance(client) -> float:
     try:
-        resp = client.get_wallet_balance(accountType="UNIFIED", coin="USDT")
-        result = resp.get("result", {})
-        
-        if isinstance(result.get("list"), list):
-            for account in result["list"]:
-                coins = account.get("coin", [])
-                if isinstance(coins, list):
-                    for coin_info in coins:
-                        if coin_info.get("coin") == "USDT":
-                            return float(coin_info.get("walletBalance", 0))
-        else:
-            usdt_info = result.get("USDT", {})
-            if usdt_info:
-                return float(usdt_info.get("walletBalance", 0))
-                
-        return 190.0  # 기본값
-        
+        return fetch_usdt_balance(client)
     except Exception as e:
         st.error(f"💰 잔고 조회 실패: {e}")
         return 190.0
 
-# ── 포지션 조회 ──
 def get_positions(client, symbol=None):
     try:
-        resp = client.get_positions(category=TRADE_CATEGORY, symbol=symbol)
-        positions = resp.get("result", {}).get("list", [])
-        
-        active_positions = []
-        for p in positions:
-            if float(p.get("size", 0)) > 0:
-                unrealized_pnl = float(p.get("unrealisedPnl", 0))
-                avg_price = float(p.get("avgPrice", 1))
-                percentage = (unrealized_pnl / (avg_price * float(p.get("size", 1)))) * 100 if avg_price > 0 else 0
-                
-                active_positions.append({
-                    "심볼": p.get("symbol"),
-                    "방향": "🟢 롱" if p.get("side") == "Buy" else "🔴 숏",
-                    "수량": f"{float(p.get('size', 0)):.4f}",
-                    "평균가": f"${float(p.get('avgPrice', 0)):.4f}",
-                    "현재가": f"${float(p.get('markPrice', 0)):.4f}",
-                    "손익(USDT)": f"{unrealized_pnl:.2f}",
-                    "손익(%)": f"{percentage:.2f}%"
-                })
-        
-        return active_positions
+        return fetch_positions(client, symbol)
     except Exception as e:
         st.error(f"📊 포지션 조회 실패: {e}")
         return []
 
-# ── 미체결 주문 조회 ──
 def get_open_orders(client, symbol=None):
     try:
-        resp = client.get_open_orders(category=TRADE_CATEGORY, symbol=symbol)
-        orders = resp.get("result", {}).get("list", [])
-        
-        order_list = []
-        for order in orders:
-            order_list.append({
-                "주문ID": order.get("orderId", "")[:8] + "...",
-                "심볼": order.get("symbol"),
-                "방향": "🟢 Buy" if order.get("side") == "Buy" else "🔴 Sell",
-                "타입": order.get("orderType"),
-                "수량": f"{float(order.get('qty', 0)):.4f}",
-                "가격": f"${float(order.get('price', 0)):.4f}",
-                "상태": order.get("orderStatus"),
-            })
-        
-        return order_list
+        return fetch_open_orders(client, symbol)
     except Exception as e:
         st.error(f"📋 미체결 주문 조회 실패: {e}")
         return []
 
-# ── 현재가 조회 ──
-def get_current_price(client, symbol: str):
-    try:
-        ticker = client.get_tickers(category=TRADE_CATEGORY, symbol=symbol)
-        return float(ticker["result"]["list"][0]["lastPrice"])
-    except Exception as e:
-        st.error(f"💹 현재가 조회 실패: {e}")
-        return 0
+REFRESH_LABELS = {"balance": "💰 잔고", "positions": "📊 포지션", "open_orders": "📋 미체결 주문"}
 
-# ── 전체 주문 취소 ──
-def cancel_all_orders(client, symbol: str):
-    try:
-        result = client.cancel_all_orders(category=TRADE_CATEGORY, symbol=symbol)
-        return result.get("retCode", 0) == 0
-    except Exception as e:
-        st.error(f"❌ 주문 취소 실패: {e}")
-        return False
+# ── 주문 취소/청산 (화면용) ──
+def cancel_report_table(report):
+    symbols = sorted(report)
+    return pd.DataFrame({
+        "심볼": symbols,
+        "취소": [report[s]["cancelled"] for s in symbols],
+        "잔여": [report[s]["remaining"] for s in symbols],
+        "결과": ["✅" if not report[s]["remaining"] and not report[s]["error"]
+                 else f"⚠️ {report[s]['error'] or '미취소 주문 남음'}" for s in symbols],
+    })
+
+def close_flow(client, title: str, side=None, symbols=None, live=None):
+    # 청산 버튼 공통 흐름: 실시간 스트림이면 화면 상태로 즉시 청산, REST 모드면 청산 직전에 다시 조회
+    # (REST 화면 상태는 최대 30초 전 — 방금 진입한 포지션이 빠져 있을 수 있다) → 다음 실행에서 새로 조회
+    if live is not None and live.ready:
+        positions = st.session_state.get('positions', [])
+    else:
+        try:
+            positions = fetch_positions(client, next(iter(symbols)) if symbols and len(symbols) == 1 else None)
+        except Exception as e:
+            st.warning(f"📊 포지션 조회 실패, 화면 상태로 청산합니다: {e}")
+            positions = st.session_state.get('positions', [])
+    with st.status(f"📤 {title} 중...", expanded=True) as status:
+        started = time.time()
+        results, cancel_report = close_positions(client, positions, side, symbols)
+        for _, _, msg in results:
+            st.write(msg)
+        for symbol, entry in sorted(cancel_report.items()):
+            if entry["error"]:
+                st.write(f"⚠️ {symbol} 미체결 주문 취소 실패: {entry['error']}")
+        cancelled = sum(entry["cancelled"] for entry in cancel_report.values())
+        st.write(f"❌ 미체결 주문 {cancelled}건 취소")
+        if not results:
+            st.write(f"📭 {title} 대상 포지션이 없습니다.")
+        failed = [msg for _, ok, msg in results if not ok]
+        status.update(label=f"{'⚠️' if failed else '✅'} {title} 완료! ({time.time() - started:.2f}초)",
+                      state="error" if failed else "complete")
+    st.session_state.last_update = None
+    
+    # 텔레그램 알림
+    if st.session_state.get('tg_token') and results:
+        lines = [f"📤 {title} 완료!"] + [msg for _, _, msg in results]
+        notify_telegram("\n".join(lines), st.session_state['tg_token'], st.session_state['tg_chat_id'])
+
+# ── 시장가 체결 예상 ──
+SLIPPAGE_POLICY_LABELS = {"cap": "축소", "refuse": "거부"}
 
-# ── 심볼 정보 조회 ──
-def get_order_unit(client, symbol: str):
+def slippage_settings():
+    # 0 은 검사 안 함 → place_ladder_entry 의 max_slippage_bps=None
+    bps = st.session_state.get('max_slippage_bps', MAX_SLIPPAGE_BPS)
+    return (bps or None), st.session_state.get('slippage_policy', "cap")
+
+def market_leg_estimates(client, symbol: str, notional: float):
+    # 1차 시장가 금액의 롱/숏 예상 체결 — 조회 실패 시 None
     try:
-        resp = client.get_instruments_info(category=TRADE_CATEGORY, symbol=symbol)
-        info = resp["result"]["list"][0]
-        pf = info["priceFilter"]
-        lf = info["lotSizeFilter"]
-        tick = float(pf["tickSize"])
-        min_q = float(lf["minOrderQty"])
-        max_q = float(lf["maxOrderQty"])
-        step = float(lf.get("qtyStep", min_q))
-        dec = len(str(pf["tickSize"]).split('.')[-1]) if '.' in str(pf["tickSize"]) else 0
-        return min_q, max_q, step, tick, dec
+        return {side: estimate_market_fill(client, symbol, side, notional, max_age=ORDERBOOK_DISPLAY_MAX_AGE)[0]
+                for side in ("Buy", "Sell")}
     except Exception as e:
-        st.error(f"🔍 심볼 정보 조회 실패: {e}")
-        return 0.001, 10000, 0.001, 0.01, 2
+        st.warning(f"📚 호가 조회 실패: {e}")
+        return None
+
+def estimate_text(est):
+    text = f"${est.vwap:.4f} ({est.slippage_bps:+.1f}bp · {est.levels}호가)"
+    return text if est.complete else f"{text} ⚠️ 호가 부족"
+
+# ── 리스크 (증거금·청산가) ──
+RISK_FORMATS = {"명목가(USDT)": "{:.2f}", "개시증거금": "{:.2f}", "유지증거금": "{:.2f}", "현재가": "${:.4f}",
+                "청산가(교차)": "${:.4f}", "청산가(격리)": "${:.4f}", "청산 거리": "{:.2%}"}
+
+def risk_table(snap):
+    rows = snap["positions"]
+    return pd.DataFrame({
+        "심볼": [r["symbol"] for r in rows],
+        "방향": ["🟢 롱" if r["side"] == "Buy" else "🔴 숏" for r in rows],
+        "명목가(USDT)": [r["notional"] for r in rows],
+        "개시증거금": [r["im"] for r in rows],
+        "유지증거금": [r["mm"] for r in rows],
+        "현재가": [r["mark"] for r in rows],
+        # 0 = 잔고로 버틸 수 있어 청산가 없음
+        "청산가(교차)": [r["liq_cross"] or np.nan for r in rows],
+        "청산가(격리)": [r["liq_isolated"] or np.nan for r in rows],
+        "청산 거리": [r["liq_distance"] if np.isfinite(r["liq_distance"]) else np.nan for r in rows],
+    })
+
+def distance_styles(values):
+    v = values.to_numpy()
+    return np.where(v < RISK_MIN_LIQ_DISTANCE, PNL_NEGATIVE_CSS, "")
+
+def risk_panel(risk):
+    snap = risk.snapshot()
+    col_r1, col_r2, col_r3, col_r4 = st.columns(4)
+    col_r1.metric("🛡️ 증거금 비율", f"{snap['margin_ratio']:.2%}",
+                  help=f"유지증거금 / 순자산 — {RISK_MAX_MARGIN_RATIO:.0%} 를 넘기는 신규 주문은 거부")
+    col_r2.metric("💼 순자산", f"{snap['equity']:.2f} USDT")
+    col_r3.metric("🔒 사용 증거금", f"{snap['im'] + snap['reserved']:.2f} USDT",
+                  help="포지션 개시증거금 + 미체결 주문 예약분")
+    col_r4.metric("🆓 가용 증거금", f"{snap['available']:.2f} USDT")
+    if snap["positions"]:
+        st.dataframe(risk_table(snap).style.apply(distance_styles, subset=['청산 거리']).format(RISK_FORMATS, na_rep="-"),
+                     use_container_width=True, hide_index=True)
+    exposure = {symbol: value for symbol, value in snap["exposure"].items() if value}
+    if exposure:
+        st.caption("📐 심볼별 순노출: " + " · ".join(f"{symbol} {value:+,.2f}" for symbol, value in
+                                                     sorted(exposure.items(), key=lambda kv: -abs(kv[1]))))
+    st.caption(f"⚡ 시세 틱 {snap['ticks']}회 증분 반영 · 청산가는 1단계 유지증거금률 기준 교차 증거금 추정치")
+
+# ── 분할 집행 (TWAP / 아이스버그) ──
+EXEC_STRATEGY_LABELS = {"twap": "TWAP (시간 분할 시장가)", "iceberg": "아이스버그 (최우선 호가 리밋 → 시장가)"}
+EXEC_STATUS_LABELS = {"pending": "⏳ 대기", "running": "▶️ 진행 중", "done": "✅ 완료", "cancelled": "⏹️ 취소",
+                      "failed": "❌ 실패"}
+
+@st.fragment(run_every=2)
+def execution_panel(client):
+    # 작업은 백그라운드 스레드에서 진행 — 이 조각만 2초마다 다시 그려 진행률을 보여준다
+    jobs = execution_scheduler().jobs(account_key(client))
+    if not jobs:
+        st.caption("📭 집행 중인 작업이 없습니다.")
+        return
+    for job in jobs[:5]:
+        snap = job.snapshot()
+        side = "롱" if snap["side"] == "Buy" else "숏"
+        avg = f"${snap['avg_price']:.4f}" if snap["filled_qty"] else "-"
+        col_j1, col_j2 = st.columns([4, 1])
+        with col_j1:
+            st.progress(min(snap["progress"], 1.0),
+                        text=f"{snap['job_id']} · {snap['symbol']} {side} {snap['filled_qty']:g}/{snap['target_qty']:g} "
+                             f"· 평균 체결가 {avg} · {EXEC_STATUS_LABELS.get(snap['status'], snap['status'])}")
+        with col_j2:
+            if job.active and st.button("⏹️ 중지", key=f"exec_cancel_{snap['job_id']}", use_container_width=True):
+                execution_scheduler().cancel(snap["job_id"])
+        if snap["messages"]:
+            st.caption(" · ".join(snap["messages"][-3:]))
+
+# ── 가격 알림 / 조건 주문 ──
+TRIGGER_DIRECTION_LABELS = {"above": "↗ 이상 (상향 돌파)", "below": "↘ 이하 (하향 돌파)"}
+TRIGGER_SIDE_LABELS = {"Buy": "롱", "Sell": "숏", None: "양방향"}
 
-# ── 시장가 주문 ──
-def place_market_order(client, symbol: str, side: str, pct: float, balance: float):
+def trigger_panel(client, symbol: str, current_price: float):
+    engine = trigger_engine_for(client)
+    col_t1, col_t2, col_t3 = st.columns(3)
+    with col_t1:
+        t_symbol = st.text_input("🎯 심볼", value=symbol, key="trigger_symbol").upper()
+        t_direction = st.radio("조건", list(TRIGGER_DIRECTION_LABELS), format_func=TRIGGER_DIRECTION_LABELS.get,
+                               key="trigger_direction", horizontal=True)
+        t_price = st.number_input("기준가", value=float(current_price) if current_price > 0 else 0.0,
+                                  format="%.6f", key="trigger_price")
+    with col_t2:
+        t_action = st.selectbox("실행", TRIGGER_ACTIONS, format_func=ACTION_LABELS.get, key="trigger_action")
+        sides = [None, "Buy", "Sell"] if t_action == "close" else ["Buy", "Sell"]
+        t_side = st.selectbox("방향", sides, format_func=TRIGGER_SIDE_LABELS.get, key=f"trigger_side_{t_action}",
+                              disabled=t_action == "alert")
+        t_pct = st.number_input("금액 (잔고 대비 %)", 1.0, 100.0, float(st.session_state.get('max_position_pct', 100)),
+                                1.0, key="trigger_pct", disabled=t_action not in ("market", "ladder"))
+    with col_t3:
+        t_repeat = st.checkbox("🔁 반복 (되돌아오면 다시 감시)", key="trigger_repeat")
+        t_note = st.text_input("📝 메모", key="trigger_note")
+        if st.button("➕ 규칙 추가", use_container_width=True) and t_symbol and t_price > 0:
+            max_bps, policy = slippage_settings()
+            params = {}
+            if t_action in ("market", "ladder"):
+                params = {"side": t_side, "pct" if t_action == "market" else "max_pct": t_pct,
+                          "max_slippage_bps": max_bps, "slippage_policy": policy,
+                          "leverage": st.session_state.get('leverage')}
+            elif t_action == "close" and t_side:
+                params = {"side": t_side}
+            rule, msg = engine.add_rule(client, t_symbol, t_direction, t_price, t_action, params, t_repeat, t_note)
+            (st.success if rule else st.error)(msg)
+    
+    rules = engine.rules(account_key(client))
+    stats = engine.stats()
+    st.caption(f"🔔 활성 규칙 {len(rules)}개 · 전체 {stats['rules']}개 / {stats['symbols']}심볼 · "
+               f"틱 {stats['ticks']}회 (평균 {stats['avg_eval_us']:.1f}µs) · 발동 {stats['fired']}회")
+    if rules:
+        st.dataframe(pd.DataFrame([{
+            "#": r.rule_id,
+            "조건": r.describe(),
+            "상태": "🟢 감시 중" if r.armed else f"⏸️ {r.rearm_price:g} 복귀 대기",
+            "반복": "🔁" if r.repeat else "",
+            "발동": r.fired,
+            "메모": r.note,
+        } for r in rules]), use_container_width=True, hide_index=True)
+        col_d1, col_d2 = st.columns([3, 1])
+        with col_d1:
+            remove_ids = st.multiselect("삭제할 규칙", [r.rule_id for r in rules], key="trigger_remove",
+                                        format_func=lambda rule_id: f"#{rule_id}")
+        with col_d2:
+            if st.button("🗑️ 삭제", use_container_width=True, disabled=not remove_ids):
+                for rule_id in remove_ids:
+                    engine.remove_rule(rule_id)
+                st.rerun()
+    firings = engine.firings(account_key(client), limit=20)
+    if firings:
+        st.dataframe(pd.DataFrame([{
+            "시각": datetime.fromtimestamp(f["fired_at"]).strftime("%m-%d %H:%M:%S"),
+            "#": f["rule_id"],
+            "심볼": f["symbol"],
+            "발동가": f["price"],
+            "결과": ("✅ " if f["ok"] else "⚠️ " if f["ok"] is not None else "⏳ ") + (f["result"] or ""),
+        } for f in firings]), use_container_width=True, hide_index=True)
+
+# ── 캔들 차트 ──
+def get_klines(client, symbol: str, interval: str, bars: int = 200):
     try:
-        current_price = get_current_price(client, symbol)
-        if current_price <= 0:
-            return False, "현재가 조회 실패"
-            
-        min_q, max_q, step, tick, dec = get_order_unit(client, symbol)
-        
-        order_value_usdt = balance * pct / 100
-        raw_qty = order_value_usdt / current_price
-        qty = max(min_q, floor(min(raw_qty, max_q) / step) * step)
-        
-        qty_decimals = len(str(step).split('.')[-1]) if '.' in str(step) else 0
-        qty = round(qty, qty_decimals)
-        
-        final_order_value = qty * current_price
-        
-        if final_order_value < 5.0:
-            return False, f"⚠️ 주문 금액이 최소값 미달! 필요: 5 USDT, 계산: {final_order_value:.2f} USDT"
-        
-        if final_order_value > balance:
-            return False, f"⚠️ 잔고 부족! 필요: {final_order_value:.2f} USDT, 잔고: {balance:.2f} USDT"
-        
-        res = client.place_order(
-            category=TRADE_CATEGORY,
-            symbol=symbol,
-            side=side,
-            orderType="Market",
-            qty=str(qty),
-            timeInForce="IOC",
-            reduceOnly=False
-        )
-        
-        if res.get("retCode", 0) == 0:
-            return True, f"✅ 시장가 주문 성공: {side} {qty}@${current_price:.4f} = {final_order_value:.2f} USDT"
-        else:
-            return False, f"❌ 주문 실패: {res.get('retMsg', 'Unknown error')}"
-            
+        return fetch_klines(client, symbol, interval, bars)
     except Exception as e:
-        return False, f"❌ 주문 실패: {str(e)}"
+        st.error(f"📉 캔들 조회 실패: {e}")
+        return np.empty((0, len(KLINE_COLUMNS)))
+
+@st.fragment
+def kline_chart(client, symbol: str):
+    # 주기·봉 수를 바꿔도 차트만 다시 그림
+    col_k1, col_k2 = st.columns([1, 2])
+    with col_k1:
+        interval = st.selectbox("⏱️ 주기", list(KLINE_INTERVALS), index=2, format_func=KLINE_LABELS.get,
+                                key="kline_interval")
+    with col_k2:
+        bars = st.select_slider("📏 봉 수", options=[100, 200, 500, 1000], value=200, key="kline_bars")
+    rows = get_klines(client, symbol, interval, bars)
+    if not len(rows):
+        st.info("📭 캔들 데이터가 없습니다.")
+        return
+    frame = pd.DataFrame({"종가": rows[:, 4]}, index=pd.to_datetime(rows[:, 0], unit="ms"))
+    st.line_chart(frame, height=260)
+    last = rows[-1]
+    st.caption(f"시가 {last[1]:g} · 고가 {last[2]:g} · 저가 {last[3]:g} · 종가 {last[4]:g} · 거래량 {last[5]:g}")
 
-# ── 리밋 주문 ──
-def place_limit_order(client, symbol: str, side: str, pct: float, price: float, balance: float):
+# ── 체결 이력 동기화 ──
+def sync_history(store: HistoryStore, client, force: bool = False):
+    # 동기화 간격 안에서는 건너뜀 — 실패해도 저장된 이력은 그대로 보여준다
+    if not force and time.time() - store.last_sync_at < HISTORY_SYNC_INTERVAL:
+        return None
     try:
-        min_q, max_q, step, tick, dec = get_order_unit(client, symbol)
-        
-        order_value_usdt = balance * pct / 100
-        raw_qty = order_value_usdt / price
-        qty = max(min_q, floor(min(raw_qty, max_q) / step) * step)
-        
-        qty_decimals = len(str(step).split('.')[-1]) if '.' in str(step) else 0
-        qty = round(qty, qty_decimals)
-        
-        final_order_value = qty * price
-        
-        if final_order_value < 5.0:
-            return False, f"⚠️ 주문 금액이 최소값 미달! 필요: 5 USDT, 계산: {final_order_value:.2f} USDT"
-        
-        price_adj = round(round(price / tick) * tick, dec)
-        
-        res = client.place_order(
-            category=TRADE_CATEGORY,
-            symbol=symbol,
-            side=side,
-            orderType="Limit",
-            qty=str(qty),
-            price=str(price_adj),
-            timeInForce="GTC",
-            reduceOnly=False
-        )
-        
-        if res.get("retCode", 0) == 0:
-            return True, f"✅ 리밋 주문 성공: {side} {qty}@${price_adj:.4f} = {final_order_value:.2f} USDT"
-        else:
-            return False, f"❌ 주문 실패: {res.get('retMsg', 'Unknown error')}"
-            
+        return store.sync(client)
     except Exception as e:
-        return False, f"❌ 주문 실패: {str(e)}"
+        st.warning(f"⚠️ 이력 동기화 실패 (저장된 이력 표시): {e}")
+        return None
+
+# ── 포지션 분석 (벡터 연산) ──
+PNL_POSITIVE_CSS = 'background-color: #d4edda; color: #155724'
+PNL_NEGATIVE_CSS = 'background-color: #f8d7da; color: #721c24'
+
+def position_frame(positions):
+    # 갱신 1회당 한 번 열 단위로 구성하고 파생 지표는 열 연산으로 계산
+    n = len(positions)
+    col = lambda attr: np.fromiter((getattr(p, attr) for p in positions), dtype=np.float64, count=n)
+    df = pd.DataFrame({
+        "symbol": [p.symbol for p in positions],
+        "side": [p.side for p in positions],
+        "size": col("size"),
+        "avg_price": col("avg_price"),
+        "mark_price": col("mark_price"),
+        "pnl": col("unrealised_pnl"),
+        "leverage": col("leverage"),
+    })
+    cost = (df["avg_price"] * df["size"]).to_numpy()
+    df["notional"] = df["size"] * df["mark_price"]
+    df["pnl_pct"] = np.divide(df["pnl"].to_numpy() * 100, cost, out=np.zeros(n), where=cost > 0)
+    df["is_long"] = df["side"].to_numpy() == "Buy"
+    return df
+
+def position_totals(df):
+    notional = df["notional"].to_numpy()
+    lev = df["leverage"].to_numpy()
+    margin = np.divide(notional, lev, out=np.zeros(len(df)), where=lev > 0)
+    is_long = df["is_long"].to_numpy()
+    return {
+        "pnl": float(df["pnl"].sum()),
+        "notional": float(notional.sum()),
+        "long_notional": float(notional[is_long].sum()),
+        "short_notional": float(notional[~is_long].sum()),
+        # 증거금 가중 평균 레버리지
+        "leverage": float(notional.sum() / margin.sum()) if margin.sum() > 0 else 0.0,
+    }
+
+def cached_position_frame(positions):
+    # 같은 갱신 결과면 다시 만들지 않는다
+    cached = st.session_state.get('_position_frame')
+    if cached is None or cached[0] is not positions:
+        cached = (positions, position_frame(positions))
+        st.session_state['_position_frame'] = cached
+    return cached[1]
+
+# ── 다중 계정 집계 ──
+PRIMARY_ACCOUNT = "기본"   # 사이드바 API 설정으로 연결한 주 계정 (매매 대상)
+
+def account_frames(accounts):
+    # {계정: {"balance", "positions", "open_orders"}} → 계정 열이 붙은 포지션 프레임 하나로
+    frames = [position_frame(data["positions"]).assign(account=name)
+              for name, data in accounts.items() if data.get("positions")]
+    return pd.concat(frames, ignore_index=True) if frames else position_frame([]).assign(account=[])
+
+def account_summary(accounts):
+    rows = []
+    for name, data in accounts.items():
+        totals = position_totals(position_frame(data.get("positions", [])))
+        rows.append({"계정": name, "잔고(USDT)": data.get("balance", 0.0),
+                     "포지션": len(data.get("positions", [])), "미체결": len(data.get("open_orders", [])),
+                     "명목가(USDT)": totals["notional"], "손익(USDT)": totals["pnl"],
+                     "갱신": datetime.fromtimestamp(data["updated_at"]).strftime("%H:%M:%S")
+                             if data.get("updated_at") else "-"})
+    return pd.DataFrame(rows)
+
+ACCOUNT_FORMATS = {"잔고(USDT)": "{:.2f}", "명목가(USDT)": "{:.2f}", "손익(USDT)": "{:.2f}"}
+
+def pnl_styles(values):
+    # 열 전체를 한 번에 마스킹 (셀별 콜백 없음)
+    v = values.to_numpy()
+    return np.where(v > 0, PNL_POSITIVE_CSS, np.where(v < 0, PNL_NEGATIVE_CSS, ""))
+
+# ── 화면 표시용 테이블 ──
+def positions_table(df):
+    table = pd.DataFrame({
+        "심볼": df["symbol"],
+        "방향": np.where(df["is_long"], "🟢 롱", "🔴 숏"),
+        "수량": df["size"],
+        "평균가": df["avg_price"],
+        "현재가": df["mark_price"],
+        "명목가(USDT)": df["notional"],
+        "레버리지": df["leverage"],
+        "손익(USDT)": df["pnl"],
+        "손익(%)": df["pnl_pct"],
+    })
+    if "account" in df:
+        table.insert(0, "계정", df["account"])
+    return table
+
+def orders_table(orders):
+    return pd.DataFrame({
+        "주문ID": [o.order_id[:8] + "..." for o in orders],
+        "심볼": [o.symbol for o in orders],
+        "방향": ["🟢 Buy" if o.side == "Buy" else "🔴 Sell" for o in orders],
+        "타입": [o.order_type for o in orders],
+        "수량": [o.qty for o in orders],
+        "가격": [o.price for o in orders],
+        "상태": [o.status for o in orders],
+    })
+
+POSITION_FORMATS = {"수량": "{:.4f}", "평균가": "${:.4f}", "현재가": "${:.4f}", "명목가(USDT)": "{:.2f}",
+                    "레버리지": "{:g}x", "손익(USDT)": "{:.2f}", "손익(%)": "{:.2f}%"}
+ORDER_FORMATS = {"수량": "{:.4f}", "가격": "${:.4f}"}
+
+def executions_table(df):
+    return pd.DataFrame({
+        "체결시각": pd.to_datetime(df["exec_time"], unit="ms").dt.strftime("%m-%d %H:%M:%S"),
+        "심볼": df["symbol"],
+        "방향": np.where(df["side"] == "Buy", "🟢 Buy", "🔴 Sell"),
+        "가격": df["price"],
+        "수량": df["qty"],
+        "수수료": df["fee"],
+        "청산수량": df["closed_size"],
+    })
+
+def symbol_history_table(df):
+    return pd.DataFrame({
+        "심볼": df["symbol"],
+        "청산 거래": df["trades"],
+        "실현 손익(USDT)": df["pnl"],
+        "승률": df["win_rate"],
+        "수수료(USDT)": df["fees"],
+    })
+
+EXECUTION_FORMATS = {"가격": "${:.4f}", "수량": "{:.4f}", "수수료": "{:.4f}", "청산수량": "{:.4f}"}
+SYMBOL_HISTORY_FORMATS = {"실현 손익(USDT)": "{:.2f}", "승률": "{:.0%}", "수수료(USDT)": "{:.4f}"}
+HISTORY_PERIODS = {"7일": 7, "30일": 30, "90일": 90, "1년": 365, "전체": None}
+
+# ── 자동 새로고침 스케줄러 ──
+AUTO_REFRESH_INTERVALS = [10, 15, 30, 60, 120, 300]  # 선택 가능한 주기 (초)
+AUTO_REFRESH_JITTER = 0.1      # 주기의 ±10% 무작위 분산 (여러 탭이 동시에 몰리지 않도록)
+AUTO_REFRESH_TICK = 2          # 예약 시각 점검 주기 (초) — 프래그먼트만 다시 실행됨
+
+def next_refresh_at(now: float, interval: float, jitter: float = AUTO_REFRESH_JITTER) -> float:
+    return now + interval * (1 + random.uniform(-jitter, jitter))
+
+def auto_refresh_due(state, now: float) -> bool:
+    # 프래그먼트는 같은 세션의 전체 실행과 겹쳐 돌지 않으므로 예약 시각만 본다
+    due_at = state.get('next_refresh_at')
+    return due_at is not None and now >= due_at
+
+@st.fragment(run_every=AUTO_REFRESH_TICK)
+def auto_refresh_ticker():
+    # 스크립트 스레드를 붙잡지 않고, 예약 시각이 되면 전체 화면을 한 번 다시 실행
+    now = time.time()
+    interval = st.session_state.get('auto_refresh_interval', 30)
+    if st.session_state.get('next_refresh_at') is None:
+        st.session_state.next_refresh_at = next_refresh_at(now, interval)
+        return
+    if auto_refresh_due(st.session_state, now):
+        st.session_state.next_refresh_at = next_refresh_at(now, interval)
+        st.session_state.last_update = None
+        st.rerun()
+
+# ── 성능 패널 ──
+@st.fragment(run_every=5)
+def performance_panel():
+    st.subheader("⏱️ 성능 모니터")
+    metrics = metrics_registry()
+    snap = metrics.snapshot()
+    if not snap:
+        st.caption("아직 기록된 호출이 없습니다.")
+        return
+    render = snap.get("render")
+    if render:
+        st.caption(f"🖥️ 화면 렌더링: p50 {render['p50_ms']:.0f}ms · p99 {render['p99_ms']:.0f}ms · {render['count']}회")
+    rows = [{
+        "호출": name,
+        "횟수": row["count"],
+        "오류": row["errors"],
+        "p50(ms)": row["p50_ms"],
+        "p95(ms)": row["p95_ms"],
+        "p99(ms)": row["p99_ms"],
+        "최대(ms)": row["max_ms"],
+        "retCode": ", ".join(f"{k}×{v}" for k, v in row["ret_codes"].items()),
+        "한도 잔여": f"{row['remaining']}/{row['limit']}" if row["remaining"] is not None else "",
+        "최저 여유율": f"{row['min_headroom']:.0%}" if row["min_headroom"] is not None else "",
+    } for name, row in snap.items() if name != "render"]
+    st.dataframe(pd.DataFrame(rows).style.format({c: "{:.0f}" for c in ["p50(ms)", "p95(ms)", "p99(ms)", "최대(ms)"]}),
+                 use_container_width=True, hide_index=True)
+    col_exp1, col_exp2 = st.columns(2)
+    col_exp1.download_button("📥 Prometheus 내보내기", metrics.to_prometheus(), file_name="dashboard_metrics.prom",
+                             mime="text/plain", use_container_width=True)
+    col_exp2.download_button("📥 JSON 내보내기", metrics.to_json(), file_name="dashboard_metrics.json",
+                             mime="application/json", use_container_width=True)
 
 # ── 메인 대시보드 ──
 def main():
@@ -302,6 +552,34 @@ def main():
         api_key = st.text_input("API Key", type="password", help="Bybit API Key를 입력하세요")
         api_secret = st.text_input("API Secret", type="password", help="Bybit API Secret을 입력하세요")
         testnet = st.checkbox("🧪 테스트넷 사용", value=False, help="실제 거래 전 테스트넷에서 먼저 테스트하세요")
+        live_stream = st.checkbox("⚡ 실시간 스트림 (WebSocket)", value=False, help="포지션·주문·잔고 변경을 WebSocket으로 즉시 반영합니다")
+        
+        with st.expander("👥 서브 계정", expanded=False):
+            st.caption("조회 전용으로 함께 집계됩니다. 매매는 위의 기본 계정으로만 실행됩니다.")
+            sub_name = st.text_input("계정 이름", key="sub_name", placeholder="예: sub-1")
+            sub_key = st.text_input("API Key", type="password", key="sub_key")
+            sub_secret = st.text_input("API Secret", type="password", key="sub_secret")
+            sub_testnet = st.checkbox("🧪 테스트넷", value=False, key="sub_testnet")
+            if st.button("➕ 계정 추가", use_container_width=True):
+                if not (sub_name and sub_key and sub_secret):
+                    st.warning("⚠️ 이름, API Key, Secret을 모두 입력해주세요.")
+                elif sub_name == PRIMARY_ACCOUNT or sub_name in st.session_state.sub_accounts:
+                    st.warning(f"⚠️ 이미 사용 중인 이름입니다: {sub_name}")
+                else:
+                    try:
+                        fetch_usdt_balance(client_pool().authenticated(sub_key, sub_secret, sub_testnet))
+                        st.session_state.sub_accounts[sub_name] = (sub_key, sub_secret, sub_testnet)
+                        st.session_state.accounts_updated_at = 0.0
+                        st.success(f"✅ {sub_name} 추가 완료")
+                    except Exception as e:
+                        st.error(f"❌ {sub_name} 연결 실패: {e}")
+            for name in list(st.session_state.sub_accounts):
+                col_acc1, col_acc2 = st.columns([3, 1])
+                col_acc1.write(f"• {name}" + (" (테스트넷)" if st.session_state.sub_accounts[name][2] else ""))
+                if col_acc2.button("🗑️", key=f"remove_account_{name}"):
+                    del st.session_state.sub_accounts[name]
+                    st.session_state.account_data.pop(name, None)
+                    st.rerun()
         
         st.divider()
         
@@ -324,15 +602,16 @@ def main():
         st.header("⚙️ 거래 설정")
         max_position_pct = st.slider("최대 포지션 비율 (%)", 10, 100, 100, 5, help="전체 잔고 대비 사용할 비율")
         leverage = st.selectbox("레버리지", [1, 2, 5, 10, 12.5, 15, 20, 25], index=4, help="거래 레버리지 설정")
+        max_slippage_bps = st.number_input("허용 슬리피지 (bp)", 0.0, 500.0, MAX_SLIPPAGE_BPS, 5.0,
+                                           help="1차 시장가의 호가창 기준 예상 슬리피지 한도 (중간가 대비, 0 = 검사 안 함)")
+        slippage_policy = st.radio("한도 초과 시", list(SLIPPAGE_POLICY_LABELS), horizontal=True,
+                                   format_func=SLIPPAGE_POLICY_LABELS.get,
+                                   help="축소: 한도 안에서 체결될 금액까지만 시장가 주문 / 거부: 1차 시장가를 보내지 않음")
         
         if st.button("💾 설정 저장", type="primary"):
             if api_key and api_secret:
                 try:
-                    client = HTTP(
-                        api_key=api_key,
-                        api_secret=api_secret,
-                        testnet=testnet
-                    )
+                    client = client_pool().authenticated(api_key, api_secret, testnet)
                     # 연결 테스트
                     test_balance = get_usdt_balance(client)
                     
@@ -340,10 +619,13 @@ def main():
                     st.session_state.api_key = api_key
                     st.session_state.api_secret = api_secret
                     st.session_state.testnet = testnet
+                    st.session_state.live_stream = live_stream
                     st.session_state.tg_token = tg_token
                     st.session_state.tg_chat_id = tg_chat_id
                     st.session_state.max_position_pct = max_position_pct
                     st.session_state.leverage = leverage
+                    st.session_state.max_slippage_bps = max_slippage_bps
+                    st.session_state.slippage_policy = slippage_policy
                     st.session_state.connected = True
                     
                     st.success(f"✅ API 연결 성공! 잔고: {test_balance:.2f} USDT")
@@ -395,84 +677,138 @@ def main():
             last_update_time = datetime.fromtimestamp(st.session_state.last_update).strftime("%H:%M:%S")
             st.caption(f"마지막 업데이트: {last_update_time}")
     
-    if st.session_state.last_update is None or (time.time() - st.session_state.last_update) > 30:
+    # 실시간 스트림: 메모리 상태를 그대로 사용하고 REST 폴링은 생략
+    live = None
+    if st.session_state.get('live_stream'):
+        try:
+            live = live_account_state(st.session_state.api_key, st.session_state.api_secret,
+                                      st.session_state.get('testnet', False))
+        except Exception as e:
+            st.warning(f"⚠️ 실시간 스트림 연결 실패, REST 조회로 대체합니다: {e}")
+    
+    # 가격 트리거: 이 계정의 주문·알림 실행을 엔진에 연결 (평가는 백그라운드에서 계속)
+    triggers = trigger_engine_for(client)
+    triggers.attach(client, st.session_state.get('tg_token', ""), st.session_state.get('tg_chat_id', ""))
+    if live is not None:
+        triggers.attach_stream(live)
+    
+    clients = {}
+    if live is not None and live.ready:
+        st.session_state.update(live.snapshot())
+        st.session_state.last_update = max(live.last_message_at, live.last_resync_at)
+    elif st.session_state.last_update is None or (time.time() - st.session_state.last_update) > 30:
+        st.session_state.last_update = time.time()
+        clients[PRIMARY_ACCOUNT] = client
+    # 서브 계정은 항상 REST — 주 계정 갱신과 같은 풀에서 한 번에 조회
+    sub_accounts = st.session_state.sub_accounts
+    if sub_accounts and (clients or time.time() - st.session_state.get('accounts_updated_at', 0.0) > 30):
+        st.session_state.accounts_updated_at = time.time()
+        for name, (key, secret, net) in sub_accounts.items():
+            clients[name] = client_pool().authenticated(key, secret, net)
+    
+    if clients:
         with st.spinner("🔄 데이터 업데이트 중..."):
-            st.session_state.last_update = time.time()
-            
-            # 잔고 조회
-            balance = get_usdt_balance(client)
-            st.session_state.balance = balance
-            
-            # 포지션 조회
-            positions = get_positions(client)
-            st.session_state.positions = positions
-            
-            # 미체결 주문 조회
-            open_orders = get_open_orders(client)
-            st.session_state.open_orders = open_orders
+            # 계정별 잔고/포지션/미체결 주문 동시 조회 (완료된 항목만 반영)
+            results, errors = refresh_accounts(clients)
+            for account in clients:
+                if account == PRIMARY_ACCOUNT:
+                    st.session_state.update(results[account])
+                else:
+                    data = st.session_state.account_data.setdefault(account, {})
+                    data.update(results[account], updated_at=time.time())
+                prefix = "" if account == PRIMARY_ACCOUNT else f"[{account}] "
+                for name, err in errors[account].items():
+                    st.warning(f"⚠️ {prefix}{REFRESH_LABELS.get(name, name)} 갱신 실패 (이전 값 유지): {err}")
+    
+    # 리스크 엔진: 계정 상태 버전(스트림 account_version / REST 갱신 시각)이 바뀐 경우에만 다시 적재,
+    # 그 사이엔 시세 틱과 주문 결과로 증분 갱신 (실시간 스냅샷 목록은 실행마다 새 객체라 목록으로 비교하지 않는다)
+    risk = risk_engine_for(client)
+    risk_version = (("live", st.session_state.get('account_version')) if live is not None and live.ready
+                    else ("rest", st.session_state.last_update))
+    risk.sync(risk_version, st.session_state.get('positions', []), st.session_state.get('balance', 0.0),
+              st.session_state.get('open_orders', []))
+    if live is not None:
+        live.add_listener(risk.on_stream)
+        for position in st.session_state.get('positions', []):
+            live.subscribe_ticker(position.symbol)
     
-    # 상단 메트릭
+    # 주 계정 + 서브 계정 집계 대상
+    accounts = {PRIMARY_ACCOUNT: {"balance": st.session_state.get('balance', 0.0),
+                                  "positions": st.session_state.get('positions', []),
+                                  "open_orders": st.session_state.get('open_orders', []),
+                                  "updated_at": st.session_state.last_update}}
+    accounts.update((name, st.session_state.account_data.get(name, {})) for name in sub_accounts)
+    
+    # 상단 메트릭 (서브 계정이 있으면 전 계정 합계)
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        balance = st.session_state.get('balance', 0)
+        balance = sum(data.get("balance", 0.0) for data in accounts.values())
         st.metric("💰 USDT 잔고", f"{balance:.2f} USDT")
     
     with col2:
-        total_positions = len(st.session_state.get('positions', []))
+        total_positions = sum(len(data.get("positions", [])) for data in accounts.values())
         st.metric("📊 포지션 수", total_positions)
     
     with col3:
-        total_orders = len(st.session_state.get('open_orders', []))
+        total_orders = sum(len(data.get("open_orders", [])) for data in accounts.values())
         st.metric("📋 미체결 주문", total_orders)
     
     with col4:
         # 총 손익 계산
-        positions = st.session_state.get('positions', [])
-        total_pnl = 0
-        for pos in positions:
-            try:
-                pnl_str = pos.get('손익(USDT)', '0').replace(' USDT', '')
-                total_pnl += float(pnl_str)
-            except:
-                pass
-        
-        delta_color = "normal"
-        if total_pnl > 0:
-            delta_color = "normal"
-        elif total_pnl < 0:
-            delta_color = "inverse"
-            
+        if sub_accounts:
+            totals = position_totals(account_frames(accounts))
+        else:
+            totals = position_totals(cached_position_frame(st.session_state.get('positions', [])))
+        total_pnl = totals["pnl"]
         st.metric("💹 총 손익", f"{total_pnl:.2f} USDT", delta=f"{total_pnl:.2f}")
     
     # 탭 구성
-    tab1, tab2, tab3, tab4 = st.tabs(["📊 포지션 관리", "🚀 수동 매매", "📋 주문 관리", "⚙️ 도구"])
+    tab1, tab2, tab3, tab_history, tab4 = st.tabs(["📊 포지션 관리", "🚀 수동 매매", "📋 주문 관리", "📜 거래 이력", "⚙️ 도구"])
     
     with tab1:
         st.header("📊 현재 포지션")
         
-        if st.session_state.get('positions'):
-            df_positions = pd.DataFrame(st.session_state['positions'])
+        positions_view = None
+        if sub_accounts:
+            st.caption(f"👥 {len(accounts)}개 계정 합계 — 상단 메트릭은 전 계정 기준, 매매는 '{PRIMARY_ACCOUNT}' 계정 대상")
+            st.dataframe(account_summary(accounts).style.apply(pnl_styles, subset=['손익(USDT)']).format(ACCOUNT_FORMATS),
+                         use_container_width=True, hide_index=True)
+            positions_view = st.selectbox("🔎 계정 선택", ["전체"] + list(accounts), key="account_drilldown")
+        
+        if positions_view:
+            shown = accounts if positions_view == "전체" else {positions_view: accounts[positions_view]}
+            df = account_frames(shown)
+        else:
+            df = cached_position_frame(st.session_state['positions']) if st.session_state.get('positions') else None
+        
+        if df is not None and len(df):
+            totals = position_totals(df)
             
-            # 데이터프레임 스타일링
-            def highlight_pnl(val):
-                if isinstance(val, str) and '%' in val:
-                    try:
-                        num = float(val.replace('%', ''))
-                        if num > 0:
-                            return 'background-color: #d4edda; color: #155724'
-                        elif num < 0:
-                            return 'background-color: #f8d7da; color: #721c24'
-                    except:
-                        pass
-                return ''
+            col_p1, col_p2, col_p3, col_p4 = st.columns(4)
+            col_p1.metric("📐 총 명목가", f"{totals['notional']:.2f} USDT")
+            col_p2.metric("🟢 롱 명목가", f"{totals['long_notional']:.2f} USDT")
+            col_p3.metric("🔴 숏 명목가", f"{totals['short_notional']:.2f} USDT")
+            col_p4.metric("⚡ 평균 레버리지", f"{totals['leverage']:.2f}x")
             
-            styled_df = df_positions.style.applymap(highlight_pnl, subset=['손익(%)'])
+            # 데이터프레임 스타일링 (열 단위 마스크)
+            styled_df = (positions_table(df).style
+                         .apply(pnl_styles, subset=['손익(USDT)', '손익(%)'])
+                         .format(POSITION_FORMATS))
             st.dataframe(styled_df, use_container_width=True, hide_index=True)
             
         else:
             st.info("📭 현재 보유 중인 포지션이 없습니다.")
             st.markdown("**💡 포지션을 시작하려면 '수동 매매' 탭을 이용하세요!**")
+        
+        if st.session_state.get('positions'):
+            st.subheader(f"🛡️ 리스크 ({PRIMARY_ACCOUNT} 계정)")
+            risk_panel(risk)
+        
+        if positions_view and positions_view != "전체" and accounts[positions_view].get("open_orders"):
+            st.subheader(f"📋 {positions_view} 미체결 주문")
+            st.dataframe(orders_table(accounts[positions_view]["open_orders"]).style.format(ORDER_FORMATS),
+                         use_container_width=True, hide_index=True)
     
     with tab2:
         st.header("🚀 수동 매매")
@@ -486,8 +822,16 @@ def main():
             # 현재가 자동 조회
             if symbol_entry and st.session_state.get('connected'):
                 try:
-                    current_price = get_current_price(client, symbol_entry)
-                    st.info(f"💹 현재가: ${current_price:.4f}")
+                    current_price = None
+                    if live is not None:
+                        live.subscribe_ticker(symbol_entry)
+                        live.subscribe_orderbook(symbol_entry)
+                        current_price = live.last_price(symbol_entry)
+                    if current_price is None:
+                        current_price = get_current_price(client, symbol_entry)
+                        st.info(f"💹 현재가: ${current_price:.4f} ({quote_age(client, symbol_entry):.1f}초 전 시세)")
+                    else:
+                        st.info(f"💹 현재가: ${current_price:.4f} (실시간)")
                 except:
                     current_price = 0
                     st.warning("⚠️ 현재가 조회 실패")
@@ -502,6 +846,23 @@ def main():
                 help="분할 진입의 기준 가격"
             )
             
+            # 1차 시장가 예상 체결 (호가창 VWAP)
+            if current_price > 0:
+                market_weight = sum(w for off, w in ENTRY_TIERS if off is None)
+                market_notional = (st.session_state.get('balance', 190) * st.session_state.get('max_position_pct', 100)
+                                   * market_weight / 100)
+                estimates = market_leg_estimates(client, symbol_entry, market_notional)
+                if estimates:
+                    limit_bps, _ = slippage_settings()
+                    over = limit_bps is not None and any(
+                        e.slippage_bps > limit_bps or not e.complete for e in estimates.values())
+                    text = (f"📚 1차 시장가 {market_notional:.2f} USDT 예상 체결 — "
+                            f"롱 {estimate_text(estimates['Buy'])} · 숏 {estimate_text(estimates['Sell'])}")
+                    if over:
+                        st.warning(f"{text} · 한도 {limit_bps:g}bp 초과")
+                    else:
+                        st.caption(text)
+            
             st.markdown("---")
             
             if st.button("🟢 **롱 진입 (L)**", type="primary", use_container_width=True):
@@ -510,25 +871,25 @@ def main():
                     max_pct = st.session_state.get('max_position_pct', 100)
                     
                     with st.status("🚀 롱 포지션 진입 중...", expanded=True) as status:
-                        # 1차 진입 (45% 시장가)
-                        st.write("📈 1차 진입 (45% 시장가)...")
-                        success, msg = place_market_order(client, symbol_entry, "Buy", max_pct * 0.45, balance)
-                        st.write(msg)
-                        
-                        # 2-4차 진입 (리밋)
-                        tier_pcts = [(0.02, max_pct * 0.20), (0.03, max_pct * 0.20), (0.04, max_pct * 0.15)]
-                        for i, (off, pct) in enumerate(tier_pcts):
-                            limit_price = price_entry * (1 - off)
-                            st.write(f"📊 {i+2}차 진입 ({pct:.1f}% @ ${limit_price:.4f})...")
-                            success, msg = place_limit_order(client, symbol_entry, "Buy", pct, limit_price, balance)
-                            st.write(msg)
+                        # 1차 시장가 + 2-4차 리밋 (배치 전송)
+                        st.write("📈 분할 진입 주문 전송 (1차 45% 시장가, 2-4차 리밋)...")
+                        max_bps, policy = slippage_settings()
+                        results = place_ladder_entry(client, symbol_entry, "Buy", max_pct, price_entry, balance,
+                                                     max_slippage_bps=max_bps, slippage_policy=policy,
+                                                     leverage=st.session_state.get('leverage'))
+                        for i, (success, msg) in enumerate(results):
+                            st.write(f"📊 {i+1}차 진입: {msg}")
                         
                         status.update(label="✅ 롱 포지션 진입 완료!", state="complete")
-                        
-                    # 텔레그램 알림
+                    st.session_state.last_update = None   # 다음 실행에서 새 포지션을 조회
+                    
+                    # 텔레그램 알림 (티어 결과는 발송 시 한 메시지로 합쳐짐)
                     if st.session_state.get('tg_token'):
-                        send_telegram(f"🟢 [{symbol_entry}] 롱 포지션 진입 완료!", 
-                                    st.session_state['tg_token'], st.session_state['tg_chat_id'])
+                        notify_telegram(f"🟢 [{symbol_entry}] 롱 포지션 진입 완료!", 
+                                        st.session_state['tg_token'], st.session_state['tg_chat_id'])
+                        for i, (success, msg) in enumerate(results):
+                            notify_telegram(f"{i+1}차: {msg}",
+                                            st.session_state['tg_token'], st.session_state['tg_chat_id'])
             
             if st.button("🔴 **숏 진입 (S)**", type="secondary", use_container_width=True):
                 if symbol_entry and price_entry > 0:
@@ -536,25 +897,25 @@ def main():
                     max_pct = st.session_state.get('max_position_pct', 100)
                     
                     with st.status("🚀 숏 포지션 진입 중...", expanded=True) as status:
-                        # 1차 진입 (45% 시장가)
-                        st.write("📉 1차 진입 (45% 시장가)...")
-                        success, msg = place_market_order(client, symbol_entry, "Sell", max_pct * 0.45, balance)
-                        st.write(msg)
-                        
-                        # 2-4차 진입 (리밋)
-                        tier_pcts = [(0.02, max_pct * 0.20), (0.03, max_pct * 0.20), (0.04, max_pct * 0.15)]
-                        for i, (off, pct) in enumerate(tier_pcts):
-                            limit_price = price_entry * (1 + off)
-                            st.write(f"📊 {i+2}차 진입 ({pct:.1f}% @ ${limit_price:.4f})...")
-                            success, msg = place_limit_order(client, symbol_entry, "Sell", pct, limit_price, balance)
-                            st.write(msg)
+                        # 1차 시장가 + 2-4차 리밋 (배치 전송)
+                        st.write("📉 분할 진입 주문 전송 (1차 45% 시장가, 2-4차 리밋)...")
+                        max_bps, policy = slippage_settings()
+                        results = place_ladder_entry(client, symbol_entry, "Sell", max_pct, price_entry, balance,
+                                                     max_slippage_bps=max_bps, slippage_policy=policy,
+                                                     leverage=st.session_state.get('leverage'))
+                        for i, (success, msg) in enumerate(results):
+                            st.write(f"📊 {i+1}차 진입: {msg}")
                         
                         status.update(label="✅ 숏 포지션 진입 완료!", state="complete")
+                    st.session_state.last_update = None   # 다음 실행에서 새 포지션을 조회
                     
-                    # 텔레그램 알림
+                    # 텔레그램 알림 (티어 결과는 발송 시 한 메시지로 합쳐짐)
                     if st.session_state.get('tg_token'):
-                        send_telegram(f"🔴 [{symbol_entry}] 숏 포지션 진입 완료!", 
-                                    st.session_state['tg_token'], st.session_state['tg_chat_id'])
+                        notify_telegram(f"🔴 [{symbol_entry}] 숏 포지션 진입 완료!", 
+                                        st.session_state['tg_token'], st.session_state['tg_chat_id'])
+                        for i, (success, msg) in enumerate(results):
+                            notify_telegram(f"{i+1}차: {msg}",
+                                            st.session_state['tg_token'], st.session_state['tg_chat_id'])
         
         with col_trade2:
             st.subheader("🚪 청산")
@@ -564,82 +925,79 @@ def main():
             
             if st.button("📤 **롱 청산 (LT)**", type="primary", use_container_width=True):
                 if symbol_exit:
-                    with st.status("📤 롱 포지션 청산 중...", expanded=True) as status:
-                        # 미체결 주문 취소
-                        st.write("❌ 미체결 주문 취소 중...")
-                        cancel_success = cancel_all_orders(client, symbol_exit)
-                        st.write("✅ 미체결 주문 취소 완료" if cancel_success else "⚠️ 미체결 주문 취소 실패")
-                        
-                        # 포지션 조회 및 청산
-                        st.write("📊 포지션 조회 중...")
-                        positions = get_positions(client, symbol_exit)
-                        
-                        closed_any = False
-                        for pos in positions:
-                            if '롱' in pos.get('방향', ''):
-                                st.write(f"📤 롱 포지션 청산: {pos['수량']}")
-                                # 시장가로 즉시 청산
-                                try:
-                                    size = float(pos['수량'])
-                                    price = float(pos['현재가'].replace('$', ''))
-                                    success, msg = place_market_order(client, symbol_exit, "Sell", 100, size * price)
-                                    st.write(msg)
-                                    closed_any = True
-                                except Exception as e:
-                                    st.write(f"❌ 청산 실패: {e}")
-                        
-                        if not closed_any:
-                            st.write("📭 청산할 롱 포지션이 없습니다.")
-                        
-                        status.update(label="✅ 롱 포지션 청산 완료!", state="complete")
-                    
-                    # 텔레그램 알림
-                    if st.session_state.get('tg_token'):
-                        send_telegram(f"📤 [{symbol_exit}] 롱 포지션 청산 완료!", 
-                                    st.session_state['tg_token'], st.session_state['tg_chat_id'])
+                    close_flow(client, f"[{symbol_exit}] 롱 포지션 청산", "Buy", {symbol_exit}, live=live)
             
             if st.button("📤 **숏 청산 (ST)**", type="secondary", use_container_width=True):
                 if symbol_exit:
-                    with st.status("📤 숏 포지션 청산 중...", expanded=True) as status:
-                        # 미체결 주문 취소
-                        st.write("❌ 미체결 주문 취소 중...")
-                        cancel_success = cancel_all_orders(client, symbol_exit)
-                        st.write("✅ 미체결 주문 취소 완료" if cancel_success else "⚠️ 미체결 주문 취소 실패")
-                        
-                        # 포지션 조회 및 청산
-                        st.write("📊 포지션 조회 중...")
-                        positions = get_positions(client, symbol_exit)
-                        
-                        closed_any = False
-                        for pos in positions:
-                            if '숏' in pos.get('방향', ''):
-                                st.write(f"📤 숏 포지션 청산: {pos['수량']}")
-                                # 시장가로 즉시 청산
-                                try:
-                                    size = float(pos['수량'])
-                                    price = float(pos['현재가'].replace('$', ''))
-                                    success, msg = place_market_order(client, symbol_exit, "Buy", 100, size * price)
-                                    st.write(msg)
-                                    closed_any = True
-                                except Exception as e:
-                                    st.write(f"❌ 청산 실패: {e}")
-                        
-                        if not closed_any:
-                            st.write("📭 청산할 숏 포지션이 없습니다.")
-                        
-                        status.update(label="✅ 숏 포지션 청산 완료!", state="complete")
-                    
-                    # 텔레그램 알림
-                    if st.session_state.get('tg_token'):
-                        send_telegram(f"📤 [{symbol_exit}] 숏 포지션 청산 완료!", 
-                                    st.session_state['tg_token'], st.session_state['tg_chat_id'])
+                    close_flow(client, f"[{symbol_exit}] 숏 포지션 청산", "Sell", {symbol_exit}, live=live)
+            
+            st.markdown("---")
+            
+            if st.button("🧹 **전체 청산 (모든 심볼)**", use_container_width=True,
+                         help="모든 미체결 주문을 취소하고 모든 포지션을 reduce-only 시장가로 동시에 청산합니다"):
+                close_flow(client, "전체 포지션 청산", live=live)
+        
+        st.markdown("---")
+        st.subheader("⏱️ 분할 집행")
+        if live is not None:
+            live.add_listener(execution_scheduler().on_stream)
+        col_exec1, col_exec2, col_exec3, col_exec4 = st.columns(4)
+        with col_exec1:
+            exec_strategy = st.selectbox("방식", EXEC_STRATEGIES, format_func=EXEC_STRATEGY_LABELS.get,
+                                         key="exec_strategy")
+        with col_exec2:
+            exec_pct = st.number_input("금액 (잔고 대비 %)", 1.0, 100.0, 10.0, 1.0, key="exec_pct")
+        with col_exec3:
+            exec_slices = st.number_input("조각 수", 1, 50, 5, key="exec_slices")
+        with col_exec4:
+            if exec_strategy == "twap":
+                exec_window = st.number_input("집행 시간 (초)", 5, 3600, 60, 5, key="exec_duration")
+            else:
+                exec_window = st.number_input("조각당 대기 (초)", 1, 600, int(EXEC_ICEBERG_TIMEOUT), key="exec_timeout",
+                                              help="최우선 호가에 걸어 둔 리밋이 이 시간 안에 다 체결되지 않으면 취소 후 시장가")
+        exec_notional = st.session_state.get('balance', 190) * exec_pct / 100
+        st.caption(f"🎯 {symbol_entry} {exec_notional:.2f} USDT 를 {exec_slices}조각으로 집행 "
+                   f"(심볼 수량 단위·최소 주문금액에 맞춰 조각 수가 줄어들 수 있음)")
+        col_exec_buy, col_exec_sell = st.columns(2)
+        for column, side, label in ((col_exec_buy, "Buy", "🟢 분할 매수"), (col_exec_sell, "Sell", "🔴 분할 매도")):
+            if column.button(label, key=f"exec_{side}", use_container_width=True) and symbol_entry:
+                duration, timeout = (exec_window, EXEC_ICEBERG_TIMEOUT) if exec_strategy == "twap" else (0.0, exec_window)
+                job, msg = execution_scheduler().submit(client, symbol_entry, side, exec_notional, exec_strategy,
+                                                        int(exec_slices), float(duration), float(timeout),
+                                                        stream=live is not None)
+                if job:
+                    st.session_state.last_update = None
+                (st.success if job else st.error)(msg)
+        execution_panel(client)
+        
+        st.markdown("---")
+        st.subheader("🔔 가격 알림 / 조건 주문")
+        trigger_panel(client, symbol_entry, current_price)
+    
+        if symbol_entry and st.session_state.get('connected'):
+            st.markdown("---")
+            st.subheader(f"📉 {symbol_entry} 차트")
+            kline_chart(client, symbol_entry)
     
     with tab3:
         st.header("📋 미체결 주문 관리")
         
+        cancel_report = st.session_state.pop('cancel_report', None)
+        if cancel_report:
+            report, info = cancel_report
+            left = len(info["remaining_orders"])
+            summary = (f"{sum(r['cancelled'] for r in report.values())}건 취소 · {len(report)}개 심볼 · "
+                       f"{info['round_trips']}회 요청 · {info['elapsed']:.2f}초")
+            if left:
+                st.warning(f"⚠️ 일괄 취소 후 {left}건이 남아 있습니다 ({summary})")
+            else:
+                st.success(f"✅ 모든 미체결 주문을 취소했습니다 ({summary})")
+            if report:
+                st.dataframe(cancel_report_table(report), use_container_width=True, hide_index=True)
+        
         if st.session_state.get('open_orders'):
-            df_orders = pd.DataFrame(st.session_state['open_orders'])
-            st.dataframe(df_orders, use_container_width=True, hide_index=True)
+            df_orders = orders_table(st.session_state['open_orders'])
+            st.dataframe(df_orders.style.format(ORDER_FORMATS), use_container_width=True, hide_index=True)
             
             st.markdown("---")
             
@@ -654,10 +1012,10 @@ def main():
                 if st.button("❌ **주문 취소**", type="secondary", use_container_width=True):
                     if cancel_symbol == "ALL":
                         with st.spinner("❌ 모든 미체결 주문 취소 중..."):
-                            symbols = set([order['심볼'] for order in st.session_state['open_orders']])
-                            for symbol in symbols:
-                                cancel_all_orders(client, symbol)
-                            st.success("✅ 모든 미체결 주문을 취소했습니다.")
+                            report, info = bulk_cancel_orders(client, st.session_state['open_orders'])
+                            # 검증용으로 새로 읽은 목록이 곧 최신 미체결 주문
+                            st.session_state.open_orders = info["remaining_orders"]
+                            st.session_state.cancel_report = (report, info)
                             st.rerun()
                     elif cancel_symbol:
                         with st.spinner(f"❌ {cancel_symbol} 주문 취소 중..."):
@@ -669,6 +1027,56 @@ def main():
         else:
             st.info("📭 현재 미체결 주문이 없습니다.")
     
+    with tab_history:
+        st.header("📜 거래 이력")
+        
+        store = history_store(history_path(st.session_state.api_key, st.session_state.get('testnet', False)))
+        
+        col_h1, col_h2, col_h3 = st.columns([1, 1, 1])
+        with col_h1:
+            period = st.selectbox("📅 기간", list(HISTORY_PERIODS), index=1)
+        with col_h2:
+            history_symbol = st.text_input("🎯 심볼 필터", placeholder="비우면 전체", key="history_symbol").upper()
+        with col_h3:
+            st.write("")  # 공간 맞춤
+            force_sync = st.button("🔄 **이력 동기화**", use_container_width=True)
+        
+        synced = sync_history(store, client, force=force_sync)
+        if force_sync and synced is not None:
+            st.success(f"✅ 동기화 완료: 체결 {synced['executions']} · 청산 {synced['closed_pnl']} · 주문 {synced['orders']}건")
+        
+        days = HISTORY_PERIODS[period]
+        since_ms = int((time.time() - days * 86400) * 1000) if days else None
+        summary = store.pnl_summary(history_symbol or None, since_ms)
+        
+        col_s1, col_s2, col_s3, col_s4 = st.columns(4)
+        col_s1.metric("💵 실현 손익", f"{summary['realized_pnl']:.2f} USDT")
+        col_s2.metric("🧾 수수료", f"{summary['fees']:.4f} USDT")
+        col_s3.metric("🏆 승률", f"{summary['win_rate']:.0%}")
+        col_s4.metric("🔁 청산 거래", f"{summary['trades']}건")
+        
+        daily = store.daily_pnl(history_symbol or None, since_ms)
+        if len(daily):
+            st.subheader("📈 일별 실현 손익")
+            st.bar_chart(daily.set_index("day")["pnl"])
+        
+        breakdown = store.symbol_breakdown(since_ms)
+        if len(breakdown):
+            st.subheader("🪙 심볼별 성과")
+            st.dataframe(symbol_history_table(breakdown).style.format(SYMBOL_HISTORY_FORMATS),
+                         use_container_width=True, hide_index=True)
+        
+        fills = store.recent_executions(history_symbol or None, since_ms)
+        if len(fills):
+            st.subheader("🧾 최근 체결")
+            st.dataframe(executions_table(fills).style.format(EXECUTION_FORMATS),
+                         use_container_width=True, hide_index=True)
+        else:
+            st.info("📭 저장된 체결 이력이 없습니다.")
+        
+        if store.last_sync_at:
+            st.caption(f"🗄️ {store.path} · 마지막 동기화 {datetime.fromtimestamp(store.last_sync_at).strftime('%H:%M:%S')}")
+    
     with tab4:
         st.header("⚙️ 도구 및 테스트")
         
@@ -683,7 +1091,7 @@ def main():
                         balance = get_usdt_balance(client)
                         positions = get_positions(client)
                         
-                    st.success(f"✅ API 연결 성공!")
+                    st.success("✅ API 연결 성공!")
                     st.info(f"💰 잔고: {balance:.2f} USDT")
                     st.info(f"📊 포지션: {len(positions)}개")
                     
@@ -722,21 +1130,55 @@ def main():
         
         with col_info3:
             st.metric("📈 포지션 비율", f"{st.session_state.get('max_position_pct', 100)}%")
+        
+        pool_stats = client_pool().stats()
+        st.caption(
+            f"🔌 클라이언트 풀: {pool_stats['size']}개 보관 · 적중률 {pool_stats['hit_rate']:.0%} "
+            f"({pool_stats['hits']}/{pool_stats['hits'] + pool_stats['misses']}) · 정리 {pool_stats['evictions']}회"
+        )
+        tg_stats = telegram_dispatcher().stats()
+        st.caption(
+            f"📱 텔레그램 대기열: {tg_stats['queued']}건 · 전송 {tg_stats['sent']} · 실패 {tg_stats['failed']} "
+            f"· 병합 {tg_stats['coalesced']} · 디스크 보관 {tg_stats['spilled']}"
+        )
+        book_stats = depth_cache(bool(st.session_state.get('testnet', False))).stats()
+        st.caption(
+            f"📚 호가창: {book_stats['books']}개 심볼 (스트림 {book_stats['streaming']}) · 스냅샷 {book_stats['snapshots']}회 "
+            f"· delta {book_stats['deltas']}건 · 캐시 적중 {book_stats['hits']}회"
+        )
+        kl_stats = kline_cache(bool(st.session_state.get('testnet', False))).stats()
+        st.caption(
+            f"📉 캔들 캐시: 열린 시리즈 {kl_stats['open']}개 · 파일 {kl_stats['files']}개 "
+            f"({kl_stats['bytes'] / 1024:.0f} KB) · 조회 {kl_stats['fetches']}회 / {kl_stats['bars_fetched']}봉"
+        )
+        
+        st.markdown("---")
+        performance_panel()
     
     # 자동 새로고침 옵션
     st.markdown("---")
-    col_auto1, col_auto2 = st.columns([1, 3])
+    col_auto1, col_auto2, col_auto3 = st.columns([1, 1, 2])
     
     with col_auto1:
-        auto_refresh = st.checkbox("🔄 자동 새로고침 (30초)", value=False)
+        auto_refresh = st.checkbox("🔄 자동 새로고침", value=False, key="auto_refresh")
     
     with col_auto2:
+        interval = st.select_slider("주기 (초)", options=AUTO_REFRESH_INTERVALS, value=30,
+                                    key="auto_refresh_interval", disabled=not auto_refresh)
+    
+    with col_auto3:
         if auto_refresh:
-            st.caption("⏰ 30초마다 자동으로 데이터를 업데이트합니다.")
+            st.caption(f"⏰ 약 {interval}초마다 (±{AUTO_REFRESH_JITTER:.0%}) 자동으로 데이터를 업데이트합니다.")
     
     if auto_refresh:
-        time.sleep(30)
-        st.rerun()
+        auto_refresh_ticker()
+    else:
+        st.session_state.next_refresh_at = None
 
 if __name__ == "__main__":
-    main()
+    _render_started = time.perf_counter()
+    try:
+        main()
+    finally:
+        # 재실행(st.rerun) 으로 중단돼도 렌더링 시간은 기록
+        metrics_registry().observe("render", time.perf_counter() - _render_started)
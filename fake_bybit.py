@@ -0,0 +1,546 @@
+# -*- coding: utf-8 -*-
+# 로컬 가짜 Bybit 거래소 (pybit.unified_trading.HTTP 와 같은 메서드 시그니처)
+# 네트워크/API 키 없이 주문 흐름을 검증할 때 사용
+import itertools
+import json
+import math
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_INSTRUMENTS = {
+    "BTCUSDT": {"tickSize": "0.10", "minOrderQty": "0.001", "maxOrderQty": "100", "qtyStep": "0.001"},
+    "ETHUSDT": {"tickSize": "0.01", "minOrderQty": "0.01", "maxOrderQty": "1000", "qtyStep": "0.01"},
+    "SOLUSDT": {"tickSize": "0.001", "minOrderQty": "0.1", "maxOrderQty": "10000", "qtyStep": "0.1"},
+}
+DEFAULT_PRICES = {"BTCUSDT": 65000.0, "ETHUSDT": 3200.0, "SOLUSDT": 150.0}
+TAKER_FEE_RATE = 0.00055
+BOOK_LEVEL_NOTIONAL = 20_000.0   # 가짜 호가 1단계 기본 물량 (USDT, 단계마다 50%씩 증가)
+BOOK_LEVEL_TICKS = 5             # 가짜 호가 단계 간격 (tick 수)
+
+
+class FakeRequestError(Exception):
+    # pybit InvalidRequestError 처럼 status_code 에 retCode 를 담는다
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FakeBybitClient:
+    def __init__(self, balance=1000.0, prices=None, instruments=None, latency=0.0, jitter=0.0,
+                 error_rate=0.0, batch_supported=True, settle_cancel_supported=True, testnet=False, seed=None,
+                 limit_fill_ratio=0.0):
+        self.testnet = testnet
+        self.balance = balance
+        self.prices = dict(prices or DEFAULT_PRICES)
+        self.instruments = dict(instruments or DEFAULT_INSTRUMENTS)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.batch_supported = batch_supported
+        self.settle_cancel_supported = settle_cancel_supported
+        self.limit_fill_ratio = limit_fill_ratio   # 리밋 주문 접수 즉시 (메이커로) 체결되는 비율
+        self.positions = {}     # (symbol, side) -> {"size", "avgPrice"}
+        self.leverage = {}      # symbol -> 레버리지 (기본 10)
+        self.orders = {}        # orderId -> order dict
+        self.order_history = {} # orderId -> order dict (체결/취소 포함)
+        self.executions = []    # 체결 기록 (오래된 순)
+        self.closed_pnl = []    # 청산 손익 기록 (오래된 순)
+        self.calls = []         # (메서드명, kwargs) 호출 기록
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+
+    # ── 내부 도우미 ──
+    def _enter(self, method, kwargs):
+        with self._lock:
+            self.calls.append((method, dict(kwargs)))
+        delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise FakeRequestError(f"injected error on {method}", 10016)
+
+    @staticmethod
+    def _ok(result=None, ext=None):
+        return {"retCode": 0, "retMsg": "OK", "result": result or {}, "retExtInfo": ext or {},
+                "time": int(time.time() * 1000)}
+
+    @staticmethod
+    def _page(rows, kwargs, default_limit=20):
+        # cursor 는 시작 위치 문자열
+        start = int(kwargs.get("cursor") or 0)
+        end = start + int(kwargs.get("limit") or default_limit)
+        return {"list": rows[start:end], "nextPageCursor": str(end) if end < len(rows) else ""}
+
+    def call_count(self, method=None):
+        with self._lock:
+            return sum(1 for m, _ in self.calls if method is None or m == method)
+
+    def _check_order(self, req):
+        spec = self.instruments.get(req.get("symbol"))
+        if spec is None:
+            return 10001, "params error: symbol invalid"
+        qty = float(req.get("qty", 0))
+        step = float(spec["qtyStep"])
+        if qty < float(spec["minOrderQty"]):
+            return 10001, "Qty invalid"
+        if qty > float(spec["maxOrderQty"]):
+            return 170136, "Order quantity exceeded upper limit"
+        if abs(round(qty / step) * step - qty) > step * 1e-6:
+            return 170137, "Order volume has too many decimals"
+        if req.get("orderType") == "Limit":
+            tick = float(spec["tickSize"])
+            price = float(req.get("price", 0))
+            if price <= 0:
+                return 10001, "Price invalid"
+            if abs(round(price / tick) * tick - price) > tick * 1e-6:
+                return 170134, "Order price has too many decimals"
+        return 0, "OK"
+
+    @staticmethod
+    def _in_window(row, kwargs, key):
+        t = int(row[key])
+        return (not kwargs.get("symbol") or row["symbol"] == kwargs["symbol"]) \
+            and t >= int(kwargs.get("startTime") or 0) and t <= int(kwargs.get("endTime") or 2 ** 62)
+
+    def _record_fill(self, order_id, symbol, side, qty, price, closed, entry_price):
+        now = int(time.time() * 1000)
+        self.executions.append({
+            "execId": f"exec-{next(self._ids):08d}", "orderId": order_id, "symbol": symbol, "side": side,
+            "execPrice": str(price), "execQty": str(qty), "execValue": str(qty * price),
+            "execFee": str(qty * price * TAKER_FEE_RATE), "feeRate": str(TAKER_FEE_RATE),
+            "execType": "Trade", "closedSize": str(closed), "execTime": str(now),
+        })
+        if closed:
+            sign = 1 if side == "Sell" else -1     # 매도로 롱 청산 → (청산가 - 진입가)
+            self.closed_pnl.append({
+                "orderId": order_id, "symbol": symbol, "side": side, "qty": str(closed),
+                "orderPrice": str(price), "orderType": "Market", "execType": "Trade",
+                "closedSize": str(closed), "avgEntryPrice": str(entry_price), "avgExitPrice": str(price),
+                "cumEntryValue": str(closed * entry_price), "cumExitValue": str(closed * price),
+                "closedPnl": str(sign * (price - entry_price) * closed - qty * price * TAKER_FEE_RATE),
+                "fillCount": "1", "leverage": "10", "createdTime": str(now), "updatedTime": str(now),
+            })
+
+    def _fill(self, symbol, side, qty, price, reduce_only=False, order_id=""):
+        opposite = "Sell" if side == "Buy" else "Buy"
+        held = self.positions.get((symbol, opposite))
+        closed, entry_price, fill_qty = 0.0, 0.0, qty
+        if held:
+            closed = min(held["size"], qty)
+            entry_price = held["avgPrice"]
+            held["size"] = round(held["size"] - closed, 10)
+            if held["size"] <= 0:
+                del self.positions[(symbol, opposite)]
+            qty = round(qty - closed, 10)
+        if reduce_only:
+            fill_qty = closed
+        if fill_qty > 0:
+            self._record_fill(order_id, symbol, side, fill_qty, price, closed, entry_price)
+        if qty <= 0 or reduce_only:
+            return
+        pos = self.positions.setdefault((symbol, side), {"size": 0.0, "avgPrice": 0.0})
+        total = pos["size"] + qty
+        pos["avgPrice"] = (pos["avgPrice"] * pos["size"] + price * qty) / total
+        pos["size"] = total
+
+    def _submit(self, req):
+        code, msg = self._check_order(req)
+        if code:
+            return code, msg, None
+        link_id = req.get("orderLinkId")
+        if link_id:
+            with self._lock:
+                if any(o.get("orderLinkId") == link_id for o in self.order_history.values()):
+                    return 110072, "OrderLinkedID is duplicate", None
+        order_id = f"fake-{next(self._ids):08d}"
+        symbol, side, qty = req["symbol"], req["side"], float(req["qty"])
+        now = str(int(time.time() * 1000))
+        with self._lock:
+            if req.get("orderType") == "Market":
+                price = self.prices[symbol]
+                self._fill(symbol, side, qty, price, bool(req.get("reduceOnly")), order_id)
+                self.order_history[order_id] = {
+                    "orderId": order_id, "orderLinkId": req.get("orderLinkId", ""), "symbol": symbol,
+                    "side": side, "orderType": "Market", "qty": req["qty"], "price": "0",
+                    "avgPrice": str(price), "cumExecQty": req["qty"], "orderStatus": "Filled",
+                    "createdTime": now, "updatedTime": now,
+                }
+            else:
+                order = {
+                    "orderId": order_id, "orderLinkId": req.get("orderLinkId", ""), "symbol": symbol,
+                    "side": side, "orderType": "Limit", "qty": req["qty"], "price": req["price"],
+                    "avgPrice": "0", "cumExecQty": "0", "orderStatus": "New", "createdTime": now, "updatedTime": now,
+                }
+                self.order_history[order_id] = order
+                step = float(self.instruments[symbol]["qtyStep"])
+                filled = round(math.floor(qty * self.limit_fill_ratio / step + 1e-9) * step, 10)
+                if filled > 0:
+                    self._fill(symbol, side, filled, float(req["price"]), bool(req.get("reduceOnly")), order_id)
+                    order.update(avgPrice=req["price"], cumExecQty=str(filled),
+                                 orderStatus="Filled" if filled >= qty else "PartiallyFilled")
+                if order["orderStatus"] != "Filled":
+                    self.orders[order_id] = order
+        return 0, "OK", order_id
+
+    # ── 시세/메타데이터 ──
+    def get_tickers(self, **kwargs):
+        self._enter("get_tickers", kwargs)
+        symbols = [kwargs["symbol"]] if kwargs.get("symbol") else list(self.prices)
+        return self._ok({"category": kwargs.get("category"), "list": [
+            {"symbol": s, "lastPrice": str(self.prices[s]), "markPrice": str(self.prices[s]),
+             "bid1Price": str(self.prices[s]), "ask1Price": str(self.prices[s])}
+            for s in symbols if s in self.prices
+        ]})
+
+    def get_instruments_info(self, **kwargs):
+        self._enter("get_instruments_info", kwargs)
+        symbols = [kwargs["symbol"]] if kwargs.get("symbol") else list(self.instruments)
+        rows = []
+        for s in symbols:
+            spec = self.instruments.get(s)
+            if spec is None:
+                continue
+            rows.append({
+                "symbol": s, "status": "Trading", "settleCoin": "USDT",
+                "priceFilter": {"tickSize": spec["tickSize"]},
+                "lotSizeFilter": {"minOrderQty": spec["minOrderQty"], "maxOrderQty": spec["maxOrderQty"],
+                                  "qtyStep": spec["qtyStep"]},
+            })
+        return self._ok({"category": kwargs.get("category"), "list": rows, "nextPageCursor": ""})
+
+    def get_orderbook(self, **kwargs):
+        # 현재가 양쪽으로 BOOK_LEVEL_TICKS 간격, 뒤로 갈수록 두꺼워지는 결정적 가짜 호가
+        self._enter("get_orderbook", kwargs)
+        symbol = kwargs["symbol"]
+        price = self.prices[symbol]
+        tick = float(self.instruments[symbol]["tickSize"])
+        levels = min(int(kwargs.get("limit", 25)), 500)
+        book = {"b": [], "a": []}
+        for i in range(levels):
+            offset = (i + 1) * BOOK_LEVEL_TICKS * tick
+            size = f"{BOOK_LEVEL_NOTIONAL * (1 + 0.5 * i) / price:.6f}"
+            book["b"].append([f"{price - offset:.6f}", size])
+            book["a"].append([f"{price + offset:.6f}", size])
+        return self._ok({"s": symbol, "ts": int(time.time() * 1000), "u": next(self._ids), "seq": 0, **book})
+
+    def get_kline(self, **kwargs):
+        # 심볼·봉 시각으로 정해지는 결정적 가짜 캔들 (최신순, 진행 중인 봉 포함)
+        self._enter("get_kline", kwargs)
+        interval = kwargs.get("interval", "1")
+        step = 86_400_000 if interval == "D" else int(interval) * 60_000
+        now = int(time.time() * 1000) // step * step
+        end = min(int(kwargs.get("end") or now), now) // step * step
+        start = int(kwargs.get("start") or 0)
+        limit = int(kwargs.get("limit") or 200)
+        symbol = kwargs["symbol"]
+        base = self.prices.get(symbol, 100.0)
+        rows = []
+        t = end
+        while t >= start and len(rows) < limit:
+            rng = random.Random(f"{symbol}:{interval}:{t}")
+            open_ = base * (1 + 0.02 * math.sin(t / 3_600_000 / 7))
+            close = open_ * (1 + rng.uniform(-0.002, 0.002))
+            rows.append([str(t), f"{open_:.4f}", f"{max(open_, close) * 1.001:.4f}",
+                         f"{min(open_, close) * 0.999:.4f}", f"{close:.4f}", f"{rng.uniform(1, 100):.3f}", "0"])
+            t -= step
+        return self._ok({"category": kwargs.get("category"), "symbol": symbol, "list": rows})
+
+    # ── 계정 ──
+    def get_wallet_balance(self, **kwargs):
+        self._enter("get_wallet_balance", kwargs)
+        return self._ok({"list": [{"accountType": "UNIFIED", "coin": [
+            {"coin": "USDT", "walletBalance": str(self.balance)}
+        ]}]})
+
+    def get_positions(self, **kwargs):
+        self._enter("get_positions", kwargs)
+        rows = []
+        with self._lock:
+            for (symbol, side), pos in self.positions.items():
+                if kwargs.get("symbol") and kwargs["symbol"] != symbol:
+                    continue
+                mark = self.prices[symbol]
+                sign = 1 if side == "Buy" else -1
+                rows.append({
+                    "symbol": symbol, "side": side, "size": str(pos["size"]),
+                    "avgPrice": str(pos["avgPrice"]), "markPrice": str(mark),
+                    "positionValue": str(pos["size"] * pos["avgPrice"]),
+                    "unrealisedPnl": str(sign * (mark - pos["avgPrice"]) * pos["size"]),
+                    "leverage": f"{self.leverage.get(symbol, 10):g}", "positionIdx": 0,
+                })
+        return self._ok(dict(category=kwargs.get("category"), **self._page(rows, kwargs)))
+
+    def set_leverage(self, **kwargs):
+        self._enter("set_leverage", kwargs)
+        leverage = float(kwargs["buyLeverage"])
+        with self._lock:
+            if self.leverage.get(kwargs["symbol"], 10) == leverage:
+                raise FakeRequestError("leverage not modified", 110043)
+            self.leverage[kwargs["symbol"]] = leverage
+        return self._ok()
+
+    def get_risk_limit(self, **kwargs):
+        # 1단계만: 유지증거금률 0.5%, 개시증거금률 1%
+        self._enter("get_risk_limit", kwargs)
+        symbols = [kwargs["symbol"]] if kwargs.get("symbol") else list(self.instruments)
+        return self._ok({"category": kwargs.get("category"), "list": [
+            {"id": 1, "symbol": s, "riskLimitValue": "2000000", "maintenanceMargin": "0.005",
+             "initialMargin": "0.01", "isLowestRisk": 1, "maxLeverage": "100.00", "mmDeduction": ""}
+            for s in symbols
+        ]})
+
+    def get_open_orders(self, **kwargs):
+        self._enter("get_open_orders", kwargs)
+        with self._lock:
+            rows = [dict(o) for o in self.orders.values()
+                    if not kwargs.get("symbol") or o["symbol"] == kwargs["symbol"]]
+        return self._ok(dict(category=kwargs.get("category"), **self._page(rows, kwargs)))
+
+    # ── 이력 (최신순, startTime/endTime 필터) ──
+    def get_executions(self, **kwargs):
+        self._enter("get_executions", kwargs)
+        with self._lock:
+            rows = [dict(r) for r in reversed(self.executions) if self._in_window(r, kwargs, "execTime")]
+        return self._ok(dict(category=kwargs.get("category"), **self._page(rows, kwargs, 50)))
+
+    def get_closed_pnl(self, **kwargs):
+        self._enter("get_closed_pnl", kwargs)
+        with self._lock:
+            rows = [dict(r) for r in reversed(self.closed_pnl) if self._in_window(r, kwargs, "updatedTime")]
+        return self._ok(dict(category=kwargs.get("category"), **self._page(rows, kwargs, 50)))
+
+    def get_order_history(self, **kwargs):
+        self._enter("get_order_history", kwargs)
+        with self._lock:
+            rows = sorted((dict(o) for o in self.order_history.values() if self._in_window(o, kwargs, "updatedTime")
+                           and (not kwargs.get("orderId") or o["orderId"] == kwargs["orderId"])),
+                          key=lambda o: int(o["updatedTime"]), reverse=True)
+        return self._ok(dict(category=kwargs.get("category"), **self._page(rows, kwargs, 50)))
+
+    # ── 주문 ──
+    def place_order(self, **kwargs):
+        self._enter("place_order", kwargs)
+        code, msg, order_id = self._submit(kwargs)
+        if code:
+            raise FakeRequestError(f"{msg} (ErrCode: {code})", code)
+        return self._ok({"orderId": order_id, "orderLinkId": kwargs.get("orderLinkId", "")})
+
+    def place_batch_order(self, **kwargs):
+        self._enter("place_batch_order", kwargs)
+        if not self.batch_supported:
+            raise FakeRequestError("batch order not supported", 10005)
+        results, ext = [], []
+        for req in kwargs.get("request", []):
+            code, msg, order_id = self._submit(req)
+            results.append({"category": kwargs.get("category"), "symbol": req.get("symbol"),
+                            "orderId": order_id or "", "orderLinkId": req.get("orderLinkId", "")})
+            ext.append({"code": code, "msg": msg})
+        return self._ok({"list": results}, {"list": ext})
+
+    def cancel_order(self, **kwargs):
+        self._enter("cancel_order", kwargs)
+        with self._lock:
+            order = self.orders.pop(kwargs.get("orderId"), None)
+            if order is None:
+                raise FakeRequestError("order not exists or too late to cancel", 110001)
+            order.update(orderStatus="Cancelled", updatedTime=str(int(time.time() * 1000)))
+        return self._ok({"orderId": order["orderId"], "orderLinkId": order.get("orderLinkId", "")})
+
+    def cancel_all_orders(self, **kwargs):
+        self._enter("cancel_all_orders", kwargs)
+        if not kwargs.get("symbol") and not self.settle_cancel_supported:
+            raise FakeRequestError("params error: symbol is required", 10001)
+        with self._lock:
+            cancelled = [oid for oid, o in self.orders.items()
+                         if not kwargs.get("symbol") or o["symbol"] == kwargs["symbol"]]
+            now = str(int(time.time() * 1000))
+            for oid in cancelled:
+                order = self.orders.pop(oid)
+                order.update(orderStatus="Cancelled", updatedTime=now)
+        return self._ok({"list": [{"orderId": oid} for oid in cancelled]})
+
+
+class ReplayWebSocket:
+    # pybit.unified_trading.WebSocket 대역: 기록된 메시지를 구독 콜백으로 재생
+    # messages 는 dict 리스트 또는 JSONL 파일 경로 (한 줄에 원본 메시지 1개)
+    STREAM_TOPICS = {
+        "position_stream": "position", "order_stream": "order",
+        "execution_stream": "execution", "wallet_stream": "wallet",
+    }
+
+    def __init__(self, messages=(), channel_type="private"):
+        if isinstance(messages, str):
+            with open(messages, encoding="utf-8") as fh:
+                messages = [json.loads(line) for line in fh if line.strip()]
+        self.channel_type = channel_type
+        self.messages = list(messages)
+        self.callbacks = {}     # topic -> callback
+        self.connected = True
+        self.position = 0
+
+    def __getattr__(self, name):
+        if name in self.STREAM_TOPICS:
+            topic = self.STREAM_TOPICS[name]
+            return lambda callback: self.callbacks.__setitem__(topic, callback)
+        raise AttributeError(name)
+
+    def ticker_stream(self, symbol, callback):
+        for s in ([symbol] if isinstance(symbol, str) else symbol):
+            self.callbacks[f"tickers.{s}"] = callback
+
+    def orderbook_stream(self, depth, symbol, callback):
+        for s in ([symbol] if isinstance(symbol, str) else symbol):
+            self.callbacks[f"orderbook.{depth}.{s}"] = callback
+
+    def is_connected(self):
+        return self.connected
+
+    def exit(self):
+        self.connected = False
+
+    def disconnect(self):
+        self.connected = False
+
+    def reconnect(self):
+        self.connected = True
+
+    def _callback_for(self, topic):
+        if topic in self.callbacks:
+            return self.callbacks[topic]
+        return self.callbacks.get(topic.split(".")[0])
+
+    def replay(self, count=None, interval=0.0):
+        # 다음 count 개(기본: 전부) 메시지를 순서대로 전달, 전달한 개수 반환
+        end = len(self.messages) if count is None else min(len(self.messages), self.position + count)
+        delivered = 0
+        while self.position < end:
+            message = self.messages[self.position]
+            self.position += 1
+            callback = self._callback_for(message.get("topic", ""))
+            if callback is not None and self.connected:
+                callback(message)
+                delivered += 1
+            if interval:
+                time.sleep(interval)
+        return delivered
+
+
+# ── REST 서버 ──
+# pybit HTTP 의 endpoint 를 이 서버 주소로 바꾸면 실제 HTTP 왕복으로 FakeBybitClient 를 호출한다
+ROUTES = {
+    "/v5/market/tickers": "get_tickers",
+    "/v5/market/instruments-info": "get_instruments_info",
+    "/v5/market/kline": "get_kline",
+    "/v5/market/orderbook": "get_orderbook",
+    "/v5/account/wallet-balance": "get_wallet_balance",
+    "/v5/market/risk-limit": "get_risk_limit",
+    "/v5/position/list": "get_positions",
+    "/v5/position/set-leverage": "set_leverage",
+    "/v5/order/realtime": "get_open_orders",
+    "/v5/order/history": "get_order_history",
+    "/v5/execution/list": "get_executions",
+    "/v5/position/closed-pnl": "get_closed_pnl",
+    "/v5/order/create": "place_order",
+    "/v5/order/create-batch": "place_batch_order",
+    "/v5/order/cancel": "cancel_order",
+    "/v5/order/cancel-all": "cancel_all_orders",
+}
+
+
+class FakeBybitServer:
+    def __init__(self, exchange=None, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 rate_limit=None, seed=None):
+        self.exchange = exchange or FakeBybitClient()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit        # 엔드포인트별 초당 한도 (None 이면 헤더만 10/10)
+        self.requests = {}                  # 경로 -> 요청 수
+        self._window = {}                   # 경로 -> (초, 이번 초 요청 수)
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-bybit", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def request_count(self, path=None):
+        with self._lock:
+            return sum(n for p, n in self.requests.items() if path is None or p == path)
+
+    def _count(self, path):
+        now = int(time.time())
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            second, used = self._window.get(path, (now, 0))
+            used = used + 1 if second == now else 1
+            self._window[path] = (now, used)
+        limit = self.rate_limit or 10
+        return limit, max(0, limit - used), (now + 1) * 1000
+
+    def _dispatch(self, path, params):
+        delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        limit, remaining, reset_ms = self._count(path)
+        headers = {"X-Bapi-Limit": str(limit), "X-Bapi-Limit-Status": str(remaining),
+                   "X-Bapi-Limit-Reset-Timestamp": str(reset_ms)}
+        if self.rate_limit and remaining <= 0 and path not in ("/v5/market/tickers", "/v5/market/instruments-info"):
+            return 200, {"retCode": 10006, "retMsg": "Too many visits!", "result": {}}, headers
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return 200, {"retCode": 10016, "retMsg": "injected server error", "result": {}}, headers
+        method = ROUTES.get(path)
+        if method is None:
+            return 404, {"retCode": 10404, "retMsg": f"unknown path {path}", "result": {}}, headers
+        try:
+            return 200, getattr(self.exchange, method)(**params), headers
+        except FakeRequestError as e:
+            return 200, {"retCode": e.status_code, "retMsg": str(e), "result": {}}, headers
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body, headers):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                parsed = urllib.parse.urlsplit(self.path)
+                params = dict(urllib.parse.parse_qsl(parsed.query))
+                self._reply(*server._dispatch(parsed.path, params))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                params = json.loads(self.rfile.read(length) or b"{}")
+                self._reply(*server._dispatch(urllib.parse.urlsplit(self.path).path, params))
+
+        return Handler
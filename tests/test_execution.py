@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# 실행: python -m pytest -q   (저장소 루트에서)
+import pytest
+
+from bybit_core.execution import ChildOrder
+
+ORDER_ROW = {"orderId": "c1", "orderStatus": "Filled", "cumExecQty": "1.0", "cumExecValue": "100"}
+EXEC_ROW = {"orderId": "c1", "execId": "e1", "execQty": "1.0", "execValue": "100", "execPrice": "100"}
+
+@pytest.mark.parametrize("first, second", [("order", "exec"), ("exec", "order")])
+def test_child_fill_counted_once(first, second):
+    # 같은 체결이 주문 상태와 execution 스트림 양쪽으로 들어와도 한 번만 집계
+    child = ChildOrder("c1", "Market", 1.0)
+    apply = {"order": lambda: child.apply_order(ORDER_ROW), "exec": lambda: child.apply_execution(EXEC_ROW)}
+    apply[first]()
+    apply[second]()
+    assert child.filled_qty == 1.0
+    assert child.filled_value == 100.0
+    assert child.done
+
+def test_child_partial_fills_take_the_further_source():
+    child = ChildOrder("c1", "Limit", 2.0, 100.0)
+    child.apply_execution(dict(EXEC_ROW, execQty="0.5", execValue="50"))
+    child.apply_order({"orderStatus": "PartiallyFilled", "cumExecQty": "1.5", "cumExecValue": "150"})
+    assert child.filled_qty == 1.5
+    child.apply_execution(dict(EXEC_ROW, execId="e2", execQty="1.0", execValue="100"))
+    child.apply_execution(dict(EXEC_ROW, execId="e2", execQty="1.0", execValue="100"))   # 중복 execId
+    assert (child.filled_qty, child.filled_value) == (1.5, 150.0)
+    child.apply_execution(dict(EXEC_ROW, execId="e3", execQty="0.5", execValue="50"))
+    assert (child.filled_qty, child.filled_value) == (2.0, 200.0)
+
+def test_unconfirmed_children_are_not_resent(monkeypatch):
+    # 시장가 자식의 체결 확인이 늦어도 다음 조각은 그 수량을 다시 보내지 않는다
+    import bybit_core.execution as execution
+    from bybit_core.market import get_sizer
+    from fake_bybit import FakeBybitClient
+
+    monkeypatch.setattr(execution, "EXEC_MARKET_WAIT", 0.05)
+    client = FakeBybitClient(latency=0.0, balance=10_000.0)
+    client.get_order_history = lambda **kwargs: {"retCode": 0, "result": {"list": []}}
+    sizer = get_sizer(client, "BTCUSDT")
+    target = sizer.qty_units(585.0, 65000.0)
+    job = execution.ExecutionJob("twap-t", "acct", client, "BTCUSDT", "Buy", "twap", target, 3, 0.0, 1.0, sizer)
+    job.run()
+
+    sent = sum(float(kwargs["qty"]) for method, kwargs in client.calls if method == "place_order")
+    assert sent == pytest.approx(job.target_qty)
+    assert job.remaining_units() == 0
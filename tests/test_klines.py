@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import time
+
+import numpy as np
+
+from bybit_core.klines import KLINE_MAX_TAIL_PAGES, KlineCache
+from fake_bybit import FakeBybitClient
+
+STEP = 60_000
+
+def test_long_idle_gap_is_filled_in_background(tmp_path):
+    client = FakeBybitClient(latency=0.0)
+    cache = KlineCache(str(tmp_path), refresh=0.0)
+    now = int(time.time() * 1000) // STEP * STEP
+    # 30일 전에 받아 둔 1분봉 100개 → 꼬리 공백 약 43,000봉
+    series = cache._series_for("BTCUSDT", "1")
+    old_end = now - 30 * 86_400_000
+    series.write(cache._fetch(client, "BTCUSDT", "1", old_end - 99 * STEP, old_end))
+    calls = client.call_count("get_kline")
+
+    rows = cache.get(client, "BTCUSDT", "1", bars=200)
+    assert client.call_count("get_kline") - calls <= KLINE_MAX_TAIL_PAGES
+    assert len(rows) == 200 and rows[-1, 0] >= now
+    assert np.all(np.diff(rows[:, 0]) == STEP)
+
+    deadline = time.time() + 30
+    while series.filling and time.time() < deadline:
+        time.sleep(0.05)
+    assert not series.filling
+    full = series.rows()
+    assert full[0, 0] == old_end - 99 * STEP and full[-1, 0] >= now
+    assert np.all(np.diff(full[:, 0]) == STEP)
+
+def test_short_gap_still_fetched_inline(tmp_path):
+    client = FakeBybitClient(latency=0.0)
+    cache = KlineCache(str(tmp_path), refresh=0.0)
+    cache.get(client, "ETHUSDT", "5", bars=100)
+    rows = cache.get(client, "ETHUSDT", "5", bars=100)
+    assert not cache._series_for("ETHUSDT", "5").filling
+    assert len(rows) == 100
+
+def test_series_kept_open_while_gap_fill_runs(tmp_path):
+    # 공백 보충 중에 LRU 에서 밀려나도 같은 시리즈(같은 잠금)를 계속 쓴다 → 보충이 새 봉을 지우지 않음
+    import threading
+
+    client = FakeBybitClient(latency=0.0)
+    release = threading.Event()
+    get_kline = client.get_kline
+
+    def gated(**kwargs):
+        if threading.current_thread().name.startswith("kline-gap"):
+            release.wait(10)
+        return get_kline(**kwargs)
+    client.get_kline = gated
+
+    cache = KlineCache(str(tmp_path), max_open=1, refresh=0.0)
+    now = int(time.time() * 1000) // STEP * STEP
+    series = cache._series_for("BTCUSDT", "1")
+    old_end = now - 30 * 86_400_000
+    series.write(cache._fetch(client, "BTCUSDT", "1", old_end - 99 * STEP, old_end))
+    cache.get(client, "BTCUSDT", "1", bars=200)
+    assert series.filling
+
+    cache.get(client, "ETHUSDT", "1", bars=50)           # max_open=1 → 평소라면 BTC 시리즈가 밀려남
+    assert cache._series_for("BTCUSDT", "1") is series
+    cache.get(client, "BTCUSDT", "1", bars=200)
+    release.set()
+
+    deadline = time.time() + 30
+    while series.filling and time.time() < deadline:
+        time.sleep(0.05)
+    full = series.rows()
+    assert full[0, 0] == old_end - 99 * STEP and full[-1, 0] >= now
+    assert np.all(np.diff(full[:, 0]) == STEP)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from bybit_core.market import _instrument_cache_for, _invalidate_on_precision_reject, get_sizer
+from fake_bybit import FakeBybitClient
+
+def test_only_precision_rejects_invalidate_spec():
+    # 일반 파라미터 오류(10001)는 스펙을 유지하고, 가격/수량 정밀도 거부만 캐시를 비움
+    client = FakeBybitClient(latency=0.0)
+    get_sizer(client, "BTCUSDT")
+    cache = _instrument_cache_for(client)
+    loaded = client.call_count("get_instruments_info")
+
+    _invalidate_on_precision_reject(client, "BTCUSDT", 10001)
+    get_sizer(client, "BTCUSDT")
+    assert client.call_count("get_instruments_info") == loaded
+
+    _invalidate_on_precision_reject(client, "BTCUSDT", 170137)
+    assert cache._lookup("BTCUSDT") is None
+
+def test_evicted_specs_drop_their_sizers():
+    # LRU/TTL 로 스펙이 빠지면 계산해 둔 OrderSizer 도 함께 정리
+    from bybit_core.market import InstrumentSpecCache
+
+    client = FakeBybitClient(latency=0.0)
+    cache = InstrumentSpecCache(maxsize=2, bulk_interval=float("inf"))   # 심볼별 단건 조회
+    for symbol in ("BTCUSDT", "ETHUSDT", "SOLUSDT"):
+        cache.sizer(client, symbol)
+    assert set(cache._sizers) == set(cache._entries) == {"ETHUSDT", "SOLUSDT"}
+
+    cache._entries["SOLUSDT"] = (0.0, cache._entries["SOLUSDT"][1])     # TTL 만료
+    assert cache._lookup("SOLUSDT") is None
+    assert set(cache._sizers) == {"ETHUSDT"}
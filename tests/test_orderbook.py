@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from bybit_core.orderbook import DepthCache
+
+SYMBOL = "BTCUSDT"
+
+def message(kind, u, seq, bids=(), asks=()):
+    return {"topic": f"orderbook.200.{SYMBOL}", "type": kind,
+            "data": {"s": SYMBOL, "u": u, "seq": seq, "b": [list(l) for l in bids], "a": [list(l) for l in asks]}}
+
+class SnapshotClient:
+    # REST 호가: u 는 스트림과 다른 번호 체계, seq 만 공통
+    def __init__(self, data):
+        self.data = data
+        self.calls = 0
+
+    def get_orderbook(self, **kwargs):
+        self.calls += 1
+        return {"retCode": 0, "result": dict(self.data, s=SYMBOL)}
+
+def test_gap_recovers_with_one_rest_snapshot():
+    cache = DepthCache()
+    cache.on_message(message("snapshot", 100, 1000, bids=[("99", "1")], asks=[("101", "1")]))
+    cache.on_message(message("delta", 101, 1001, bids=[("99", "2")]))
+    cache.on_message(message("delta", 103, 1003, asks=[("101", "3")]))    # 102 누락 → stale
+    cache.on_message(message("delta", 104, 1004, bids=[("98", "1")]))    # 스냅샷에 포함될 분량
+    cache.on_message(message("delta", 105, 1005, asks=[("102", "4")]))    # 스냅샷 이후 분량
+    book = cache._books[SYMBOL]
+    assert book.stale
+
+    client = SnapshotClient({"u": 777777, "seq": 1004, "b": [["99", "2"], ["98", "1"]], "a": [["101", "3"]]})
+    cache.get(client, SYMBOL)
+    assert client.calls == 1 and not book.stale
+    assert book.asks == {101.0: 3.0, 102.0: 4.0}     # 버퍼의 seq 1005 delta 만 재적용
+
+    # 이후 스트림 delta 는 updateId 연속으로 이어지고 다시 stale 로 빠지지 않는다
+    cache.on_message(message("delta", 106, 1006, bids=[("99", "5")]))
+    cache.on_message(message("delta", 107, 1007, bids=[("97", "1")]))
+    assert not book.stale and book.bids == {99.0: 5.0, 98.0: 1.0, 97.0: 1.0}
+    cache.get(client, SYMBOL)
+    assert client.calls == 1
+
+def test_snapshot_bridges_to_first_newer_live_delta():
+    cache = DepthCache()
+    cache.on_message(message("snapshot", 10, 500, bids=[("99", "1")], asks=[("101", "1")]))
+    cache.on_message(message("delta", 12, 502))                           # 누락
+    client = SnapshotClient({"u": 42, "seq": 502, "b": [["99", "1"]], "a": [["101", "1"]]})
+    cache.get(client, SYMBOL)
+    cache.on_message(message("delta", 12, 502))                           # 스냅샷 이전 — 무시
+    cache.on_message(message("delta", 13, 503, asks=[("101", "2")]))
+    cache.on_message(message("delta", 14, 504, asks=[("101", "3")]))
+    book = cache._books[SYMBOL]
+    assert not book.stale and book.asks == {101.0: 3.0}
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from bybit_core.orders import place_ladder_entry
+from fake_bybit import FakeBybitClient
+
+LIMIT_TIERS = [(0.02, 0.4), (0.03, 0.3), (0.04, 0.3)]
+
+def make_client(api_key, **kwargs):
+    client = FakeBybitClient(latency=0.0, balance=1000.0, **kwargs)
+    client.api_key = api_key
+    return client
+
+def test_batch_timeout_after_accept_does_not_double_orders():
+    # 거래소가 배치를 접수한 뒤 응답이 끊겨도 재전송은 orderLinkId 중복으로 막혀 티어당 주문 1건
+    client = make_client("orders-timeout")
+    accept = client.place_batch_order
+
+    def lost_response(**kwargs):
+        accept(**kwargs)
+        raise TimeoutError("read timeout")
+    client.place_batch_order = lost_response
+
+    results = place_ladder_entry(client, "BTCUSDT", "Buy", 10, 65000.0, 1000.0, tiers=LIMIT_TIERS)
+    assert all(ok for ok, _ in results), results
+    assert len(client.orders) == len(LIMIT_TIERS)
+
+def test_batch_unsupported_falls_back_to_single_orders():
+    client = make_client("orders-nobatch", batch_supported=False)
+    results = place_ladder_entry(client, "BTCUSDT", "Buy", 10, 65000.0, 1000.0, tiers=LIMIT_TIERS)
+    assert all(ok for ok, _ in results), results
+    assert client.call_count("place_order") == len(LIMIT_TIERS)
+    assert len(client.orders) == len(LIMIT_TIERS)
+
+def test_side_close_cancels_only_target_symbols():
+    # 방향 지정 청산은 계정 전체 취소 없이 청산 대상 심볼의 미체결만 취소
+    from bybit_core.account import fetch_positions
+    from bybit_core.orders import close_positions, place_limit_order, place_market_order
+
+    client = make_client("orders-close-side")
+    assert place_market_order(client, "BTCUSDT", "Buy", 20, 1000.0, leverage=1)[0]
+    assert place_market_order(client, "ETHUSDT", "Sell", 20, 1000.0, leverage=1)[0]
+    assert place_limit_order(client, "ETHUSDT", "Sell", 10, 3300.0, 1000.0, leverage=1)[0]
+    assert place_limit_order(client, "SOLUSDT", "Buy", 10, 140.0, 1000.0, leverage=1)[0]
+
+    results, report = close_positions(client, fetch_positions(client), side="Buy")
+    assert [p.symbol for p, ok, _ in results if ok] == ["BTCUSDT"]
+    assert not any(m == "cancel_all_orders" and "settleCoin" in kw for m, kw in client.calls)
+    assert sorted(o["symbol"] for o in client.orders.values()) == ["ETHUSDT", "SOLUSDT"]
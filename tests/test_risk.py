@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from bybit_core.orders import place_limit_order, place_market_order
+from bybit_core.risk import risk_engine_for
+from fake_bybit import FakeBybitClient
+
+def make_client(api_key):
+    client = FakeBybitClient(latency=0.0, balance=1000.0)
+    client.api_key = api_key
+    return client
+
+def test_orders_update_engine_without_reloading():
+    # 첫 검사에서만 포지션·미체결을 읽고, 이후 주문은 앞선 체결·미체결을 반영한 상태로 재조회 없이 검사
+    client = make_client("risk-orders")
+    ok, msg = place_market_order(client, "BTCUSDT", "Buy", 40, 1000.0, leverage=1)
+    assert ok, msg
+    ok, msg = place_limit_order(client, "ETHUSDT", "Buy", 30, 3000.0, 1000.0, leverage=1)
+    assert ok, msg
+    assert (client.call_count("get_positions"), client.call_count("get_open_orders")) == (1, 1)
+
+    engine = risk_engine_for(client)
+    assert engine.exposure["BTCUSDT"] > 0 and engine.reserved > 0
+    ok, msg = place_market_order(client, "SOLUSDT", "Buy", 40, 1000.0, leverage=1)
+    assert not ok and "증거금 부족" in msg
+    assert (client.call_count("get_positions"), client.call_count("get_open_orders")) == (1, 1)
+
+    # 같은 방향 축소 주문은 재조회 없이 통과하고 노출이 줄어든다
+    before = engine.exposure["BTCUSDT"]
+    ok, msg = place_market_order(client, "BTCUSDT", "Sell", 20, 1000.0)
+    assert ok, msg
+    assert 0 < engine.exposure["BTCUSDT"] < before
+    assert client.call_count("get_positions") == 1
+
+def test_sync_reloads_only_on_new_version():
+    client = make_client("risk-sync")
+    engine = risk_engine_for(client)
+    assert engine.sync(("live", 1), [], 1000.0, [])
+    engine.apply_fill("BTCUSDT", "Buy", 0.01, 65000.0)
+    # 같은 버전이면 (목록 객체가 새로 만들어져도) 다시 적재하지 않아 증분 상태가 유지된다
+    assert not engine.sync(("live", 1), [], 1000.0, [])
+    assert engine.exposure["BTCUSDT"] == 650.0
+    assert engine.sync(("live", 2), [], 1000.0, [])
+    assert engine.snapshot()["positions"] == []
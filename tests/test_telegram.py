@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+import time
+
+from bybit_core.telegram import TelegramDispatcher, _redact
+
+TOKEN = "123456:SECRET-token"
+
+def wait_for(condition, timeout=5.0):
+    # 워커는 대기열이 빌 때 스스로 디스크 분량을 복원한다 — 그 결과를 기다린다
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_spill_file_never_holds_token(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    release = threading.Event()
+    sent = []
+
+    def sender(text, tg_token, tg_chat_id):
+        release.wait(5)
+        sent.append((tg_token, tg_chat_id, text))
+        return True, None
+
+    dispatcher = TelegramDispatcher(sender=sender, maxsize=1, coalesce_window=0.0, spill_path=str(spill))
+    for i in range(4):
+        dispatcher.submit(f"msg {i}", TOKEN, "chat-1")
+    assert dispatcher.spilled
+    assert TOKEN not in spill.read_text(encoding="utf-8")
+    assert all(set(json.loads(line)) == {"chat_id", "text"} for line in spill.read_text(encoding="utf-8").splitlines())
+
+    # 복원 시 토큰은 메모리 설정에서 가져온다
+    release.set()
+    assert wait_for(lambda: len(sent) == 4 and not spill.exists())
+    assert sorted(text for _, _, text in sent) == [f"msg {i}" for i in range(4)]
+    assert {token for token, _, _ in sent} == {TOKEN}
+
+def test_spill_for_unknown_chat_waits_for_token(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    spill.write_text(json.dumps({"chat_id": "chat-2", "text": "queued"}) + "\n", encoding="utf-8")
+    sent = []
+    dispatcher = TelegramDispatcher(sender=lambda *args: sent.append(args) or (True, None), coalesce_window=0.0,
+                                    spill_path=str(spill))
+    assert spill.exists() and not sent
+    dispatcher.submit("hello", TOKEN, "chat-2")
+    assert wait_for(lambda: len(sent) == 2)
+    assert not spill.exists()
+    assert [text for text, _, _ in sent] == ["hello", "queued"]
+
+def test_redact_strips_bot_url():
+    error = ("HTTPSConnectionPool(host='api.telegram.org', port=443): Max retries exceeded with url: "
+             f"/bot{TOKEN}/sendMessage")
+    assert TOKEN not in _redact(error)
+    assert TOKEN not in _redact(f"400 Client Error for url: https://api.telegram.org/bot{TOKEN}/sendMessage", TOKEN)
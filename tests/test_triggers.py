@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import bybit_core.triggers as triggers
+from bybit_core.triggers import TriggerEngine
+from fake_bybit import FakeBybitClient
+
+def test_only_engine_with_account_claims_firing(tmp_path, monkeypatch):
+    # 같은 규칙 DB 를 쓰는 두 프로세스 중 계정이 연결된 쪽만 발동을 선점하고 주문을 보낸다
+    sent = []
+    monkeypatch.setattr(triggers, "place_market_order",
+                        lambda client, symbol, side, *args, **kwargs: sent.append((client, symbol, side))
+                        or (True, "ok"))
+    path = str(tmp_path / "triggers.db")
+    detached = TriggerEngine(path, poll_interval=3600)
+    attached = TriggerEngine(path, poll_interval=3600)
+    client = FakeBybitClient(latency=0.0)
+    client.api_key = "account-1"
+    attached.attach(client)
+
+    rule, msg = detached.add_rule(client, "BTCUSDT", "above", 70000, "market", {"side": "Buy", "pct": 10})
+    assert rule is not None and rule.armed, msg
+    attached._load()
+
+    # 연결 안 된 엔진이 먼저 시세를 받아도 규칙을 평가하지 않는다
+    assert detached.on_price("BTCUSDT", 71000) == 0
+    detached.queue.join()
+    assert attached.on_price("BTCUSDT", 71000) == 1
+    attached.queue.join()
+
+    assert sent == [(client, "BTCUSDT", "Buy")]
+    firings = attached.firings()
+    assert [(f["rule_id"], f["ok"]) for f in firings] == [(rule.rule_id, 1)]
+    assert detached.duplicates == attached.duplicates == 0
+
+def test_attach_after_load_indexes_account_rules(tmp_path):
+    engine = TriggerEngine(str(tmp_path / "triggers.db"), poll_interval=3600)
+    client = FakeBybitClient(latency=0.0)
+    client.api_key = "account-2"
+    engine.add_rule(client, "ETHUSDT", "below", 3000, "alert")
+    assert engine.stats()["thresholds"] == 0
+    engine.attach(client)
+    assert engine.stats()["thresholds"] == 1